@@ -0,0 +1,179 @@
+import os
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from telemetry import admission_active, admission_queue_depth, admission_rejections, admission_wait
+
+# Per worker process: slots in use at once, requests allowed to wait, and the longest wait before giving up
+STAGE_LIMITS = {
+    "llm": (
+        int(os.getenv("ADMISSION_LLM_CONCURRENCY", "8")),
+        int(os.getenv("ADMISSION_LLM_QUEUE", "64")),
+        float(os.getenv("ADMISSION_LLM_MAX_WAIT", "30")),
+    ),
+    "pipeline": (
+        int(os.getenv("ADMISSION_PIPELINE_CONCURRENCY", "4")),
+        int(os.getenv("ADMISSION_PIPELINE_QUEUE", "32")),
+        float(os.getenv("ADMISSION_PIPELINE_MAX_WAIT", "300")),
+    ),
+    "memory": (
+        int(os.getenv("ADMISSION_MEMORY_CONCURRENCY", str(os.cpu_count() or 1))),
+        int(os.getenv("ADMISSION_MEMORY_QUEUE", "128")),
+        float(os.getenv("ADMISSION_MEMORY_MAX_WAIT", "10")),
+    ),
+}
+# Weight of the latest sample in the moving averages of wait and hold times
+EWMA_ALPHA = 0.2
+
+_stages: Dict[str, "StageLimiter"] = {}
+
+class Overloaded(Exception):
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"The {stage} stage is overloaded. Please retry in {retry_after}s.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+class StageLimiter:
+    """
+    Concurrency limit for one stage with a bounded wait queue. Waiters are queued per
+    session and slots are handed out round-robin across sessions, so a session with many
+    requests waits behind its own requests rather than everyone else's. A full queue or a
+    wait longer than max_wait raises Overloaded with a retry delay estimated from the
+    measured queue latency.
+    """
+
+    def __init__(self, stage: str, concurrency: int, max_queue: int, max_wait: float):
+        self.stage = stage
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+        self._active = 0
+        self._waiting = 0
+        # session_id -> waiters of that session; the order of sessions is the round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._wait_average = 0.0
+        self._hold_average = 0.0
+
+    @property
+    def full(self) -> bool:
+        return self._waiting >= self.max_queue
+
+    def retry_after(self) -> int:
+        # The measured wait, or the time for the current queue to drain when that is longer
+        drain = (self._waiting + 1) / self.concurrency * self._hold_average
+        return max(1, math.ceil(max(self._wait_average, drain)))
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, bounded: bool = True):
+        """Holds a slot for the block; bounded=False waits without the queue bound and wait limit."""
+        await self.acquire(session_id, bounded)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_average += EWMA_ALPHA * (time.monotonic() - start - self._hold_average)
+            self.release()
+
+    async def acquire(self, session_id: str, bounded: bool = True):
+        if self._active < self.concurrency and not self._waiting:
+            self._admit()
+            admission_wait.observe(0.0, stage=self.stage)
+            return
+        if bounded and self.full:
+            self.reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(session_id, deque()).append(waiter)
+        self._waiting += 1
+        self.stats["queued"] += 1
+        admission_queue_depth.inc(stage=self.stage)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait if bounded else None)
+        except asyncio.TimeoutError:
+            # A slot granted at the deadline is kept
+            if self._withdraw(session_id, waiter):
+                self.stats["timed_out"] += 1
+                self.reject("timeout")
+        except asyncio.CancelledError:
+            if not self._withdraw(session_id, waiter):
+                # Granted just before the cancellation; hand the slot on
+                self.release()
+            raise
+        self._wait_average += EWMA_ALPHA * (time.monotonic() - start - self._wait_average)
+        admission_wait.observe(time.monotonic() - start, stage=self.stage)
+
+    def release(self):
+        self._active -= 1
+        admission_active.dec(stage=self.stage)
+        self._dispatch()
+
+    def _admit(self):
+        self._active += 1
+        self.stats["admitted"] += 1
+        admission_active.inc(stage=self.stage)
+
+    def _dispatch(self):
+        while self._active < self.concurrency and self._queues:
+            session_id, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            self._waiting -= 1
+            admission_queue_depth.dec(stage=self.stage)
+            self._admit()
+            waiter.set_result(None)
+
+    def _withdraw(self, session_id: str, waiter: asyncio.Future) -> bool:
+        """Removes a waiter that was not granted a slot; returns False if it already was."""
+        waiters = self._queues.get(session_id)
+        if waiters is None or waiter not in waiters:
+            return False
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queues[session_id]
+        self._waiting -= 1
+        admission_queue_depth.dec(stage=self.stage)
+        return True
+
+    def reject(self, reason: str):
+        self.stats["rejected"] += 1
+        admission_rejections.inc(stage=self.stage, reason=reason)
+        raise Overloaded(self.stage, self.retry_after())
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "active": self._active,
+            "waiting": self._waiting,
+            "sessions_waiting": len(self._queues),
+            "wait_average": round(self._wait_average, 3),
+            "hold_average": round(self._hold_average, 3),
+            "retry_after": self.retry_after(),
+        }
+
+def stage(name: str) -> StageLimiter:
+    limiter = _stages.get(name)
+    if limiter is None:
+        limiter = _stages[name] = StageLimiter(name, *STAGE_LIMITS[name])
+    return limiter
+
+def check(*names: str):
+    """Rejects a request up front when a stage it needs already has a full queue."""
+    for name in names or STAGE_LIMITS:
+        limiter = stage(name)
+        if limiter.full:
+            limiter.reject("queue_full")
+
+def retry_after(*names: str) -> int:
+    return max(stage(name).retry_after() for name in names or STAGE_LIMITS)
+
+def snapshot() -> dict:
+    return {name: stage(name).snapshot() for name in STAGE_LIMITS}
@@ -0,0 +1,62 @@
+import re
+import zipfile
+from typing import AsyncIterator, List
+
+from pools import run_in_memory_pool
+
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+class _Sink:
+    """Write-only target for ZipFile; written bytes are collected until drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ZipStream:
+    """
+    ZIP archive produced incrementally for a streaming response. ZipFile writes local
+    headers, data descriptors and the central directory to a non-seekable sink, so every
+    entry can be sent as soon as it is added. Entries are stored uncompressed: GLB models
+    are mostly quantized or already compressed binary data.
+    """
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, "w", zipfile.ZIP_STORED, allowZip64=True)
+
+    async def add_file(self, name: str, path: str) -> AsyncIterator[bytes]:
+        with open(path, "rb") as source, self._zip.open(name, "w", force_zip64=True) as entry:
+            while True:
+                chunk = await run_in_memory_pool(source.read, ARCHIVE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                entry.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        # The data descriptor is written when the entry closes
+        yield self._sink.drain()
+
+    def add_bytes(self, name: str, data: bytes) -> bytes:
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
+
+def entry_name(index: int, prompt: str, extension: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", prompt.lower()).strip("-")[:48].rstrip("-")
+    return f"{index + 1:03d}-{slug or 'model'}.{extension}"
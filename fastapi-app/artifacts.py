@@ -0,0 +1,207 @@
+import os
+import time
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Iterable, Optional
+
+from telemetry import payload_size
+
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "/data/artifacts")
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Partial downloads and pins older than this are leftovers from a crashed worker
+STALE_PART_SECONDS = 3600
+# Files kept next to a model and evicted with it: the outputs of its run and its preview
+SIDECAR_SUFFIXES = (".json", ".jpg")
+
+_artifact_cache = None
+
+class ArtifactCache:
+    """
+    Content-addressed, size-bounded LRU cache of generated GLB files on a local volume.
+    Files are named by the hash of the expanded prompt and pipeline app IDs; the
+    in-memory index keeps the LRU order and sizes so lookups never scan the disk. The
+    other outputs of a run (variant models, LODs) are cached under keys derived from the
+    model's, and listed in a small JSON file kept and evicted with the model, like its
+    JPEG preview.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(expanded_prompt: str, app_ids: Iterable[str]) -> str:
+        digest = hashlib.sha256(expanded_prompt.strip().encode("utf-8"))
+        for app_id in app_ids:
+            digest.update(b"\0" + app_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def derived_key(key: str, name: str) -> str:
+        return hashlib.sha256(f"{key}\0{name}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.glb")
+
+    def outputs_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def put_outputs(self, key: str, outputs: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as part:
+            json.dump(outputs, part)
+        os.replace(tmp_path, self.outputs_path(key))
+
+    def outputs(self, key: str) -> Optional[dict]:
+        try:
+            with open(self.outputs_path(key), encoding="utf-8") as source:
+                return json.load(source)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def preview_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def put_preview(self, key: str, image: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as part:
+            part.write(image)
+        os.replace(tmp_path, self.preview_path(key))
+
+    def preview(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.preview_path(key), "rb") as source:
+                return source.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, key: str) -> bool:
+        """Whether an artifact is cached, without counting a hit or refreshing its LRU position."""
+        return os.path.exists(self.path(key))
+
+    def pin(self, key: str) -> Optional[str]:
+        """
+        Hard-links an artifact to a private name that eviction never removes, so a response can
+        read it to the end; the caller removes the link. Returns None if the artifact is gone.
+        """
+        pinned = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.pin")
+        try:
+            os.link(self.path(key), pinned)
+        except FileNotFoundError:
+            return None
+        return pinned
+
+    def lookup(self, key: str) -> Optional[str]:
+        """The path of a cached artifact, counted as a hit or miss and moved to the LRU end."""
+        path = self.path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                # Evicted by another worker sharing the volume
+                self._forget(key)
+                self.stats["misses"] += 1
+                return None
+
+            if key not in self._index:
+                # Written by another worker sharing the volume
+                self._insert(key, os.path.getsize(path))
+            self._index.move_to_end(key)
+            self.stats["hits"] += 1
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def tee(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Yields chunks through while writing them to the cache; commits only complete files."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        complete = False
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as part:
+                async for chunk in chunks:
+                    part.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                payload_size.observe(size, kind="model")
+                self.commit(key, tmp_path)
+            else:
+                os.remove(tmp_path)
+
+    def commit(self, key: str, tmp_path: str):
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._forget(key)
+            self._insert(key, size)
+            self._evict()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._index), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".part"):
+                if time.time() - os.path.getmtime(path) > STALE_PART_SECONDS:
+                    os.remove(path)
+            elif name.endswith(".pin"):
+                # A pin shares the artifact's mtime; its ctime is when it was last linked
+                if time.time() - os.stat(path).st_ctime > STALE_PART_SECONDS:
+                    os.remove(path)
+            elif name.endswith(".glb"):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len(".glb")], stat.st_size))
+            elif name.endswith(SIDECAR_SUFFIXES) and not os.path.exists(os.path.splitext(path)[0] + ".glb"):
+                # Outputs or preview of a model evicted by another worker
+                os.remove(path)
+
+        for _, key, size in sorted(entries):
+            self._insert(key, size)
+        with self._lock:
+            self._evict()
+        logging.info(f"Artifact cache loaded {len(self._index)} entries ({self._total_bytes} bytes)")
+
+    def _insert(self, key: str, size: int):
+        self._index[key] = size
+        self._total_bytes += size
+
+    def _forget(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            for path in (self.path(key), self.outputs_path(key), self.preview_path(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+def get_artifact_cache() -> ArtifactCache:
+    global _artifact_cache
+    if _artifact_cache is None:
+        _artifact_cache = ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX_BYTES)
+    return _artifact_cache
@@ -0,0 +1,81 @@
+"""
+Benchmark of the embedding backends used by the memory subsystem.
+
+Each backend runs in a fresh subprocess so cold-start time and peak RSS are measured
+independently. Reports cold start (import + model load), single-query latency,
+per-text latency in a batch, and peak RSS.
+
+Usage (from fastapi-app/):
+    python -m benchmarks.embeddings [--backends torch onnx onnx-int8] [--threads 2]
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+PROMPTS = [
+    "a cyberpunk city skyline at night with neon reflections on wet streets",
+    "a small wooden boat on a calm lake at sunrise",
+    "a bio-organic spaceship hull covered in glowing veins",
+    "a medieval stone bridge overgrown with moss",
+]
+
+def measure(backend: str, threads: int, queries: int, batch_size: int) -> dict:
+    import time
+    import resource
+    import statistics
+
+    start = time.perf_counter()
+    from memory.embeddings import load_backend
+    embedder = load_backend(backend, threads)
+    cold_start = time.perf_counter() - start
+
+    embedder.encode(PROMPTS[:1])
+    single = []
+    for i in range(queries):
+        start = time.perf_counter()
+        embedder.encode([PROMPTS[i % len(PROMPTS)] + f" {i}"])
+        single.append(time.perf_counter() - start)
+
+    batch = [PROMPTS[i % len(PROMPTS)] + f" {i}" for i in range(batch_size)]
+    start = time.perf_counter()
+    embedder.encode(batch)
+    batched = (time.perf_counter() - start) / batch_size
+
+    return {
+        "backend": embedder.name,
+        "cold_start_s": cold_start,
+        "single_ms": statistics.median(single) * 1000,
+        "batched_ms_per_text": batched * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.threads, args.queries, args.batch_size)))
+        return
+
+    print(f"{'backend':<10} {'cold start':>10} {'single':>10} {'batched':>14} {'peak RSS':>10}")
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embeddings", "--child", backend, "--threads", str(args.threads),
+             "--queries", str(args.queries), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            print(f"{backend:<10} failed: {output.stderr.strip().splitlines()[-1:]}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{result['backend']:<10} {result['cold_start_s']:>9.2f}s {result['single_ms']:>8.2f}ms "
+              f"{result['batched_ms_per_text']:>8.2f}ms/text {result['peak_rss_mb']:>8.0f}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Local stand-in for the AI21 chat completions API, for load tests of /generate.
+
+Answers POST /studio/v1/chat/completions like Jamba would, after a configurable latency,
+with a configurable number of words. The expansion is derived from the user message so
+distinct prompts stay distinct downstream (artifact cache, coalescing). Point fastapi-app
+at it with AI21_API_HOST=http://127.0.0.1:9100 and any AI21_API_KEY.
+
+Usage (from fastapi-app/):
+    python -m benchmarks.fakes [--port 9100] [--latency 1.5] [--jitter 0.5] [--words 180]
+"""
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+VOCABULARY = (
+    "glowing crystalline towers weathered bronze mossy stone soft volumetric light rim lit silhouette "
+    "iridescent scales brushed steel foggy horizon warm amber tones cold teal shadows intricate filigree"
+).split()
+
+def create_app(latency: float, jitter: float, words: int, failure_rate: float) -> Starlette:
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+        if random.random() < failure_rate:
+            return JSONResponse({"detail": "Simulated upstream failure"}, status_code=503)
+
+        user_message = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        seed = int(hashlib.sha256(user_message.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        content = f"Scene {seed:x}: " + " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in body.get("messages", []))
+        return JSONResponse({
+            "id": uuid.uuid4().hex,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": words, "total_tokens": prompt_tokens + words},
+        })
+
+    return Starlette(routes=[Route("/studio/v1/chat/completions", chat_completions, methods=["POST"])])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=1.5, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per completion")
+    parser.add_argument("--words", type=int, default=180, help="words in each completion")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.jitter, args.words, args.failure_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+End-to-end load test of /generate against local fakes.
+
+Starts the fake AI21 API (benchmarks.fakes), two fake Openfabric apps
+(flask-app/benchmarks/fake_apps.py), flask-app and fastapi-app, wired together through
+AI21_API_HOST, FLASK_URL and PIPELINE_ATTACHMENTS, with long-term memory on an in-process
+Chroma (MEMORY_BACKEND=memory) and all state in a temporary directory. Then drives
+/generate at each concurrency level with unique prompts and reports latency percentiles,
+throughput, errors and the peak RSS of each service (process tree, sampled from /proc).
+
+The embedding model must already be in the local Hugging Face cache; flask-app needs its
+own dependencies, so pass --flask-python when it lives in another environment. With
+--external the services are not started and only --url is driven; pass --pids to still
+sample their memory.
+
+Usage (from fastapi-app/):
+    python -m benchmarks.load [--concurrency 1 4 16] [--requests 64] [--workers 2]
+                              [--ai21-latency 1.5] [--t2i-latency 2] [--i23d-latency 5]
+                              [--image-size 1048576] [--model-size 4194304]
+    python -m benchmarks.load --external --url http://127.0.0.1:8082 --pids fastapi=1234 flask=5678
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import argparse
+import threading
+import statistics
+import subprocess
+import httpx
+
+FASTAPI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FLASK_DIR = os.path.join(os.path.dirname(FASTAPI_DIR), "flask-app")
+FLASK_PORT = 8888  # fixed by flask-app/ignite.py
+
+def _children() -> dict:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as stat:
+                # The command name may contain spaces; fields resume after its closing parenthesis
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+def tree_rss(pid: int, children: dict) -> int:
+    """Resident memory in bytes of a process and all its descendants."""
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status", encoding="utf-8") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+class RssSampler(threading.Thread):
+    """Samples the RSS of each service's process tree and keeps the peak since the last reset."""
+
+    def __init__(self, pids: dict, interval: float = 0.2):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peaks = {name: 0 for name in pids}
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            children = _children()
+            for name, pid in self.pids.items():
+                self.peaks[name] = max(self.peaks[name], tree_rss(pid, children))
+
+    def reset(self) -> dict:
+        peaks, self.peaks = self.peaks, {name: 0 for name in self.pids}
+        return peaks
+
+    def stop(self):
+        self._stopped.set()
+
+def wait_for(url: str, timeout: float, process: subprocess.Popen = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+def wait_for_port(port: int, timeout: float, process: subprocess.Popen):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}")
+        with socket.socket() as probe:
+            if probe.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise TimeoutError(f"port {port} not open after {timeout}s")
+
+def start_services(args, state_dir: str) -> dict:
+    """Starts the fakes and both services; returns the processes by name."""
+    logs = open(args.log, "ab")
+    processes = {}
+
+    def spawn(name, command, cwd, env=None):
+        processes[name] = subprocess.Popen(command, cwd=cwd, env={**os.environ, **(env or {})},
+                                           stdout=logs, stderr=subprocess.STDOUT)
+        return processes[name]
+
+    ai21 = spawn("fake-ai21", [sys.executable, "-m", "benchmarks.fakes", "--port", str(args.ai21_port),
+                               "--latency", str(args.ai21_latency), "--words", str(args.words)], FASTAPI_DIR)
+    apps = []
+    for kind, port, latency, size in (("text_to_image", args.t2i_port, args.t2i_latency, args.image_size),
+                                      ("image_to_3d", args.i23d_port, args.i23d_latency, args.model_size)):
+        process = spawn(f"fake-{kind}", [args.flask_python, "-m", "benchmarks.fake_apps", "--kind", kind,
+                                         "--port", str(port), "--latency", str(latency),
+                                         "--payload-size", str(size)], FLASK_DIR)
+        apps.append(f"http://127.0.0.1:{port}")
+        wait_for(f"http://127.0.0.1:{port}/manifest", 60, process)
+    wait_for_port(args.ai21_port, 30, ai21)
+
+    flask = spawn("flask-app", [args.flask_python, "ignite.py"], FLASK_DIR)
+    wait_for_port(FLASK_PORT, 120, flask)
+
+    fastapi = spawn("fastapi-app", [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                    "--port", str(args.fastapi_port), "--workers", str(args.workers),
+                                    "--log-level", "warning"], FASTAPI_DIR, {
+        "AI21_API_HOST": f"http://127.0.0.1:{args.ai21_port}",
+        "AI21_API_KEY": "bench",
+        "FLASK_URL": f"http://127.0.0.1:{FLASK_PORT}",
+        "PIPELINE_ATTACHMENTS": ",".join(apps),
+        "MEMORY_BACKEND": "memory",
+        "ARTIFACT_CACHE_DIR": os.path.join(state_dir, "artifacts"),
+        "STM_DB_PATH": os.path.join(state_dir, "short_term_memory.db"),
+        "JOB_DB_PATH": os.path.join(state_dir, "jobs.db"),
+        "METRICS_DIR": os.path.join(state_dir, "metrics"),
+        "LOCAL_VECTOR_DIR": os.path.join(state_dir, "vectors"),
+        "TRACE_LOG": "false",
+    })
+    wait_for(f"http://127.0.0.1:{args.fastapi_port}/ready", 300, fastapi)
+    return processes
+
+async def drive(url: str, concurrency: int, requests: int, run_id: str, sessions: int, timeout: float) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, received = [], 0, 0
+
+    async def one(client: httpx.AsyncClient, i: int):
+        nonlocal errors, received
+        payload = {"session_id": f"bench-{i % sessions}", "user_prompt": f"a lighthouse on a cliff, variant {run_id}-{i}"}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with client.stream("POST", f"{url}/generate", json=payload) as response:
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                # Failures are reported as a JSON body with an "error" key
+                failed = response.status_code != 200 or response.headers.get("content-type", "").startswith("application/json")
+            except httpx.HTTPError:
+                failed, size = True, 0
+            elapsed = time.perf_counter() - start
+        if failed:
+            errors += 1
+        else:
+            latencies.append(elapsed)
+            received += size
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        wall = time.perf_counter() - start
+
+    return {"latencies": sorted(latencies), "errors": errors, "wall": wall, "bytes": received}
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=900)
+    parser.add_argument("--workers", type=int, default=2, help="fastapi-app uvicorn workers")
+    parser.add_argument("--flask-python", default=sys.executable, help="interpreter with flask-app's dependencies")
+    parser.add_argument("--fastapi-port", type=int, default=8082)
+    parser.add_argument("--ai21-port", type=int, default=9100)
+    parser.add_argument("--t2i-port", type=int, default=9101)
+    parser.add_argument("--i23d-port", type=int, default=9102)
+    parser.add_argument("--ai21-latency", type=float, default=1.5)
+    parser.add_argument("--words", type=int, default=180)
+    parser.add_argument("--t2i-latency", type=float, default=2.0)
+    parser.add_argument("--i23d-latency", type=float, default=5.0)
+    parser.add_argument("--image-size", type=int, default=1024 * 1024)
+    parser.add_argument("--model-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--external", action="store_true", help="drive already running services")
+    parser.add_argument("--url", default=None, help="fastapi-app base URL (default: the started instance)")
+    parser.add_argument("--pids", nargs="*", default=[], metavar="SERVICE=PID")
+    parser.add_argument("--log", default=os.path.join(tempfile.gettempdir(), "dimensa-bench.log"),
+                        help="output of the started processes")
+    args = parser.parse_args()
+
+    processes = {}
+    state = tempfile.TemporaryDirectory(prefix="dimensa-bench-")
+    url = args.url or f"http://127.0.0.1:{args.fastapi_port}"
+    try:
+        if args.external:
+            pids = {name: int(pid) for name, pid in (item.split("=", 1) for item in args.pids)}
+        else:
+            processes = start_services(args, state.name)
+            pids = {name: process.pid for name, process in processes.items() if name in ("fastapi-app", "flask-app")}
+
+        sampler = RssSampler(pids)
+        sampler.start()
+        rss_header = "".join(f" {name + ' RSS':>16}" for name in pids)
+        print(f"{'conc':>5} {'ok':>5} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7} {'MB/s':>7}{rss_header}")
+
+        run_id = f"{int(time.time())}"
+        for concurrency in args.concurrency:
+            sampler.reset()
+            result = drive(url, concurrency, args.requests, f"{run_id}-{concurrency}", args.sessions, args.timeout)
+            result = asyncio.run(result)
+            peaks = sampler.reset()
+
+            latencies = result["latencies"]
+            rss = "".join(f" {peaks[name] / 1024 ** 2:>14.0f}MB" for name in pids)
+            print(f"{concurrency:>5} {len(latencies):>5} {result['errors']:>5} "
+                  f"{percentile(latencies, 0.50):>7.2f}s {percentile(latencies, 0.95):>7.2f}s "
+                  f"{percentile(latencies, 0.99):>7.2f}s {len(latencies) / result['wall']:>7.2f} "
+                  f"{result['bytes'] / 1024 ** 2 / result['wall']:>7.1f}{rss}")
+            if latencies:
+                print(f"{'':>5} mean {statistics.mean(latencies):.2f}s, max {latencies[-1]:.2f}s, wall {result['wall']:.1f}s")
+        sampler.stop()
+    except (RuntimeError, TimeoutError) as e:
+        sys.exit(f"{e} (see {args.log})")
+    finally:
+        for process in reversed(list(processes.values())):
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        state.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of long-term memory retrieval as the collection grows.
+
+Fills an in-process Chroma collection with synthetic 384-d memories spread over many
+sessions and compares server-side session filtering with the global top-k search plus
+adaptive post-hoc filtering. Reports mean query latency and recall, where recall is the
+fraction of the true top-k same-session memories that were returned.
+
+Usage (from fastapi-app/):
+    python -m benchmarks.ltm_retrieval [--sizes 1000 10000 50000] [--sessions 500]
+"""
+import time
+import argparse
+import numpy as np
+import chromadb
+
+from memory.long_term_memory import query_memories
+
+DIM = 384
+
+def build_collection(size: int, sessions: int, rng: np.random.Generator):
+    client = chromadb.EphemeralClient()
+    name = f"bench_{size}"
+    if name in [col.name for col in client.list_collections()]:
+        client.delete_collection(name)
+    collection = client.create_collection(name, metadata={"hnsw:space": "cosine"})
+
+    embeddings = rng.standard_normal((size, DIM)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    session_ids = rng.integers(0, sessions, size)
+
+    batch = 5000
+    for start in range(0, size, batch):
+        end = min(start + batch, size)
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=embeddings[start:end].tolist(),
+            metadatas=[{"session_id": f"s{session_ids[i]}", "row": i} for i in range(start, end)]
+        )
+    return collection, embeddings, session_ids
+
+def exact_top_k(embeddings, session_ids, session: int, query, top_k: int):
+    rows = np.flatnonzero(session_ids == session)
+    scores = embeddings[rows] @ query
+    return set(rows[np.argsort(-scores)[:top_k]].tolist())
+
+def run(size: int, sessions: int, queries: int, top_k: int, rng: np.random.Generator):
+    collection, embeddings, session_ids = build_collection(size, sessions, rng)
+    query_vectors = rng.standard_normal((queries, DIM)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    query_sessions = rng.integers(0, sessions, queries)
+
+    for server_filter in (True, False):
+        latencies, recalls = [], []
+        for query, session in zip(query_vectors, query_sessions):
+            start = time.perf_counter()
+            memories = query_memories(collection, f"s{session}", [query], top_k, server_filter=server_filter)[0]
+            latencies.append(time.perf_counter() - start)
+
+            expected = exact_top_k(embeddings, session_ids, session, query, top_k)
+            if expected:
+                recalls.append(len({m["row"] for m in memories} & expected) / len(expected))
+
+        label = "where-filter" if server_filter else "post-filter"
+        print(f"{size:>8} {label:<13} {np.mean(latencies) * 1000:8.2f} ms  recall {np.mean(recalls):.3f}")
+
+    start = time.perf_counter()
+    query_memories(collection, f"s{query_sessions[0]}", query_vectors, top_k, server_filter=True)
+    print(f"{size:>8} {'batched':<13} {(time.perf_counter() - start) * 1000 / queries:8.2f} ms/query")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>8} {'mode':<13} {'latency':>11}")
+    for size in args.sizes:
+        run(size, args.sessions, args.queries, args.top_k, rng)
+
+if __name__ == "__main__":
+    main()
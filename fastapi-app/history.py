@@ -0,0 +1,143 @@
+import os
+import time
+import base64
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "/data/state/history.db")
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "24"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))
+
+_history = None
+_history_lock = threading.Lock()
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(created_at: float, entry_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}:{entry_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii").split(":")
+        return float(created_at), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+class HistoryStore:
+    """
+    Generation history per session in SQLite (WAL), shared by all worker processes.
+    Pages are read newest first by keyset pagination over (session_id, created_at, id),
+    so the cost of a page does not depend on how deep into the history it is. Thumbnails
+    are made from the model's source image before an entry is saved and kept in their own
+    table, out of the way of listing scans.
+    """
+
+    _SELECT = (
+        "SELECT g.id, g.created_at, g.user_prompt, g.expanded_prompt, g.model_key, g.model_size, g.optimization, "
+        "EXISTS (SELECT 1 FROM generation_thumbnails t WHERE t.generation_id = g.id) AS has_thumbnail "
+        "FROM generations g"
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS generations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                user_prompt TEXT NOT NULL,
+                expanded_prompt TEXT NOT NULL,
+                model_key TEXT NOT NULL,
+                model_size INTEGER NOT NULL,
+                optimization TEXT
+            );
+            CREATE INDEX IF NOT EXISTS generations_session ON generations (session_id, created_at, id);
+            CREATE INDEX IF NOT EXISTS generations_model_key ON generations (model_key);
+            CREATE TABLE IF NOT EXISTS generation_thumbnails (
+                generation_id INTEGER PRIMARY KEY REFERENCES generations (id) ON DELETE CASCADE,
+                image BLOB NOT NULL
+            );
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    def record(self, session_id: str, user_prompt: str, expanded_prompt: str, model_key: str, model_path: str,
+               optimization: Optional[str] = None, thumbnail: Optional[bytes] = None) -> dict:
+        """Saves a generation; without a thumbnail, the one of an earlier entry of the same model is reused."""
+        db = self._connection()
+        if thumbnail is None:
+            row = db.execute(
+                "SELECT t.image FROM generations g JOIN generation_thumbnails t ON t.generation_id = g.id "
+                "WHERE g.model_key = ? LIMIT 1", (model_key,)
+            ).fetchone()
+            thumbnail = row["image"] if row is not None else None
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = db.execute(
+                "INSERT INTO generations (session_id, created_at, user_prompt, expanded_prompt, model_key, model_size, "
+                "optimization) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, time.time(), user_prompt, expanded_prompt, model_key, os.path.getsize(model_path),
+                 optimization)
+            )
+            if thumbnail is not None:
+                db.execute("INSERT INTO generation_thumbnails (generation_id, image) VALUES (?, ?)",
+                           (cursor.lastrowid, thumbnail))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(session_id, cursor.lastrowid)
+
+    def get(self, session_id: str, entry_id: int) -> Optional[dict]:
+        row = self._connection().execute(
+            f"{self._SELECT} WHERE g.session_id = ? AND g.id = ?", (session_id, entry_id)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def page(self, session_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Returns up to limit entries older than the cursor, newest first, and the cursor of the next page."""
+        if cursor is None:
+            rows = self._connection().execute(
+                f"{self._SELECT} WHERE g.session_id = ? ORDER BY g.created_at DESC, g.id DESC LIMIT ?",
+                (session_id, limit + 1)
+            ).fetchall()
+        else:
+            created_at, entry_id = decode_cursor(cursor)
+            rows = self._connection().execute(
+                f"{self._SELECT} WHERE g.session_id = ? AND g.created_at <= ? AND (g.created_at < ? OR g.id < ?) "
+                "ORDER BY g.created_at DESC, g.id DESC LIMIT ?",
+                (session_id, created_at, created_at, entry_id, limit + 1)
+            ).fetchall()
+
+        entries = [dict(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(entries[-1]["created_at"], entries[-1]["id"]) if len(rows) > limit else None
+        return entries, next_cursor
+
+    def thumbnail(self, session_id: str, entry_id: int) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT t.image FROM generation_thumbnails t JOIN generations g ON g.id = t.generation_id "
+            "WHERE g.session_id = ? AND t.generation_id = ?", (session_id, entry_id)
+        ).fetchone()
+        return row["image"] if row is not None else None
+
+def get_history() -> HistoryStore:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = HistoryStore(HISTORY_DB_PATH)
+    return _history
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+from pools import run_in_memory_pool
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "/data/state/jobs.db")
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "86400"))
+# How often event streams re-read the store for jobs running in another worker process
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Each worker process renews the lease of its unfinished jobs this often; jobs whose lease is
+# older than JOB_LEASE_TIMEOUT belong to a process that died and are taken over by another one
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_LEASE_TIMEOUT = float(os.getenv("JOB_LEASE_TIMEOUT", "60"))
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+class JobQueueFull(Exception):
+    pass
+
+class JobStore:
+    """
+    Job state persisted in SQLite (WAL) so every worker process can answer status queries.
+    Unfinished jobs carry the owner that runs them and a lease renewed by its heartbeat.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                error TEXT,
+                result_key TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+        """)
+        columns = {row["name"] for row in self._connection().execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._connection().execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._connection().execute("CREATE INDEX IF NOT EXISTS jobs_unfinished ON jobs (status, heartbeat_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def create(self, session_id: str, request: dict, owner: str) -> dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        db = self._connection()
+        db.execute("DELETE FROM jobs WHERE created_at < ?", (now - JOB_RETENTION,))
+        db.execute(
+            "INSERT INTO jobs (id, session_id, request, status, created_at, updated_at, owner, heartbeat_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, session_id, json.dumps(request), now, now, owner, now)
+        )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields) -> dict:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connection().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        return job
+
+    def fail_unfinished(self, job_ids, error: str):
+        for job_id in job_ids:
+            self.update(job_id, status="failed", error=error)
+
+    def renew(self, owner: str):
+        self._connection().execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+            (time.time(), owner)
+        )
+
+    def orphans(self, stale_before: float) -> List[dict]:
+        """Unfinished jobs whose lease has expired, oldest first; rows from before leases count as expired."""
+        rows = self._connection().execute(
+            "SELECT id, status FROM jobs WHERE status IN ('queued', 'running') AND COALESCE(heartbeat_at, 0) < ? "
+            "ORDER BY created_at", (stale_before,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim(self, job_id: str, owner: str, stale_before: float) -> bool:
+        """Takes over an orphaned job; only one of several competing processes succeeds."""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET owner = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE id = ? AND status IN ('queued', 'running') AND COALESCE(heartbeat_at, 0) < ?",
+            (owner, now, now, job_id, stale_before)
+        )
+        return cursor.rowcount == 1
+
+class JobManager:
+    """
+    Runs generation jobs on a bounded pool of asyncio workers. Submissions beyond the
+    queue bound are rejected; each stage change is persisted and pushed to subscribers
+    of the job's event stream. Jobs left unfinished by a process that died are found by
+    their expired lease: queued ones are run here if there is room, running ones failed.
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[[dict, Callable[[str], Awaitable[None]]], Awaitable[str]],
+                 workers: int, max_queue: int):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.max_queue = max_queue
+        self.owner = uuid.uuid4().hex
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Queue slots held by submissions that are still writing their job to the store
+        self._reserved = 0
+        self._tasks = []
+        self._running = set()
+        self._subscribers = {}
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        pending = set(self._running)
+        while not self._queue.empty():
+            pending.add(self._queue.get_nowait())
+        await run_in_memory_pool(self.store.fail_unfinished, pending, "Interrupted by shutdown.")
+
+    async def submit(self, session_id: str, request: dict) -> dict:
+        if not self._reserve():
+            raise JobQueueFull()
+        try:
+            job = await run_in_memory_pool(self.store.create, session_id, request, self.owner)
+        finally:
+            self._reserved -= 1
+        self._queue.put_nowait(job["id"])
+        return job
+
+    def _reserve(self) -> bool:
+        # Checked and taken without an await in between, so concurrent submits cannot overfill the queue
+        if self._queue.qsize() + self._reserved >= self.max_queue:
+            return False
+        self._reserved += 1
+        return True
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await run_in_memory_pool(self.store.get, job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[dict]:
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            job = await self.get(job_id)
+            last_update = None
+            while job is not None:
+                if job["updated_at"] != last_update:
+                    last_update = job["updated_at"]
+                    yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    job = await self.get(job_id)
+        finally:
+            subscribers = self._subscribers.get(job_id, set())
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    async def _publish(self, job_id: str, **fields) -> dict:
+        job = await run_in_memory_pool(self.store.update, job_id, **fields)
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(job)
+        return job
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                await run_in_memory_pool(self.store.renew, self.owner)
+                await self._adopt_orphans()
+            except Exception:
+                # Keep renewing: a stopped heartbeat lets another process adopt and rerun this one's live jobs
+                logging.exception("Job lease renewal failed")
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+
+    async def _adopt_orphans(self):
+        stale_before = time.time() - JOB_LEASE_TIMEOUT
+        for orphan in await run_in_memory_pool(self.store.orphans, stale_before):
+            if orphan["status"] == "queued" and not self._reserve():
+                # Left for a process with room in its queue
+                continue
+            try:
+                claimed = await run_in_memory_pool(self.store.claim, orphan["id"], self.owner, stale_before)
+            finally:
+                if orphan["status"] == "queued":
+                    self._reserved -= 1
+            if not claimed:
+                continue
+            if orphan["status"] == "queued":
+                logging.info(f"Job {orphan['id']} was left queued by a stopped worker, running it here")
+                self._queue.put_nowait(orphan["id"])
+            else:
+                logging.warning(f"Job {orphan['id']} was interrupted by a stopped worker")
+                await self._publish(orphan["id"], status="failed", error="Interrupted by a worker restart.")
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._running.add(job_id)
+            try:
+                job = await self._publish(job_id, status="running")
+
+                async def progress(stage: str):
+                    await self._publish(job_id, stage=stage)
+
+                result_key = await self.runner(job, progress)
+                await self._publish(job_id, status="completed", stage="done", result_key=result_key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job {job_id} failed: {e}")
+                await self._publish(job_id, status="failed", error=str(e))
+            # Cancelled jobs stay in _running so stop() can mark them as interrupted
+            self._running.discard(job_id)
@@ -1,40 +1,221 @@
 import os
+import re
+import ast
 import json
+import time
 import httpx
-import base64
+import sqlite3
+import asyncio
 import logging
-from io import BytesIO
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, Query, Request
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Optional, Tuple
 from contextlib import asynccontextmanager
-from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask, BackgroundTasks
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from ai21 import AI21Client
+from ai21 import AsyncAI21Client
 from ai21.models.chat import ChatMessage
 
 from memory import long_term_memory as ltm, short_term_memory as stm
+from memory import context as memory_context
+from memory.expansion_cache import get_expansion_cache
+from pools import memory_pool, run_in_memory_pool
+from artifacts import get_artifact_cache
+from singleflight import SingleFlight
+import admission
+from ratelimit import RateLimiter
+from archives import ZipStream, entry_name
+import telemetry
+from telemetry import payload_size, request_id_var, span
+from history import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, InvalidCursor, get_history
+from previews import render_thumbnail
+from jobs import JOB_DB_PATH, JOB_QUEUE_MAX, JOB_WORKERS, JobManager, JobQueueFull, JobStore
 
-app = FastAPI()
+FLASK_URL = os.getenv("FLASK_URL", "http://flask-app:8888")
+FLASK_API_URL = f"{FLASK_URL}/execution"
+FLASK_RESOURCE_URL = FLASK_URL + "/resource?reid={reid}"
+MODEL_CHUNK_SIZE = int(os.getenv("MODEL_CHUNK_SIZE", str(64 * 1024)))
+# Text-to-image and image-to-3D app IDs; override with a comma-separated list (e.g. local stand-ins)
+PIPELINE_ATTACHMENTS = os.getenv(
+    "PIPELINE_ATTACHMENTS",
+    "c25dcd829d134ea98f5ae4dd311d13bc.node3.openfabric.network,"
+    "f0b5f319156c4819b9827000b17e511a.node3.openfabric.network"
+).split(",")
+FLASK_MAX_CONNECTIONS = int(os.getenv("FLASK_MAX_CONNECTIONS", "20"))
+FLASK_MAX_KEEPALIVE = int(os.getenv("FLASK_MAX_KEEPALIVE", "10"))
+FLASK_KEEPALIVE_EXPIRY = float(os.getenv("FLASK_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+JOB_FLASK_READ_TIMEOUT = float(os.getenv("JOB_FLASK_READ_TIMEOUT", "600"))
+WARMUP_LLM = os.getenv("WARMUP_LLM", "true").lower() == "true"
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))
+# Models are content-addressed, so browsers may reuse them without revalidating for this long
+MODEL_CACHE_MAX_AGE = int(os.getenv("MODEL_CACHE_MAX_AGE", str(24 * 3600)))
+MODEL_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# AI21 calls across all endpoints: requests per second (0 = unlimited) and burst; concurrency is the llm admission stage
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "5"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "64"))
+# Pipeline runs in flight per batch; flask-app and the Openfabric apps do the heavy lifting
+BATCH_PIPELINE_CONCURRENCY = int(os.getenv("BATCH_PIPELINE_CONCURRENCY", "4"))
+# flask-app generates at most this many candidates (prompt variants x seeds) per run
+MAX_VARIANTS = 8
 
-FLASK_API_URL = "http://flask-app:8888/execution"
-client = AI21Client(api_key=os.getenv('AI21_API_KEY'))
+client = AsyncAI21Client(api_key=os.getenv('AI21_API_KEY'), timeout_sec=LLM_TIMEOUT)
+
+llm_limiter = RateLimiter(LLM_RATE_LIMIT, LLM_RATE_BURST)
+expansion_flights = SingleFlight()
+pipeline_flights = SingleFlight()
+output_flights = SingleFlight()
+
+readiness = {"embedding_model": False, "memory_collection": False, "llm": not WARMUP_LLM}
+
+async def warm_up():
+    steps = {
+        "embedding_model": lambda: run_in_memory_pool(memory_context.warm_up),
+        "memory_collection": lambda: run_in_memory_pool(ltm.get_collection),
+        "llm": lambda: client.chat.completions.create(
+            model='jamba-large',
+            messages=[ChatMessage(role='user', content='ping')],
+            max_tokens=1
+        ),
+    }
+    while not all(readiness.values()):
+        for name, step in steps.items():
+            if readiness[name]:
+                continue
+            try:
+                await asyncio.wait_for(step(), timeout=LLM_TIMEOUT)
+                readiness[name] = True
+                logging.info(f"Warm-up step ready: {name}")
+            except Exception as e:
+                logging.warning(f"Warm-up step {name} failed, retrying: {e}")
+        if not all(readiness.values()):
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+    logging.info("All resources ready.")
 
 @asynccontextmanager
-async def lifespan():
-    logging.info("Preloading memory resources...")
-    _ = ltm.get_model()
-    _ = ltm.get_collection()
-    logging.info("Memory resources ready.")
+async def lifespan(app: FastAPI):
+    get_artifact_cache()
+    app.state.http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(connect=10, read=80, write=30, pool=5),
+        limits=httpx.Limits(
+            max_connections=FLASK_MAX_CONNECTIONS,
+            max_keepalive_connections=FLASK_MAX_KEEPALIVE,
+            keepalive_expiry=FLASK_KEEPALIVE_EXPIRY
+        )
+    )
+    ltm.get_writer().start()
+    app.state.jobs = JobManager(JobStore(JOB_DB_PATH), run_generation_job, JOB_WORKERS, JOB_QUEUE_MAX)
+    app.state.jobs.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    metrics_task = asyncio.create_task(flush_metrics())
     yield
     logging.info("Shutting down...")
+    warm_up_task.cancel()
+    metrics_task.cancel()
+    await app.state.jobs.stop()
+    await app.state.http_client.aclose()
+    await run_in_memory_pool(ltm.flush_long_term_memory)
+    memory_pool.shutdown(wait=True)
+
+async def flush_metrics():
+    while True:
+        await asyncio.sleep(telemetry.METRICS_FLUSH_INTERVAL)
+        try:
+            await run_in_memory_pool(telemetry.flush)
+        except OSError as e:
+            logging.warning(f"Failed to write metrics: {e}")
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    request_id = telemetry.new_request_id(request.headers.get("X-Request-ID"))
+    telemetry.http_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        # Label by route template so path parameters (job ids) do not create new series
+        matched = request.scope.get("route")
+        template = getattr(matched, "path", "unmatched")
+        telemetry.http_in_flight.dec()
+        telemetry.http_duration.observe(time.perf_counter() - start, route=template)
+        telemetry.http_requests.inc(method=request.method, route=template, status=status)
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded(request: Request, error: admission.Overloaded):
+    return JSONResponse(status_code=429, content={"error": str(error), "stage": error.stage},
+                        headers={"Retry-After": str(error.retry_after)})
+
+class Optimization(BaseModel):
+    """GLB post-processing in flask-app: vertex dedupe, KHR_mesh_quantization and LODs (vertex ratios)."""
+    dedupe: bool = True
+    quantize: bool = True
+    position_bits: int = Field(14, ge=8, le=16)
+    normal_bits: int = Field(8, ge=4, le=16)
+    uv_bits: int = Field(12, ge=4, le=16)
+    lods: List[Annotated[float, Field(gt=0, lt=1)]] = Field(default_factory=list, max_length=4)
 
 class GenerateRequest(BaseModel):
     session_id: str
     user_prompt: str
+    bypass_cache: bool = False
+    optimization: Optional[Optimization] = None
+    # Alternative prompts, expanded like user_prompt, and text-to-image seeds; every combination is generated
+    variants: List[str] = Field(default_factory=list, max_length=MAX_VARIANTS - 1)
+    seeds: List[int] = Field(default_factory=list, max_length=MAX_VARIANTS)
+
+    @model_validator(mode="after")
+    def check_candidates(self):
+        if any(not variant.strip() for variant in self.variants):
+            raise ValueError("Prompt variants must not be empty")
+        candidates = (1 + len(self.variants)) * max(len(self.seeds), 1)
+        if candidates > MAX_VARIANTS:
+            raise ValueError(f"{candidates} candidates requested (prompts x seeds), at most {MAX_VARIANTS} allowed")
+        return self
+
+class BatchRequest(BaseModel):
+    session_id: str
+    prompts: List[str] = Field(min_length=1, max_length=BATCH_MAX_PROMPTS)
+    bypass_cache: bool = False
+    optimization: Optional[Optimization] = None
+    # Every prompt is generated with each of these seeds
+    seeds: List[int] = Field(default_factory=list, max_length=MAX_VARIANTS)
+    # Stream one ZIP of the models and a manifest instead of NDJSON results
+    archive: bool = False
+
+class PipelineInput(BaseModel):
+    """What flask-app is asked to generate: the expanded prompt and its expanded variants."""
+    prompt: str
+    variants: List[str] = Field(default_factory=list)
+    seeds: List[int] = Field(default_factory=list)
+    optimization: Optional[Optimization] = None
+
+class FlaskVariant(BaseModel):
+    prompt: Optional[str] = None
+    seed: Optional[int] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    generated_model: Optional[str] = None
+    lods: Optional[List[str]] = None
 
 class FlaskResponse(BaseModel):
     generated_model: str
     message: str
+    # Resource IDs of the simplified models, one per Optimization.lods ratio
+    lods: Optional[List[str]] = None
+    # Resource ID of the text-to-image output the model was generated from
+    image: Optional[str] = None
+    variants: Optional[List[FlaskVariant]] = None
+
+class GenerationError(Exception):
+    pass
 
 @app.post("/generate")
 async def generate_model(request: GenerateRequest):
@@ -44,82 +225,649 @@ async def generate_model(request: GenerateRequest):
 
     if not user_prompt:
         return {"error": "No prompt provided"}
-    
-    memory_context = build_memory_context(session_id, user_prompt)
-    final_prompt = create_final_prompt(user_prompt, memory_context)
+    # Turn the request away before any work when the memory stage, which every request uses, has no room;
+    # the llm and pipeline stages admit it only if the expansion and the model are not cached
+    admission.check("memory")
 
     try:
-        ai21_response = client.chat.completions.create(
-            model='jamba-large',
-            messages=[
-                ChatMessage(role='system', content=SYSTEM_PROMPT),
-                ChatMessage(role='user', content=final_prompt)
-            ]
+        pipeline = await expand_pipeline(request)
+        expanded_prompt = pipeline.prompt
+
+        artifact_cache = get_artifact_cache()
+        cache_key = artifact_key(pipeline)
+        # A hit is pinned so an eviction before the file is opened cannot fail the response
+        cached_path = artifact_cache.lookup(cache_key) and artifact_cache.pin(cache_key)
+        if cached_path is None:
+            admission.check("pipeline")
+            model_response, result = await request_model(session_id, pipeline)
+    except GenerationError as e:
+        return {"error": str(e)}
+
+    await remember(session_id, user_prompt, expanded_prompt)
+
+    # The history entry is saved after the response, once the model is in the artifact cache
+    history_entry = (session_id, user_prompt, expanded_prompt, cache_key, request.optimization)
+    model_headers = {"X-Model-URL": f"/models/{cache_key}", "X-Outputs-URL": f"/models/{cache_key}/outputs"}
+    if cached_path is not None:
+        return PinnedFileResponse(cached_path, media_type="application/octet-stream", filename="model.glb",
+                                  headers=model_headers, background=BackgroundTask(record_generation, *history_entry))
+
+    # The model is addressable once the stream completes and the artifact is committed
+    headers = {"Content-Disposition": "attachment; filename=model.glb", **model_headers}
+    if "content-length" in model_response.headers and "content-encoding" not in model_response.headers:
+        headers["Content-Length"] = model_response.headers["content-length"]
+
+    # The other outputs of the run are fetched after the response, before the history entry that shows its preview
+    background = BackgroundTasks()
+    background.add_task(model_response.aclose)
+    background.add_task(cache_outputs, cache_key, result)
+    background.add_task(record_generation, *history_entry)
+    return StreamingResponse(
+        artifact_cache.tee(cache_key, model_response.aiter_bytes(MODEL_CHUNK_SIZE)),
+        media_type="application/octet-stream",
+        headers=headers,
+        background=background
         )
-        expanded_prompt = ai21_response.choices[0].message.content.strip()
+
+@app.post("/generate/batch")
+async def generate_batch(request: BatchRequest):
+    prompts = [prompt.strip() for prompt in request.prompts]
+    empty = [i for i, prompt in enumerate(prompts) if not prompt]
+    if empty:
+        return JSONResponse(status_code=400, content={"error": f"Empty prompts at indexes {empty}"})
+    admission.check("memory")
+
+    # Memory context for the whole batch: one embedding call, one long-term query
+    async with admission.stage("memory").slot(request.session_id):
+        with span("memory_context"):
+            contexts = await memory_context.build_memory_contexts(request.session_id, prompts)
+
+    items = [
+        GenerateRequest(session_id=request.session_id, user_prompt=prompt, bypass_cache=request.bypass_cache,
+                        optimization=request.optimization, seeds=request.seeds)
+        for prompt in prompts
+    ]
+    results = batch_results(items, contexts)
+    if request.archive:
+        return StreamingResponse(batch_archive(results), media_type="application/zip",
+                                 headers={"Content-Disposition": "attachment; filename=models.zip"})
+    return StreamingResponse(batch_ndjson(results), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: GenerateRequest):
+    if not request.user_prompt:
+        return JSONResponse(status_code=400, content={"error": "No prompt provided"})
+    try:
+        job = await app.state.jobs.submit(request.session_id, request.model_dump())
+    except JobQueueFull:
+        return JSONResponse(status_code=429, content={"error": "Too many queued jobs. Please try again later."},
+                            headers={"Retry-After": str(admission.retry_after("pipeline"))})
+    return job_view(job)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await app.state.jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job_view(job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    # An empty stream for an unknown job would have EventSource reconnect forever
+    if await app.state.jobs.get(job_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    async def stream():
+        async for job in app.state.jobs.events(job_id):
+            yield f"event: {job['status']}\ndata: {json.dumps(job_view(job))}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, request: Request):
+    job = await app.state.jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    if job["status"] != "completed":
+        return JSONResponse(status_code=409, content={"error": f"Job is {job['status']}"})
+
+    if not get_artifact_cache().exists(job["result_key"]):
+        return JSONResponse(status_code=410, content={"error": "The generated model has expired."})
+    return model_file(job["result_key"], request, True, "model.glb")
+
+@app.api_route("/models/{model_id}", methods=["GET", "HEAD"])
+async def get_model(model_id: str, request: Request, download: bool = False):
+    if not MODEL_ID_PATTERN.match(model_id):
+        return JSONResponse(status_code=404, content={"error": "Model not found"})
+    return model_file(model_id, request, download, "model.glb")
+
+@app.api_route("/models/{model_id}/lods/{level}", methods=["GET", "HEAD"])
+async def get_model_lod(model_id: str, level: int, request: Request, download: bool = False):
+    if not MODEL_ID_PATTERN.match(model_id):
+        return JSONResponse(status_code=404, content={"error": "Model not found"})
+    return model_file(lod_key(model_id, level), request, download, f"model-lod{level}.glb")
+
+@app.get("/models/{model_id}/outputs")
+async def model_outputs(model_id: str):
+    artifact_cache = get_artifact_cache()
+    if not MODEL_ID_PATTERN.match(model_id) or not artifact_cache.exists(model_id):
+        return JSONResponse(status_code=404, content={"error": "Model not found"})
+    outputs = (await run_in_memory_pool(load_outputs, [model_id]))[0]
+    return outputs_view(model_id, outputs)
+
+def model_file(key: str, request: Request, download: bool, filename: str) -> Response:
+    """Serves a cached model; viewing it is not a cache hit and does not refresh its LRU position."""
+    artifact_cache = get_artifact_cache()
+    try:
+        stat = os.stat(artifact_cache.path(key))
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Model not found"})
+
+    # Cache hits refresh the mtime for LRU, so the validator uses the inode, which changes on every commit
+    etag = f'"{key[:16]}-{stat.st_ino:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={MODEL_CACHE_MAX_AGE}",
+        # model-viewer fetches the file from the Streamlit page's origin
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Accept-Ranges, Content-Length, Content-Range, ETag",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers=headers)
+
+    # A model evicted after the stat is still read to the end through its pin
+    if request.method == "HEAD":
+        path, response_class = artifact_cache.path(key), FileResponse
+    else:
+        path, response_class = artifact_cache.pin(key), PinnedFileResponse
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Model not found"})
+
+    # FileResponse answers Range and If-Range requests with 206 partial content
+    return response_class(path, media_type="model/gltf-binary", headers=headers, stat_result=stat,
+                          filename=filename if download else None,
+                          content_disposition_type="attachment" if download else "inline")
+
+class PinnedFileResponse(FileResponse):
+    """Serves a pinned artifact (see ArtifactCache.pin) and removes the pin once the response is over."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            os.remove(self.path)
+
+@app.get("/sessions/{session_id}/history")
+async def generation_history(session_id: str, cursor: Optional[str] = None,
+                             limit: Annotated[int, Query(ge=1, le=HISTORY_MAX_PAGE_SIZE)] = HISTORY_PAGE_SIZE):
+    try:
+        entries, next_cursor = await run_in_memory_pool(get_history().page, session_id, limit, cursor)
+    except InvalidCursor as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    outputs = await run_in_memory_pool(load_outputs, [entry["model_key"] for entry in entries])
+    items = [history_view(session_id, entry, entry_outputs) for entry, entry_outputs in zip(entries, outputs)]
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/sessions/{session_id}/history/{entry_id}/thumbnail")
+async def generation_thumbnail(session_id: str, entry_id: int):
+    image = await run_in_memory_pool(get_history().thumbnail, session_id, entry_id)
+    if image is None:
+        return JSONResponse(status_code=404, content={"error": "Thumbnail not found"})
+    # Entries never change, so neither do their thumbnails
+    return Response(image, media_type="image/jpeg", headers={
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Access-Control-Allow-Origin": "*",
+    })
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check():
+    if all(readiness.values()):
+        return {"status": "ready", "checks": readiness}
+    return JSONResponse(status_code=503, content={"status": "warming up", "checks": readiness})
+
+@app.get("/metrics")
+async def metrics():
+    body = await run_in_memory_pool(telemetry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def stats():
+    return {
+        "artifacts": get_artifact_cache().snapshot(),
+        "expansions": get_expansion_cache().snapshot(),
+        "summaries": memory_context.get_summaries().snapshot(),
+        "memory_writes": ltm.get_writer().snapshot(),
+        "embeddings": ltm.get_model().snapshot(),
+        "llm_rate_limit": llm_limiter.snapshot(),
+        "admission": admission.snapshot(),
+        "coalescing": {
+            "expansions": expansion_flights.snapshot(),
+            "pipelines": pipeline_flights.snapshot()
+        }
+    }
+
+
+
+def job_view(job: dict) -> dict:
+    view = {key: job[key] for key in ("id", "status", "stage", "error", "created_at", "updated_at")}
+    if job["status"] == "completed":
+        view["result_url"] = f"/jobs/{job['id']}/result"
+        view["model_url"] = f"/models/{job['result_key']}"
+        view["outputs_url"] = f"/models/{job['result_key']}/outputs"
+    return view
+
+def outputs_view(model_id: str, outputs: Optional[dict]) -> dict:
+    """The LODs of the model and every candidate of the run that produced it, with their LODs."""
+    outputs = outputs or {}
+    variants = []
+    for variant in outputs.get("variants", []):
+        view = {key: variant.get(key) for key in ("prompt", "seed", "status", "error")}
+        view["model_url"] = f"/models/{variant['model_id']}" if variant.get("model_id") else None
+        view["lod_urls"] = lod_urls(variant["model_id"], variant.get("lods")) if variant.get("model_id") else []
+        variants.append(view)
+    return {"model_url": f"/models/{model_id}", "lod_urls": lod_urls(model_id, outputs.get("lods")),
+            "variants": variants}
+
+def load_outputs(model_ids: List[str]) -> List[Optional[dict]]:
+    """The outputs of each model, without the LODs and variant models evicted since they were cached."""
+    artifact_cache = get_artifact_cache()
+    return [cached_outputs(model_id, artifact_cache.outputs(model_id)) for model_id in model_ids]
+
+def cached_outputs(model_id: str, outputs: Optional[dict]) -> Optional[dict]:
+    # Derived artifacts are separate LRU entries and can be evicted before the model they belong to
+    if outputs is None:
+        return None
+    artifact_cache = get_artifact_cache()
+    variants = []
+    for variant in outputs.get("variants", []):
+        if variant.get("model_id") and not artifact_cache.exists(variant["model_id"]):
+            variant = {**variant, "model_id": None, "lods": [], "status": "failed",
+                       "error": "The generated model has expired."}
+        elif variant.get("model_id"):
+            variant = {**variant, "lods": cached_lods(variant["model_id"], variant.get("lods"))}
+        variants.append(variant)
+    return {**outputs, "lods": cached_lods(model_id, outputs.get("lods")), "variants": variants}
+
+def cached_lods(model_id: str, levels: Optional[List[int]]) -> List[int]:
+    artifact_cache = get_artifact_cache()
+    return [level for level in levels or [] if artifact_cache.exists(lod_key(model_id, level))]
+
+def lod_urls(model_id: str, levels: Optional[List[int]]) -> List[str]:
+    return [f"/models/{model_id}/lods/{level}" for level in levels or []]
+
+def history_view(session_id: str, entry: dict, outputs: Optional[dict]) -> dict:
+    view = {key: entry[key] for key in ("id", "created_at", "user_prompt", "expanded_prompt", "model_size")}
+    view["optimization"] = json.loads(entry["optimization"]) if entry["optimization"] else None
+    view["model_url"] = f"/models/{entry['model_key']}"
+    view["lod_urls"] = lod_urls(entry["model_key"], (outputs or {}).get("lods"))
+    view["outputs_url"] = f"/models/{entry['model_key']}/outputs"
+    view["thumbnail_url"] = f"/sessions/{session_id}/history/{entry['id']}/thumbnail" if entry["has_thumbnail"] else None
+    return view
+
+async def run_generation_job(job: dict, progress) -> str:
+    request = GenerateRequest(**job["request"])
+    request_id_var.set(job["id"])
+
+    # Admitted by the job queue: wait for stage slots rather than failing the job
+    await progress("prompt_expansion")
+    pipeline = await expand_pipeline(request, bounded=False)
+    expanded_prompt = pipeline.prompt
+
+    cache_key = await cache_model(request.session_id, pipeline, progress, bounded=False)
+
+    await progress("memory_save")
+    await remember(request.session_id, request.user_prompt, expanded_prompt)
+    await record_generation(request.session_id, request.user_prompt, expanded_prompt, cache_key, request.optimization)
+    return cache_key
+
+async def cache_model(session_id: str, pipeline: PipelineInput, progress=None, bounded: bool = True) -> str:
+    """Runs the pipeline unless the model is already cached and stores its outputs in the artifact cache; returns its key."""
+    artifact_cache = get_artifact_cache()
+    cache_key = artifact_key(pipeline)
+    if artifact_cache.lookup(cache_key) is None:
+        if progress:
+            await progress("model_generation")
+        model_response, result = await request_model(session_id, pipeline, read_timeout=JOB_FLASK_READ_TIMEOUT,
+                                                     bounded=bounded)
+
+        if progress:
+            await progress("model_transfer")
+        try:
+            await store_model(cache_key, model_response)
+        except httpx.HTTPError as e:
+            logging.error(f"Model transfer for {cache_key} failed: {e}")
+            raise GenerationError("Failed to fetch the generated model from Flask service.")
+        await cache_outputs(cache_key, result)
+    return cache_key
+
+async def store_model(key: str, model_response: httpx.Response):
+    try:
+        async for _ in get_artifact_cache().tee(key, model_response.aiter_bytes(MODEL_CHUNK_SIZE)):
+            pass
+    finally:
+        await model_response.aclose()
+
+async def cache_outputs(cache_key: str, result: FlaskResponse):
+    # Requests coalesced on one run share its result, so its variants are fetched once
+    await output_flights.do(cache_key, lambda: fetch_outputs(cache_key, result))
+
+async def fetch_outputs(cache_key: str, result: FlaskResponse):
+    """
+    Caches the other outputs of a run and lists them in the model's outputs file: the variant
+    models, under keys derived from the model's, and the LODs of every model. The first
+    completed variant is the model itself and is not fetched again.
+    """
+    artifact_cache = get_artifact_cache()
+    if not artifact_cache.exists(cache_key):
+        # The model itself never made it into the cache
+        return
+
+    if result.image and not os.path.exists(artifact_cache.preview_path(cache_key)):
+        await fetch_preview(cache_key, result.image)
+    outputs = {"lods": await fetch_lods(cache_key, result.lods), "variants": []}
+    primary = True
+    for index, variant in enumerate(result.variants or []):
+        entry = variant.model_dump(exclude={"generated_model", "lods"})
+        if variant.status == "completed" and primary:
+            entry.update(model_id=cache_key, lods=outputs["lods"])
+            primary = False
+        elif variant.status == "completed" and variant.generated_model:
+            model_id = artifact_cache.derived_key(cache_key, f"variant-{index}")
+            if await fetch_artifact(model_id, variant.generated_model):
+                entry.update(model_id=model_id, lods=await fetch_lods(model_id, variant.lods))
+            else:
+                entry.update(status="failed", error="Failed to fetch the generated model from Flask service.")
+        outputs["variants"].append(entry)
+
+    try:
+        await run_in_memory_pool(artifact_cache.put_outputs, cache_key, outputs)
+    except OSError as e:
+        logging.error(f"Failed to save the outputs of {cache_key}: {e}")
+
+async def fetch_lods(model_id: str, reids: Optional[List[str]]) -> List[int]:
+    """Caches the LODs of a model under keys derived from its own; returns the levels that were fetched."""
+    levels = []
+    for level, reid in enumerate(reids or []):
+        if await fetch_artifact(lod_key(model_id, level), reid):
+            levels.append(level)
+    return levels
+
+async def fetch_artifact(key: str, reid: str) -> bool:
+    if get_artifact_cache().exists(key):
+        return True
+    try:
+        await store_model(key, await open_model_stream(reid))
+    except httpx.HTTPError as e:
+        logging.error(f"Failed to fetch resource {reid} for {key}: {e}")
+        return False
+    return True
+
+async def fetch_preview(cache_key: str, reid: str):
+    """Makes the model's thumbnail from its source image, off the request path."""
+    try:
+        image_response = await app.state.http_client.get(FLASK_RESOURCE_URL.format(reid=reid))
+        image_response.raise_for_status()
+    except httpx.HTTPError as e:
+        logging.error(f"Failed to fetch the source image of {cache_key}: {e}")
+        return
+    thumbnail = await run_in_memory_pool(render_thumbnail, image_response.content)
+    if thumbnail is not None:
+        try:
+            await run_in_memory_pool(get_artifact_cache().put_preview, cache_key, thumbnail)
+        except OSError as e:
+            logging.error(f"Failed to save the preview of {cache_key}: {e}")
+
+def lod_key(model_id: str, level: int) -> str:
+    return get_artifact_cache().derived_key(model_id, f"lod-{level}")
+
+async def run_batch_item(index: int, request: GenerateRequest, memory_context: str,
+                         pipeline_slots: asyncio.Semaphore) -> dict:
+    result = {"index": index, "user_prompt": request.user_prompt}
+    try:
+        pipeline = await expand_pipeline(request, memory_context)
+        expanded_prompt = pipeline.prompt
+        async with pipeline_slots:
+            cache_key = await cache_model(request.session_id, pipeline)
+        await remember(request.session_id, request.user_prompt, expanded_prompt)
+        await record_generation(request.session_id, request.user_prompt, expanded_prompt, cache_key,
+                                request.optimization)
+    except GenerationError as e:
+        return {**result, "status": "failed", "error": str(e)}
+    except admission.Overloaded as e:
+        return {**result, "status": "failed", "error": str(e), "retry_after": e.retry_after}
+    except Exception as e:
+        logging.exception(f"Batch item {index} failed: {e}")
+        return {**result, "status": "failed", "error": "Unexpected error."}
+    return {**result, "status": "completed", "model_id": cache_key, "model_url": f"/models/{cache_key}",
+            "outputs_url": f"/models/{cache_key}/outputs"}
+
+async def batch_results(items: List[GenerateRequest], contexts: List[str]):
+    """Yields item results in completion order; expansions are rate limited, pipeline runs bounded."""
+    pipeline_slots = asyncio.Semaphore(BATCH_PIPELINE_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(run_batch_item(i, item, context, pipeline_slots))
+        for i, (item, context) in enumerate(zip(items, contexts))
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # The client went away: stop the rest of the batch
+        for task in tasks:
+            task.cancel()
+
+async def batch_ndjson(results):
+    counts = {"completed": 0, "failed": 0}
+    async for result in results:
+        counts[result["status"]] += 1
+        yield json.dumps(result) + "\n"
+    yield json.dumps({"done": True, **counts}) + "\n"
+
+async def batch_archive(results):
+    archive, manifest = ZipStream(), []
+    async for result in results:
+        if result["status"] == "completed":
+            name = entry_name(result["index"], result["user_prompt"], "glb")
+            try:
+                # The model stays readable once opened, even if it is evicted meanwhile
+                async for chunk in archive.add_file(name, get_artifact_cache().path(result["model_id"])):
+                    yield chunk
+                result["file"] = name
+            except FileNotFoundError:
+                result = {**result, "status": "failed", "error": "The generated model has expired."}
+        manifest.append(result)
+
+    manifest.sort(key=lambda result: result["index"])
+    yield archive.add_bytes("manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+    yield archive.close()
+
+async def expand_pipeline(request: GenerateRequest, memory_context: Optional[str] = None,
+                          bounded: bool = True) -> PipelineInput:
+    """
+    Expands the prompt and each of its variants over the same memory context. bounded=False
+    waits for admission slots without the queue bound and wait limit (work admitted elsewhere).
+    """
+    if memory_context is None:
+        memory_context = await build_memory_context(request.session_id, request.user_prompt, bounded)
+    prompts = await asyncio.gather(*(
+        expand_request(request.model_copy(update={"user_prompt": prompt}), memory_context, bounded)
+        for prompt in [request.user_prompt, *request.variants]
+    ))
+    return PipelineInput(prompt=prompts[0], variants=prompts[1:], seeds=request.seeds,
+                         optimization=request.optimization)
+
+async def expand_request(request: GenerateRequest, memory_context: Optional[str] = None,
+                         bounded: bool = True) -> str:
+    if memory_context is None:
+        memory_context = await build_memory_context(request.session_id, request.user_prompt, bounded)
+
+    # Identical prompts over the same memory context share one expansion
+    key = flight_key(get_expansion_cache().key(request.user_prompt, memory_context), bounded)
+    if request.bypass_cache:
+        key += ":bypass"
+    return await expansion_flights.do(
+        key, lambda: expand_with_cache(request.session_id, request.user_prompt, memory_context, request.bypass_cache,
+                                       bounded)
+    )
+
+def flight_key(key: str, bounded: bool) -> str:
+    # The leader's admission applies to every coalesced caller, so bounded and unbounded calls never share a flight
+    return key if bounded else key + ":unbounded"
+
+async def expand_with_cache(session_id: str, user_prompt: str, memory_context: str, bypass_cache: bool,
+                            bounded: bool = True) -> str:
+    expansion_cache = get_expansion_cache()
+    if not bypass_cache:
+        expanded_prompt = await run_in_memory_pool(expansion_cache.get, user_prompt, memory_context)
+        if expanded_prompt is not None:
+            return expanded_prompt
+
+    final_prompt = create_final_prompt(user_prompt, memory_context)
+    try:
+        expanded_prompt = await expand_prompt(session_id, final_prompt, bounded)
+    except admission.Overloaded:
+        raise
+    except asyncio.TimeoutError:
+        logging.error(f"AI21 API timed out after {LLM_TIMEOUT}s")
+        raise GenerationError("AI21 generation timed out.")
     except Exception as e:
         logging.error(f"AI21 API failed: {e}")
-        return {"error": "AI21 generation failed."}
-    
+        raise GenerationError("AI21 generation failed.")
+
+    await run_in_memory_pool(expansion_cache.put, user_prompt, memory_context, expanded_prompt)
+    return expanded_prompt
+
+def artifact_key(pipeline: PipelineInput) -> str:
+    # An optimized model, or one picked among variants, is a different artifact from the raw pipeline output
+    parts = list(PIPELINE_ATTACHMENTS)
+    if pipeline.optimization is not None:
+        parts.append(pipeline.optimization.model_dump_json())
+    if pipeline.variants or pipeline.seeds:
+        parts.append(json.dumps({"variants": pipeline.variants, "seeds": pipeline.seeds}))
+    return get_artifact_cache().key(pipeline.prompt, parts)
+
+async def request_model(session_id: str, pipeline: PipelineInput, read_timeout: float = None,
+                        bounded: bool = True) -> Tuple[httpx.Response, FlaskResponse]:
+    # Identical expansions share one pipeline run, admitted once; each caller streams the resulting resource
+    async def admitted_pipeline() -> FlaskResponse:
+        async with admission.stage("pipeline").slot(session_id, bounded):
+            return await run_pipeline(pipeline, read_timeout)
+
+    result = await pipeline_flights.do(flight_key(artifact_key(pipeline), bounded), admitted_pipeline)
+
+    try:
+        with span("model_fetch"):
+            return await open_model_stream(result.generated_model), result
+    except httpx.HTTPError as e:
+        logging.error(f"Failed to open model resource {result.generated_model}: {e}")
+        raise GenerationError("Failed to fetch the generated model from Flask service.")
+
+async def run_pipeline(pipeline: PipelineInput, read_timeout: float = None) -> FlaskResponse:
+    extra = {}
+    if read_timeout is not None:
+        extra["timeout"] = httpx.Timeout(connect=10, read=read_timeout, write=30, pool=5)
+
     try:
-        timeout_config = httpx.Timeout(connect=10, read=80, write=30, pool=5)
-        async with httpx.AsyncClient(timeout=timeout_config) as async_client:
-            flask_response = await async_client.post(
+        with span("flask_round_trip"):
+            flask_response = await app.state.http_client.post(
                 FLASK_API_URL,
                 json={
-                    "attachments": [
-                        "c25dcd829d134ea98f5ae4dd311d13bc.node3.openfabric.network",
-                        "f0b5f319156c4819b9827000b17e511a.node3.openfabric.network"
-                    ],
-                    "prompt": expanded_prompt
-                }
+                    "attachments": PIPELINE_ATTACHMENTS,
+                    "prompt": pipeline.prompt,
+                    # Variants replace the prompt in flask-app, so the prompt itself is the first one
+                    "variants": [pipeline.prompt, *pipeline.variants] if pipeline.variants else None,
+                    "seeds": pipeline.seeds or None,
+                    "optimization": pipeline.optimization.model_dump() if pipeline.optimization else None,
+                    "request_id": request_id_var.get()
+                },
+                headers={"X-Request-ID": request_id_var.get()},
+                **extra
             )
-        flask_json = flask_response.text.replace("'", '"')
-        flask_data = FlaskResponse.model_validate(json.loads(flask_json))
+        payload_size.observe(len(flask_response.content), kind="flask_response")
+        return FlaskResponse.model_validate(parse_flask_body(flask_response))
 
     except httpx.TimeoutException as te:
         logging.error(f"Timeout when calling Flask API: {te}")
-        return {"error": "The model generation process timeout. Please try again."}
-    
+        raise GenerationError("The model generation process timeout. Please try again.")
+
     except httpx.RequestError as re:
         logging.error(f"HTTPX Request error calling flask API: {re}")
-        return {"error": "A network occurred when contacting the model generation service."}
-    
+        raise GenerationError("A network occurred when contacting the model generation service.")
+
     except Exception as e:
         logging.error(f"Unexpected Flask API error: {e}")
-        return {"error": "Failed to get valid response from Flask service."}
-    
-    stm.add_to_short_term_memory(session_id, user_prompt, expanded_prompt)
-    ltm.save_to_long_term_memory(session_id, user_prompt, expanded_prompt)
-        
-    model_data = base64.b64decode(flask_data.generated_model)
-    model_stream = BytesIO(model_data)
-    model_stream.seek(0)
+        raise GenerationError("Failed to get valid response from Flask service.")
 
-    return StreamingResponse(
-        model_stream,
-        media_type="application/octet-stream",
-        headers={"Content-Disposition": "attachment; filename=model.glb"}
-        )
-    
-@app.get("/health")
-def health_check():
-    return {"status": "ok"}
+async def remember(session_id: str, user_prompt: str, expanded_prompt: str):
+    # The model is already generated, so the turn waits for a slot rather than being dropped
+    async with admission.stage("memory").slot(session_id, bounded=False):
+        with span("memory_save"):
+            await run_in_memory_pool(stm.add_to_short_term_memory, session_id, user_prompt, expanded_prompt)
+            await run_in_memory_pool(ltm.save_to_long_term_memory, session_id, user_prompt, expanded_prompt)
 
+async def record_generation(session_id: str, user_prompt: str, expanded_prompt: str, cache_key: str,
+                            optimization: Optional[Optimization]):
+    artifact_cache = get_artifact_cache()
+    if not artifact_cache.exists(cache_key):
+        # The stream was interrupted before the artifact was committed
+        logging.warning(f"Model {cache_key} is not cached; not adding it to the history of {session_id}")
+        return
 
+    try:
+        with span("history_save"):
+            thumbnail = await run_in_memory_pool(artifact_cache.preview, cache_key)
+            await run_in_memory_pool(get_history().record, session_id, user_prompt, expanded_prompt, cache_key,
+                                     artifact_cache.path(cache_key),
+                                     optimization.model_dump_json() if optimization else None, thumbnail)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Failed to save generation history for {session_id}: {e}")
 
-def build_memory_context(session_id: str, user_prompt: str) -> str:
-    context = ""
+def parse_flask_body(flask_response: httpx.Response) -> dict:
+    try:
+        return flask_response.json()
+    except ValueError:
+        # The execution endpoint may answer with the Python repr of the output
+        return ast.literal_eval(flask_response.text)
 
-    if any(phrase in user_prompt for phrase in ["like the one", "like that one", "as before", "similar to"]):
-        short_term = stm.get_short_term_memory(session_id)
-        if short_term:
-            context += f"\nPrevious prompt: {short_term['user_prompt']}\nPrevious response: {short_term['assistant_response']}"
+async def open_model_stream(reid: str) -> httpx.Response:
+    http_client = app.state.http_client
+    model_request = http_client.build_request("GET", FLASK_RESOURCE_URL.format(reid=reid))
+    model_response = await http_client.send(model_request, stream=True)
+    if model_response.is_error:
+        await model_response.aclose()
+        model_response.raise_for_status()
+    return model_response
 
-        long_term = ltm.get_long_term_memory(session_id, user_prompt)
-        for i, mem in enumerate(long_term):
-            context += f"\nPast memory {i+1} - Prompt: {mem['user_prompt']}\nResponse: {mem['assistant_response']}\n"
+async def expand_prompt(session_id: str, final_prompt: str, bounded: bool = True) -> str:
+    # Admission and the rate limit apply to every AI21 call; the span measures the call itself
+    async with admission.stage("llm").slot(session_id, bounded):
+        await llm_limiter.acquire()
+        with span("ai21"):
+            ai21_response = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model='jamba-large',
+                    messages=[
+                        ChatMessage(role='system', content=SYSTEM_PROMPT),
+                        ChatMessage(role='user', content=final_prompt)
+                    ]
+                ),
+                timeout=LLM_TIMEOUT
+            )
+    expanded_prompt = ai21_response.choices[0].message.content.strip()
+    payload_size.observe(len(expanded_prompt.encode("utf-8")), kind="expanded_prompt")
+    return expanded_prompt
 
+async def build_memory_context(session_id: str, user_prompt: str, bounded: bool = True) -> str:
+    async with admission.stage("memory").slot(session_id, bounded):
+        with span("memory_context"):
+            context = await memory_context.build_memory_context(session_id, user_prompt)
+    payload_size.observe(len(context.encode("utf-8")), kind="memory_context")
     return context
 
 def create_final_prompt(user_prompt: str, memory_context: str) -> str:
@@ -0,0 +1,259 @@
+import os
+import re
+import math
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime
+from collections import OrderedDict
+from typing import List, Optional
+
+from memory import long_term_memory as ltm, short_term_memory as stm
+from pools import run_in_memory_pool
+
+# Upper bound on the memory context sent to the LLM, in (estimated) tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "400"))
+# Cosine similarity between a prompt window and a reference exemplar that counts as "refers to earlier work"
+CONTEXT_INTENT_THRESHOLD = float(os.getenv("CONTEXT_INTENT_THRESHOLD", "0.55"))
+# Memories less similar than this to the current prompt are dropped, unless they are the latest turn
+CONTEXT_MIN_RELEVANCE = float(os.getenv("CONTEXT_MIN_RELEVANCE", "0.2"))
+# Memories whose prompts are at least this similar are duplicates; the better scored one is kept
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.92"))
+CONTEXT_STM_TURNS = int(os.getenv("CONTEXT_STM_TURNS", "3"))
+CONTEXT_LTM_CANDIDATES = int(os.getenv("CONTEXT_LTM_CANDIDATES", "6"))
+# Score bonus of the latest turn, halved for each older one
+CONTEXT_RECENCY_WEIGHT = float(os.getenv("CONTEXT_RECENCY_WEIGHT", "0.3"))
+# Responses longer than CONTEXT_SUMMARY_TOKENS are replaced by cached extractive summaries; off truncates instead
+CONTEXT_SUMMARIES = os.getenv("CONTEXT_SUMMARIES", "true").lower() == "true"
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "80"))
+CONTEXT_SUMMARY_CACHE_SIZE = int(os.getenv("CONTEXT_SUMMARY_CACHE_SIZE", "2048"))
+
+INTENT_WINDOW = 5
+INTENT_MAX_WINDOWS = 24
+REFERENCE_EXEMPLARS = [
+    "like the one before",
+    "similar to the previous one",
+    "same as last time",
+    "as before but different",
+    "make another one like that",
+    "use the same style as before",
+    "a variation of my last model",
+    "change the previous one",
+    "make it bigger",
+    "make it a different color",
+    "the dragon I made earlier",
+    "again but with more detail",
+]
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+_summaries = None
+_exemplars = None
+_exemplars_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text with the Jamba tokenizer
+    return math.ceil(len(text) / 4)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4].rsplit(" ", 1)[0]
+    return cut.rstrip(",;:") + "..."
+
+class SummaryCache:
+    """
+    LRU cache of extractive summaries of long responses, keyed by the response hash.
+    A summary keeps the sentences closest to the response's mean embedding, in their
+    original order, up to max_tokens, so it is deterministic and costs no LLM call.
+    """
+
+    def __init__(self, max_entries: int, max_tokens: int):
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.stats = {"hits": 0, "misses": 0}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def summarize(self, text: str) -> str:
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return summary
+            self.stats["misses"] += 1
+
+        summary = self._extract(text)
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return summary
+
+    def _extract(self, text: str) -> str:
+        sentences = [s for s in SENTENCE_PATTERN.split(text.strip()) if s]
+        if len(sentences) <= 1:
+            return truncate_to_tokens(text, self.max_tokens)
+
+        embeddings = ltm.get_model().encode(sentences, cache=False)
+        centroid = embeddings.mean(axis=0)
+        ranked = np.argsort(-(embeddings @ centroid))
+
+        chosen, used = [], 0
+        for i in ranked:
+            cost = estimate_tokens(sentences[i])
+            if used + cost > self.max_tokens:
+                continue
+            chosen.append(i)
+            used += cost
+        if not chosen:
+            return truncate_to_tokens(sentences[ranked[0]], self.max_tokens)
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._cache)}
+
+def get_summaries() -> SummaryCache:
+    global _summaries
+    if _summaries is None:
+        _summaries = SummaryCache(CONTEXT_SUMMARY_CACHE_SIZE, CONTEXT_SUMMARY_TOKENS)
+    return _summaries
+
+def _exemplar_embeddings() -> np.ndarray:
+    global _exemplars
+    with _exemplars_lock:
+        if _exemplars is None:
+            _exemplars = ltm.get_model().encode(REFERENCE_EXEMPLARS)
+    return _exemplars
+
+def warm_up():
+    # Loads the embedding model and encodes the exemplars before the first request
+    _exemplar_embeddings()
+
+def _windows(prompt: str) -> List[str]:
+    words = prompt.split()
+    if len(words) <= INTENT_WINDOW:
+        return []
+    windows = [" ".join(words[i:i + INTENT_WINDOW]) for i in range(len(words) - INTENT_WINDOW + 1)]
+    return windows[:INTENT_MAX_WINDOWS]
+
+def reference_intents(prompts: List[str]) -> List[float]:
+    """
+    How strongly each prompt refers back to earlier generations: the best cosine similarity
+    between the prompt, or any short window of it, and the reference exemplars. Windows
+    keep a short reference ("like the one before") from being diluted by a long prompt.
+    The prompts are encoded through the embedding cache, their windows in one uncached call.
+    """
+    model = ltm.get_model()
+    exemplars = _exemplar_embeddings().T
+    prompt_scores = (model.encode(prompts) @ exemplars).max(axis=1)
+    windows = [_windows(prompt) for prompt in prompts]
+    window_scores = (model.encode([w for ws in windows for w in ws], cache=False) @ exemplars).max(axis=1)
+    intents, offset = [], 0
+    for prompt_score, ws in zip(prompt_scores, windows):
+        intents.append(float(max(prompt_score, window_scores[offset:offset + len(ws)].max(initial=-1.0))))
+        offset += len(ws)
+    return intents
+
+def _long_term_candidates(session_id: str, prompts: List[str]) -> List[Optional[List[dict]]]:
+    """Long-term memories for each prompt, or None for prompts that do not refer to earlier work."""
+    referring = [intent >= CONTEXT_INTENT_THRESHOLD for intent in reference_intents(prompts)]
+    if not any(referring):
+        return [None] * len(prompts)
+    # Prompt embeddings are cached by reference_intents, so the query does not encode them again
+    queries = [prompt for prompt, refers in zip(prompts, referring) if refers]
+    results = iter(ltm.get_long_term_memory_batch(session_id, queries, CONTEXT_LTM_CANDIDATES))
+    return [next(results) if refers else None for refers in referring]
+
+def _timestamp(memory: dict) -> float:
+    timestamp = memory.get("timestamp")
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            return 0.0
+    return float(timestamp or 0.0)
+
+def rank_memories(prompt: str, turns: List[dict], long_term: List[dict]) -> List[dict]:
+    """
+    Scores candidates by similarity to the prompt plus a recency bonus for recent turns,
+    drops irrelevant and duplicate ones and returns the rest, best first.
+    """
+    candidates, seen = [], set()
+    for age, turn in enumerate(reversed(turns)):
+        candidates.append({**turn, "recency": CONTEXT_RECENCY_WEIGHT / 2 ** age, "latest": age == 0})
+        seen.add((turn["user_prompt"], turn["assistant_response"]))
+    for memory in long_term:
+        if (memory["user_prompt"], memory["assistant_response"]) not in seen:
+            seen.add((memory["user_prompt"], memory["assistant_response"]))
+            candidates.append({**memory, "recency": 0.0, "latest": False})
+    if not candidates:
+        return []
+
+    model = ltm.get_model()
+    prompt_embedding = model.encode(prompt)
+    embeddings = model.encode([c["user_prompt"] for c in candidates])
+    for candidate, similarity in zip(candidates, embeddings @ prompt_embedding):
+        candidate["score"] = float(similarity) + candidate["recency"]
+        candidate["relevance"] = float(similarity)
+
+    order = sorted(range(len(candidates)), key=lambda i: -candidates[i]["score"])
+    ranked, kept = [], []
+    for i in order:
+        candidate = candidates[i]
+        if candidate["relevance"] < CONTEXT_MIN_RELEVANCE and not candidate["latest"]:
+            continue
+        if any(float(embeddings[i] @ embeddings[j]) >= CONTEXT_DEDUPE_THRESHOLD for j in kept):
+            continue
+        kept.append(i)
+        ranked.append(candidate)
+    return ranked
+
+def _format(memory: dict, response: str, number: int) -> str:
+    if memory["latest"]:
+        return f"\nPrevious prompt: {memory['user_prompt']}\nPrevious response: {response}"
+    return f"\nPast memory {number} - Prompt: {memory['user_prompt']}\nResponse: {response}\n"
+
+def pack_memories(memories: List[dict], budget: int) -> str:
+    """Formats the best memories that fit the token budget, oldest first, so the latest turn sits next to the prompt."""
+    packed, used = [], 0
+    for memory in memories:
+        response = memory["assistant_response"]
+        if estimate_tokens(response) > CONTEXT_SUMMARY_TOKENS:
+            response = get_summaries().summarize(response) if CONTEXT_SUMMARIES \
+                else truncate_to_tokens(response, CONTEXT_SUMMARY_TOKENS)
+        cost = estimate_tokens(_format(memory, response, len(memories)))
+        if used + cost > budget:
+            continue
+        packed.append((memory, response))
+        used += cost
+
+    packed.sort(key=lambda item: (item[0]["latest"], _timestamp(item[0])))
+    return "".join(_format(memory, response, i + 1) for i, (memory, response) in enumerate(packed))
+
+def _assemble(prompts: List[str], turns: List[dict], long_term: List[Optional[List[dict]]], budget: int) -> List[str]:
+    return [
+        "" if memories is None else pack_memories(rank_memories(prompt, turns, memories), budget)
+        for prompt, memories in zip(prompts, long_term)
+    ]
+
+async def build_memory_contexts(session_id: str, prompts: List[str], budget: int = CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """
+    Memory context for each prompt that refers to earlier generations, empty for the rest.
+    Recent turns and the intent check plus long-term search run concurrently; the turns
+    are discarded when no prompt turns out to refer back.
+    """
+    turns, long_term = await asyncio.gather(
+        run_in_memory_pool(stm.get_recent_turns, session_id, CONTEXT_STM_TURNS),
+        run_in_memory_pool(_long_term_candidates, session_id, prompts)
+    )
+    if all(memories is None for memories in long_term):
+        return [""] * len(prompts)
+    return await run_in_memory_pool(_assemble, prompts, turns, long_term, budget)
+
+async def build_memory_context(session_id: str, user_prompt: str, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    return (await build_memory_contexts(session_id, [user_prompt], budget))[0]
@@ -0,0 +1,175 @@
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Union
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# "onnx", "onnx-int8" or "torch"; ONNX backends fall back to torch if they cannot load
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+# Intra-op threads per encode call; 0 keeps the runtime default
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_MAX_TOKENS = 256
+
+def canonical_text(text: str) -> str:
+    # MiniLM's tokenizer lowercases and splits on whitespace, so this does not change the embedding
+    return " ".join(text.lower().split())
+
+class TorchEmbedder:
+    name = "torch"
+
+    def __init__(self, threads: int = 0):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self._model = SentenceTransformer(MODEL_NAME, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model.encode(texts), dtype=np.float32)
+
+class OnnxEmbedder:
+    """
+    MiniLM-L6-v2 on ONNX Runtime with the same mean pooling and normalization as the
+    sentence-transformers model, so vectors stay compatible with existing memories.
+    With quantize=True the weights are dynamically quantized to int8 once and cached
+    next to the model.
+    """
+
+    def __init__(self, threads: int = 0, quantize: bool = False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = self._model_dir()
+        model_path = os.path.join(model_dir, "model.onnx")
+        if quantize:
+            model_path = self._quantized(model_path)
+        self.name = "onnx-int8" if quantize else "onnx"
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        # Pad to the longest text in the batch rather than a fixed length
+        self._tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    @staticmethod
+    def _model_dir() -> str:
+        override = os.getenv("EMBEDDING_ONNX_DIR")
+        if override:
+            return override
+
+        # Reuse Chroma's packaged export of the same model (downloaded once and checksum-verified)
+        from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+        onnx_model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+        onnx_model._download_model_if_not_exists()
+        return os.path.join(onnx_model.DOWNLOAD_PATH, onnx_model.EXTRACTED_FOLDER_NAME)
+
+    @staticmethod
+    def _quantized(model_path: str) -> str:
+        quantized_path = model_path.replace(".onnx", ".int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp_path = quantized_path + ".tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        last_hidden_state = self._session.run(None, inputs)[0]
+
+        mask = attention_mask[..., np.newaxis].astype(np.float32)
+        embeddings = (last_hidden_state * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+class CachedEmbedder:
+    """
+    LRU cache of embeddings keyed by the hash of the canonical text in front of a backend.
+    encode() mirrors SentenceTransformer.encode: a string gives a 1-D vector, a list gives a
+    2-D array, and only texts missing from the cache reach the backend, in one batch.
+    cache=False is for one-off texts (stored memories, summary sentences) that would only
+    push prompts out of the cache.
+    """
+
+    def __init__(self, backend, max_entries: int):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "uncached": 0}
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def encode(self, texts: Union[str, List[str]], cache: bool = True) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.encode([texts], cache)[0]
+
+        texts = [canonical_text(text) for text in texts]
+        if not cache:
+            with self._lock:
+                self.stats["uncached"] += len(texts)
+            return self.backend.encode(texts) if texts else np.empty((0, 384), dtype=np.float32)
+
+        keys = [self.key(text) for text in texts]
+        vectors = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[i] = vector
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.stats["hits"] += len(texts) - sum(len(rows) for rows in missing.values())
+            self.stats["misses"] += len(missing)
+
+        if missing:
+            encoded = self.backend.encode([texts[rows[0]] for rows in missing.values()])
+            with self._lock:
+                for (key, rows), vector in zip(missing.items(), encoded):
+                    vector = vector.copy()
+                    vector.flags.writeable = False
+                    for i in rows:
+                        vectors[i] = vector
+                    self._cache[key] = vector
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return np.stack(vectors) if vectors else np.empty((0, 384), dtype=np.float32)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "backend": self.backend.name, "entries": len(self._cache)}
+
+def load_backend(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    if backend in ("onnx", "onnx-int8"):
+        try:
+            return OnnxEmbedder(threads=threads, quantize=backend == "onnx-int8")
+        except Exception as e:
+            logging.warning(f"ONNX embedding backend unavailable, falling back to torch: {e}")
+    return TorchEmbedder(threads=threads)
+
+def load_embedder() -> CachedEmbedder:
+    return CachedEmbedder(load_backend(), EMBEDDING_CACHE_SIZE)
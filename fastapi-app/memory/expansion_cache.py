@@ -0,0 +1,147 @@
+import os
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+
+from memory import long_term_memory as ltm
+from memory.embeddings import canonical_text
+
+EXPANSION_CACHE_SIZE = int(os.getenv("EXPANSION_CACHE_SIZE", "1024"))
+EXPANSION_CACHE_TTL = float(os.getenv("EXPANSION_CACHE_TTL", "86400"))
+EXPANSION_SIMILARITY_THRESHOLD = float(os.getenv("EXPANSION_SIMILARITY_THRESHOLD", "0.92"))
+
+_cache = None
+_lock = threading.Lock()
+
+class ExpansionCache:
+    """
+    Two-tier cache of LLM prompt expansions. The exact tier is keyed by the normalized
+    prompt plus memory context; the similarity tier compares MiniLM embeddings of the
+    prompt and reuses a prior expansion whose cosine similarity clears the threshold.
+    Embeddings are rows of a preallocated matrix, so the similarity tier is one matmul
+    masked by memory context and age.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+        # key -> (created_at, row, expanded_prompt); the row indexes the arrays below
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._row_keys: List[Optional[str]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        # Allocated by the first put, once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._contexts = np.zeros(max_entries, dtype=np.uint64)
+        # Free rows are created at -inf, so they are always older than the TTL
+        self._created = np.full(max_entries, -np.inf)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return canonical_text(text)
+
+    @staticmethod
+    def key(prompt: str, memory_context: str) -> str:
+        normalized = ExpansionCache.normalize(prompt) + "\0" + ExpansionCache.normalize(memory_context)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def context_key(memory_context: str) -> str:
+        return hashlib.sha256(ExpansionCache.normalize(memory_context).encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, memory_context: str) -> Optional[str]:
+        key = self.key(prompt, memory_context)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[2]
+            has_entries = bool(self._entries)
+
+        if has_entries:
+            query = self._embed(prompt)
+            # Only expansions built on the same memory context are interchangeable
+            context = self._context_id(memory_context)
+            with self._lock:
+                candidates = (self._contexts == context) & (now - self._created <= self.ttl)
+                if candidates.any():
+                    scores = np.where(candidates, self._vectors @ query, -np.inf)
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        best_key = self._row_keys[best]
+                        self._entries.move_to_end(best_key)
+                        self.stats["similar_hits"] += 1
+                        return self._entries[best_key][2]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, prompt: str, memory_context: str, expanded_prompt: str):
+        embedding = self._embed(prompt)
+        key = self.key(prompt, memory_context)
+        now = time.monotonic()
+        if not self.max_entries:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            if key in self._entries:
+                row = self._entries[key][1]
+            else:
+                if not self._free_rows:
+                    self._evict_oldest()
+                row = self._free_rows.pop()
+            self._entries[key] = (now, row, expanded_prompt)
+            self._entries.move_to_end(key)
+            self._row_keys[row] = key
+            self._vectors[row] = embedding
+            self._contexts[row] = self._context_id(memory_context)
+            self._created[row] = now
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+    def _expire(self, now: float):
+        # Entries are kept in LRU order, so this only trims the cold end; lookups re-check the TTL
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[0] <= self.ttl:
+                break
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        key, (_, row, _) = self._entries.popitem(last=False)
+        self._row_keys[row] = None
+        self._created[row] = -np.inf
+        self._free_rows.append(row)
+
+    @classmethod
+    def _context_id(cls, memory_context: str) -> np.uint64:
+        # 64 bits of the context hash, compared across every row at once
+        return np.uint64(int(cls.context_key(memory_context)[:16], 16))
+
+    @staticmethod
+    def _embed(text: str) -> np.ndarray:
+        # Shares the cached embedding of the prompt with memory retrieval and context ranking
+        embedding = np.asarray(ltm.get_model().encode(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+def get_expansion_cache() -> ExpansionCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ExpansionCache(EXPANSION_CACHE_SIZE, EXPANSION_CACHE_TTL, EXPANSION_SIMILARITY_THRESHOLD)
+    return _cache
@@ -1,70 +1,140 @@
+import os
 import chromadb
-from sentence_transformers import SentenceTransformer
 from typing import List
 from datetime import datetime
 from uuid import uuid4
 
+from memory.embeddings import load_embedder
+from memory.vector_store import LOCAL_VECTOR_DIR, LocalCollection
+from memory.write_behind import WriteBehindQueue
+from telemetry import span
+
 _model = None
 _collection = None
+_writer = None
 _collection_name = "memory_collections"
 
+# "http" talks to the chromadb service (multi-node); "local" uses the in-process index;
+# "memory" is a non-persistent in-process Chroma (benchmarks)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "http")
+
+# Filter by session inside Chroma; disable to fall back to adaptive over-fetch with post-hoc filtering
+LTM_SERVER_FILTER = os.getenv("LTM_SERVER_FILTER", "true").lower() == "true"
+LTM_MAX_FETCH = int(os.getenv("LTM_MAX_FETCH", "512"))
+LTM_FETCH_GROWTH = 4
+
+# Write-behind batching of memory saves
+LTM_BATCH_SIZE = int(os.getenv("LTM_BATCH_SIZE", "32"))
+LTM_FLUSH_INTERVAL = float(os.getenv("LTM_FLUSH_INTERVAL", "2"))
+LTM_MAX_BACKLOG = int(os.getenv("LTM_MAX_BACKLOG", "1024"))
+LTM_ENQUEUE_TIMEOUT = float(os.getenv("LTM_ENQUEUE_TIMEOUT", "1"))
+
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        _model = load_embedder()
     return _model
 
 def get_collection():
     global _collection
     if _collection is None:
-        client = chromadb.HttpClient(host="chromadb", port=8083)
-        existing_collections = client.list_collections()
-        collection_names = [col.name for col in existing_collections]
-
-        if _collection_name not in collection_names:
-            _collection =client.create_collection(_collection_name)
+        if MEMORY_BACKEND == "local":
+            _collection = LocalCollection(os.path.join(LOCAL_VECTOR_DIR, _collection_name))
+        elif MEMORY_BACKEND == "memory":
+            client = chromadb.EphemeralClient()
+            _collection = client.get_or_create_collection(_collection_name)
         else:
-            _collection = client.get_collection(_collection_name)
+            client = chromadb.HttpClient(host="chromadb", port=8083)
+            _collection = client.get_or_create_collection(_collection_name)
     
     return _collection
 
-def save_to_long_term_memory(session_id: str, user_prompt: str, assistant_response: str):
-    model = get_model()
-    collection = get_collection()
-
-    full_memory = user_prompt + " " + assistant_response
-    embedding = model.encode(full_memory)
+def get_writer() -> WriteBehindQueue:
+    global _writer
+    if _writer is None:
+        _writer = WriteBehindQueue(
+            save_batch_to_long_term_memory,
+            batch_size=LTM_BATCH_SIZE,
+            flush_interval=LTM_FLUSH_INTERVAL,
+            max_backlog=LTM_MAX_BACKLOG,
+            put_timeout=LTM_ENQUEUE_TIMEOUT
+        )
+    return _writer
 
+def save_to_long_term_memory(session_id: str, user_prompt: str, assistant_response: str) -> bool:
     metadata = {
         'session_id': session_id,
         'timestamp': datetime.now().isoformat(),
         'user_prompt': user_prompt,
         'assistant_response': assistant_response
     }
+    return get_writer().submit(metadata)
+
+def save_batch_to_long_term_memory(metadatas: List[dict]):
+    model = get_model()
+    collection = get_collection()
+
+    full_memories = [m['user_prompt'] + " " + m['assistant_response'] for m in metadatas]
+    with span("memory_flush"):
+        # Each memory is encoded once, so it stays out of the prompt embedding cache
+        embeddings = model.encode(full_memories, cache=False)
 
-    collection.add(
-        ids=[str(uuid4())],
-        documents=[full_memory],
-        metadatas=[metadata],
-        embeddings=[embedding]
-    )
+        collection.add(
+            ids=[str(uuid4()) for _ in metadatas],
+            documents=full_memories,
+            metadatas=metadatas,
+            embeddings=[list(map(float, embedding)) for embedding in embeddings]
+        )
+
+def flush_long_term_memory():
+    if _writer is not None:
+        _writer.stop()
+    if isinstance(_collection, LocalCollection):
+        _collection.snapshot()
 
 def get_long_term_memory(session_id: str, user_query: str, top_k: int = 3) -> List[dict]:
+    return get_long_term_memory_batch(session_id, [user_query], top_k)[0]
+
+def get_long_term_memory_batch(session_id: str, user_queries: List[str], top_k: int = 3) -> List[List[dict]]:
     model = get_model()
     collection = get_collection()
 
-    query_embedding = model.encode(user_query)
+    with span("embedding"):
+        query_embeddings = model.encode(user_queries)
+    with span("chroma_query"):
+        return query_memories(collection, session_id, query_embeddings, top_k)
+
+def query_memories(collection, session_id: str, query_embeddings, top_k: int = 3,
+                   server_filter: bool = None) -> List[List[dict]]:
+    if server_filter is None:
+        server_filter = LTM_SERVER_FILTER
+    query_embeddings = [list(map(float, embedding)) for embedding in query_embeddings]
+
+    if server_filter:
+        # Scope the ANN search to the session instead of filtering a global top-k
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            where={"session_id": session_id}
+        )
+        return [list(metadatas) for metadatas in results.get("metadatas") or [[] for _ in query_embeddings]]
+
+    return [_query_post_filtered(collection, session_id, embedding, top_k) for embedding in query_embeddings]
+
+def _query_post_filtered(collection, session_id: str, query_embedding, top_k: int) -> List[dict]:
+    total = collection.count()
+    n_results = top_k * 2
 
-    results = collection.query(
-        query_embeddings=query_embedding,
-        n_results=top_k * 2
-    )
+    while True:
+        n_results = min(n_results, total, LTM_MAX_FETCH)
+        results = collection.query(query_embeddings=[query_embedding], n_results=max(n_results, 1))
 
-    result_memories = []
-    for metadata in results.get("metadatas", [])[0]:
-        if metadata.get("session_id") == session_id:
-            result_memories.append(metadata)
-        if len(result_memories) >= top_k:
-            break
+        result_memories = [
+            metadata for metadata in results.get("metadatas", [[]])[0]
+            if metadata.get("session_id") == session_id
+        ][:top_k]
 
-    return result_memories
\ No newline at end of file
+        # Widen the search until enough session memories are found or the fetch cap is hit
+        if len(result_memories) >= top_k or n_results >= min(total, LTM_MAX_FETCH):
+            return result_memories
+        n_results *= LTM_FETCH_GROWTH
@@ -1,12 +1,224 @@
-from typing import Dict
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
 
-session_memory: Dict[str, Dict[str, str]] = {}
+# "sqlite" is shared by every worker process on the host; "memory" is per process
+STM_BACKEND = os.getenv("STM_BACKEND", "sqlite")
+STM_DB_PATH = os.getenv("STM_DB_PATH", "/data/state/short_term_memory.db")
+STM_MAX_TURNS = int(os.getenv("STM_MAX_TURNS", "5"))
+STM_TTL = float(os.getenv("STM_TTL", "3600"))
+STM_MAX_SESSIONS = int(os.getenv("STM_MAX_SESSIONS", "10000"))
+STM_MAX_BYTES = int(os.getenv("STM_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_store = None
+_store_lock = threading.Lock()
+
+def _turn_size(user_prompt: str, assistant_response: str) -> int:
+    return len(user_prompt.encode("utf-8")) + len(assistant_response.encode("utf-8"))
+
+class InMemoryStore:
+    """Per-process store: LRU over sessions, TTL on last access, ring buffer of turns per session."""
+
+    def __init__(self, max_turns: int, ttl: float, max_sessions: int, max_bytes: int):
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        # session_id -> [last_access, bytes, deque of turns]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, session_id: str, user_prompt: str, assistant_response: str):
+        turn = {"user_prompt": user_prompt, "assistant_response": assistant_response, "timestamp": time.time()}
+        size = _turn_size(user_prompt, assistant_response)
+
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = [0.0, 0, deque(maxlen=self.max_turns)]
+                self._sessions[session_id] = entry
+            turns = entry[2]
+            if len(turns) == turns.maxlen:
+                dropped = turns[0]
+                freed = _turn_size(dropped["user_prompt"], dropped["assistant_response"])
+                entry[1] -= freed
+                self._bytes -= freed
+            turns.append(turn)
+            entry[0] = time.monotonic()
+            entry[1] += size
+            self._bytes += size
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def recent(self, session_id: str, limit: int) -> List[dict]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            if time.monotonic() - entry[0] > self.ttl:
+                self._drop(session_id)
+                return []
+            entry[0] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return list(entry[2])[-limit:]
+
+    def _drop(self, session_id: str):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry[1]
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            over_capacity = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if not over_capacity and now - entry[0] <= self.ttl:
+                break
+            self._drop(session_id)
+
+class SQLiteStore:
+    """
+    Store shared by all worker processes on one host through a SQLite database in WAL
+    mode. Each session keeps its last max_turns turns; sessions expire after ttl and the
+    least recently used ones are evicted past max_sessions or max_bytes. Reads refresh
+    a session's last access only once it is older than a fraction of the TTL, so most
+    reads take no write lock.
+    """
+
+    SWEEP_INTERVAL = 10.0
+    # Fraction of the TTL by which a read may leave last_access stale; sessions expire that much earlier at most
+    TOUCH_FRACTION = 0.05
+
+    def __init__(self, path: str, max_turns: int, ttl: float, max_sessions: int, max_bytes: int):
+        self.path = path
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS stm_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS stm_sessions_last_access ON stm_sessions (last_access);
+                CREATE TABLE IF NOT EXISTS stm_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    user_prompt TEXT NOT NULL,
+                    assistant_response TEXT NOT NULL,
+                    bytes INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS stm_turns_session ON stm_turns (session_id, id);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def add(self, session_id: str, user_prompt: str, assistant_response: str):
+        now = time.time()
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO stm_turns (session_id, created_at, user_prompt, assistant_response, bytes) VALUES (?, ?, ?, ?, ?)",
+                (session_id, now, user_prompt, assistant_response, _turn_size(user_prompt, assistant_response))
+            )
+            # Keep only the last max_turns turns of the session (ring buffer)
+            db.execute(
+                "DELETE FROM stm_turns WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM stm_turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_turns)
+            )
+            db.execute(
+                "INSERT INTO stm_sessions (session_id, last_access, bytes) "
+                "VALUES (?, ?, (SELECT COALESCE(SUM(bytes), 0) FROM stm_turns WHERE session_id = ?)) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access, bytes = excluded.bytes",
+                (session_id, now, session_id)
+            )
+            self._evict(db, now)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def recent(self, session_id: str, limit: int) -> List[dict]:
+        now = time.time()
+        db = self._connection()
+        row = db.execute("SELECT last_access FROM stm_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or now - row[0] > self.ttl:
+            return []
+
+        if now - row[0] > self.ttl * self.TOUCH_FRACTION:
+            db.execute("UPDATE stm_sessions SET last_access = ? WHERE session_id = ? AND last_access < ?",
+                       (now, session_id, now))
+        rows = db.execute(
+            "SELECT user_prompt, assistant_response, created_at FROM stm_turns "
+            "WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [
+            {"user_prompt": p, "assistant_response": r, "timestamp": t}
+            for p, r, t in reversed(rows)
+        ]
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        if now - self._last_sweep > self.SWEEP_INTERVAL:
+            self._last_sweep = now
+            self._delete(db, [r[0] for r in db.execute(
+                "SELECT session_id FROM stm_sessions WHERE last_access < ?", (now - self.ttl,)
+            )])
+
+        sessions, total_bytes = db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM stm_sessions").fetchone()
+        if sessions <= self.max_sessions and total_bytes <= self.max_bytes:
+            return
+
+        evicted = []
+        for session_id, size in db.execute("SELECT session_id, bytes FROM stm_sessions ORDER BY last_access"):
+            if sessions <= self.max_sessions and total_bytes <= self.max_bytes:
+                break
+            evicted.append(session_id)
+            sessions -= 1
+            total_bytes -= size
+        self._delete(db, evicted)
+
+    @staticmethod
+    def _delete(db: sqlite3.Connection, session_ids: List[str]):
+        for session_id in session_ids:
+            db.execute("DELETE FROM stm_turns WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM stm_sessions WHERE session_id = ?", (session_id,))
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if STM_BACKEND == "memory":
+                _store = InMemoryStore(STM_MAX_TURNS, STM_TTL, STM_MAX_SESSIONS, STM_MAX_BYTES)
+            else:
+                _store = SQLiteStore(STM_DB_PATH, STM_MAX_TURNS, STM_TTL, STM_MAX_SESSIONS, STM_MAX_BYTES)
+    return _store
 
 def add_to_short_term_memory(session_id: str, user_prompt: str, assistant_response: str):
-    session_memory[session_id] = {
-        "user_prompt": user_prompt,
-        "assistant_response": assistant_response
-    }
+    get_store().add(session_id, user_prompt, assistant_response)
+
+def get_recent_turns(session_id: str, limit: int = STM_MAX_TURNS) -> List[dict]:
+    return get_store().recent(session_id, limit)
 
-def get_short_term_memory(session_id: str):
-    return session_memory.get(session_id)
\ No newline at end of file
+def get_short_term_memory(session_id: str) -> Optional[Dict[str, str]]:
+    turns = get_recent_turns(session_id, 1)
+    return turns[-1] if turns else None
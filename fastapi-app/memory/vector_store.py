@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import fcntl
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "/data/vectors")
+# Fold the append log into a new snapshot after this many rows or seconds
+SNAPSHOT_ROWS = int(os.getenv("LOCAL_VECTOR_SNAPSHOT_ROWS", "10000"))
+SNAPSHOT_INTERVAL = float(os.getenv("LOCAL_VECTOR_SNAPSHOT_INTERVAL", "600"))
+
+class LocalCollection:
+    """
+    In-process vector index exposing the subset of the Chroma collection API used by
+    long-term memory (add, query, count). Vectors are normalized and searched with a
+    NumPy dot product; cosine distances match Chroma's "cosine" space.
+
+    Persistence is a memory-mapped .npy snapshot plus a JSON-lines append log that is
+    fsynced on every add. Snapshots are written under a new generation number and
+    published by atomically replacing CURRENT, so a crash mid-snapshot leaves the
+    previous generation and its log intact. Writers take an exclusive file lock, and
+    every operation replays log entries appended by other worker processes.
+    """
+
+    def __init__(self, directory: str, dim: int = 384):
+        self.directory = directory
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._gen = -1
+        self._base = np.empty((0, dim), dtype=np.float32)
+        self._tail = np.empty((1024, dim), dtype=np.float32)
+        self._tail_rows = 0
+        self._records: List[dict] = []
+        self._by_session: Dict[str, List[int]] = {}
+        self._wal_offset = 0
+        self._snapshot_at = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            if not os.path.exists(self._path("CURRENT")):
+                self._publish(0, np.empty((0, dim), dtype=np.float32), [])
+            self._sync()
+
+    def count(self) -> int:
+        with self._lock, self._file_lock(shared=True):
+            self._sync()
+            return len(self._records)
+
+    def add(self, ids: List[str], embeddings, metadatas: List[dict] = None, documents: List[str] = None):
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or [None for _ in ids]
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self.dim))
+
+        lines = "".join(
+            json.dumps({"id": i, "document": d, "metadata": m, "embedding": v.tolist()}) + "\n"
+            for i, d, m, v in zip(ids, documents, metadatas, vectors)
+        )
+        with self._lock, self._file_lock():
+            self._sync()
+            with open(self._path(f"wal-{self._gen}.jsonl"), "a", encoding="utf-8") as wal:
+                wal.write(lines)
+                wal.flush()
+                os.fsync(wal.fileno())
+            self._sync()
+
+            if self._tail_rows >= SNAPSHOT_ROWS or (
+                self._tail_rows and time.monotonic() - self._snapshot_at > SNAPSHOT_INTERVAL
+            ):
+                self._snapshot()
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[dict] = None) -> dict:
+        queries = self._normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+
+        with self._lock, self._file_lock(shared=True):
+            self._sync()
+            rows = self._filter(where)
+            matrix = self._matrix(rows)
+            records = self._records
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in queries:
+            if matrix.shape[0] == 0:
+                top, scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            else:
+                scores = matrix @ query
+                k = min(n_results, scores.shape[0])
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+            picked = [records[rows[i] if rows is not None else i] for i in top]
+            results["ids"].append([r["id"] for r in picked])
+            results["documents"].append([r["document"] for r in picked])
+            results["metadatas"].append([r["metadata"] for r in picked])
+            results["distances"].append((1.0 - scores[top]).tolist())
+        return results
+
+    def snapshot(self):
+        with self._lock, self._file_lock():
+            self._sync()
+            if self._tail_rows:
+                self._snapshot()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def _filter(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+
+        conditions = where.get("$and", [where])
+        rows = None
+        for condition in conditions:
+            for key, value in condition.items():
+                if isinstance(value, dict):
+                    value = value.get("$eq")
+                if key == "session_id":
+                    matched = set(self._by_session.get(value, []))
+                else:
+                    candidates = range(len(self._records)) if rows is None else rows
+                    matched = {i for i in candidates if self._records[i]["metadata"].get(key) == value}
+                rows = matched if rows is None else rows & matched
+        return np.fromiter(sorted(rows), dtype=np.int64)
+
+    def _matrix(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        base_rows = self._base.shape[0]
+        if rows is None:
+            if not self._tail_rows:
+                return self._base
+            return np.concatenate([self._base, self._tail[:self._tail_rows]])
+
+        base_part = self._base[rows[rows < base_rows]]
+        tail_part = self._tail[rows[rows >= base_rows] - base_rows]
+        return np.concatenate([base_part, tail_part])
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        with open(self._path("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _sync(self):
+        with open(self._path("CURRENT"), encoding="utf-8") as current:
+            gen = int(current.read().strip())
+        if gen != self._gen:
+            self._load(gen)
+
+        wal_path = self._path(f"wal-{self._gen}.jsonl")
+        if not os.path.exists(wal_path) or os.path.getsize(wal_path) == self._wal_offset:
+            return
+        with open(wal_path, "rb") as wal:
+            wal.seek(self._wal_offset)
+            data = wal.read()
+        # Ignore a trailing partial line still being written by another process
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            self._append(entry["id"], entry["document"], entry["metadata"], np.asarray(entry["embedding"], dtype=np.float32))
+        self._wal_offset += len(complete)
+
+    def _load(self, gen: int):
+        vectors_path = self._path(f"snapshot-{gen}.npy")
+        self._base = np.load(vectors_path, mmap_mode="r") if os.path.getsize(vectors_path) else self._base[:0]
+        with open(self._path(f"records-{gen}.jsonl"), encoding="utf-8") as records:
+            self._records = [json.loads(line) for line in records if line.strip()]
+        self._by_session = {}
+        for row, record in enumerate(self._records):
+            self._index(row, record["metadata"])
+        self._tail_rows = 0
+        self._wal_offset = 0
+        self._gen = gen
+
+    def _append(self, id: str, document: Optional[str], metadata: dict, vector: np.ndarray):
+        if self._tail_rows == self._tail.shape[0]:
+            grown = np.empty((self._tail.shape[0] * 2, self.dim), dtype=np.float32)
+            grown[:self._tail_rows] = self._tail[:self._tail_rows]
+            self._tail = grown
+        self._tail[self._tail_rows] = vector
+        self._tail_rows += 1
+        self._records.append({"id": id, "document": document, "metadata": metadata})
+        self._index(len(self._records) - 1, metadata)
+
+    def _index(self, row: int, metadata: dict):
+        session_id = (metadata or {}).get("session_id")
+        if session_id is not None:
+            self._by_session.setdefault(session_id, []).append(row)
+
+    def _snapshot(self):
+        vectors = np.concatenate([self._base, self._tail[:self._tail_rows]])
+        old_gen = self._gen
+        self._publish(old_gen + 1, vectors, self._records)
+        for name in (f"snapshot-{old_gen}.npy", f"records-{old_gen}.jsonl", f"wal-{old_gen}.jsonl"):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        self._load(old_gen + 1)
+        self._snapshot_at = time.monotonic()
+
+    def _publish(self, gen: int, vectors: np.ndarray, records: List[dict]):
+        vectors_path = self._path(f"snapshot-{gen}.npy")
+        if vectors.shape[0]:
+            snapshot = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32, shape=vectors.shape)
+            snapshot[:] = vectors
+            snapshot.flush()
+            del snapshot
+        else:
+            open(vectors_path, "wb").close()
+
+        with open(self._path(f"records-{gen}.jsonl"), "w", encoding="utf-8") as out:
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+        open(self._path(f"wal-{gen}.jsonl"), "a").close()
+
+        tmp_path = self._path("CURRENT.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as current:
+            current.write(str(gen))
+            current.flush()
+            os.fsync(current.fileno())
+        os.replace(tmp_path, self._path("CURRENT"))
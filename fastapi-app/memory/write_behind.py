@@ -0,0 +1,130 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, List
+
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Bounded write-behind queue that hands pending items to a flush function in batches,
+    triggered when a batch fills up or the flush interval elapses. When the backlog is
+    full, producers block for up to put_timeout (backpressure) before the item is dropped.
+    """
+
+    def __init__(self, flush: Callable[[List], None], batch_size: int, flush_interval: float,
+                 max_backlog: int, put_timeout: float, retries: int = 3):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.stats = {
+            "enqueued": 0, "flushed": 0, "batches": 0, "dropped": 0,
+            "flush_errors": 0, "blocked_puts": 0, "enqueue_wait_seconds": 0.0
+        }
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ltm-write-behind", daemon=True)
+            self._thread.start()
+
+    def submit(self, item) -> bool:
+        self.start()
+        start = time.perf_counter()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                with self._lock:
+                    self.stats["dropped"] += 1
+                logging.error("Long-term memory backlog full, dropping memory")
+                return False
+            finally:
+                with self._lock:
+                    self.stats["blocked_puts"] += 1
+                    self.stats["enqueue_wait_seconds"] += time.perf_counter() - start
+
+        with self._lock:
+            self.stats["enqueued"] += 1
+        return True
+
+    def stop(self, timeout: float = 30.0):
+        """Flushes everything still queued, then stops the worker thread; gives up after timeout seconds."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error(f"Long-term memory backlog still full after {timeout}s, "
+                          f"{self._queue.qsize()} memories not flushed")
+            return
+        self._thread.join(max(deadline - time.monotonic(), 0))
+        if self._thread.is_alive():
+            logging.error(f"Long-term memory flush did not finish within {timeout}s")
+        self._thread = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "backlog": self._queue.qsize(), "max_backlog": self._queue.maxsize}
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            item = first
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if stopping:
+                # Drain whatever was queued behind the stop marker
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+
+            for start in range(0, len(batch), self.batch_size):
+                self._flush(batch[start:start + self.batch_size])
+
+    def _flush(self, batch: List):
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.flush(batch)
+                with self._lock:
+                    self.stats["flushed"] += len(batch)
+                    self.stats["batches"] += 1
+                return
+            except Exception as e:
+                with self._lock:
+                    self.stats["flush_errors"] += 1
+                logging.error(f"Long-term memory flush failed (attempt {attempt}/{self.retries}): {e}")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 10))
+
+        with self._lock:
+            self.stats["dropped"] += len(batch)
@@ -0,0 +1,17 @@
+import os
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+# Embedding and Chroma work is CPU/IO bound and synchronous, so it runs in a
+# dedicated pool sized for the CPU instead of on the event loop.
+MEMORY_POOL_SIZE = int(os.getenv("MEMORY_POOL_SIZE", os.cpu_count() or 1))
+
+memory_pool = ThreadPoolExecutor(max_workers=MEMORY_POOL_SIZE, thread_name_prefix="memory")
+
+async def run_in_memory_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the request ID (and other context) into the pool thread for tracing
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(memory_pool, partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,27 @@
+import io
+import logging
+from typing import Optional
+
+from PIL import Image
+
+THUMBNAIL_SIZE = 192
+THUMBNAIL_QUALITY = 82
+
+def render_thumbnail(image: bytes, size: int = THUMBNAIL_SIZE) -> Optional[bytes]:
+    """
+    Downsizes the text-to-image output a model was generated from to a small JPEG preview.
+    Returns None for unreadable images.
+    """
+    try:
+        with Image.open(io.BytesIO(image)) as source:
+            # JPEG sources are decoded at a reduced scale straight away
+            source.draft("RGB", (size, size))
+            preview = source.convert("RGB")
+        preview.thumbnail((size, size))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logging.warning(f"Could not make a thumbnail: {e}")
+        return None
+
+    output = io.BytesIO()
+    preview.save(output, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return output.getvalue()
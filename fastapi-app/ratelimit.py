@@ -0,0 +1,43 @@
+import time
+import asyncio
+
+class RateLimiter:
+    """
+    Token bucket of `rate` calls per second (bursts up to `burst`). Waiters are served in
+    arrival order; a rate of 0 disables the bucket. Concurrency is capped separately by
+    the admission stage of the calls.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.stats = {"calls": 0, "delayed": 0, "wait_seconds": 0.0}
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        start = time.monotonic()
+        await self._take_token()
+        waited = time.monotonic() - start
+        self.stats["calls"] += 1
+        if waited > 0.001:
+            self.stats["delayed"] += 1
+            self.stats["wait_seconds"] += waited
+
+    async def _take_token(self):
+        if self.rate <= 0:
+            return
+        # The lock queues waiters so each one sleeps only for its own token
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+            self._tokens -= 1
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "wait_seconds": round(self.stats["wait_seconds"], 3)}
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+# A copy of flask-app/core/singleflight.py (documented there): the two services are built and deployed separately
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one execution shared by every caller."""
+
+    def __init__(self):
+        self.stats = {"executions": 0, "coalesced": 0}
+        # key -> [task, number of waiting callers]
+        self._calls: Dict[str, list] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = [asyncio.create_task(func()), 0]
+            self._calls[key] = call
+            call[0].add_done_callback(lambda task: self._forget(key, call))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                # Every caller was cancelled; nobody is left to use the result
+                self._forget(key, call)
+                call[0].cancel()
+
+    def _forget(self, key: str, call: list):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        task = call[0]
+        if task.done() and not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": len(self._calls)}
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Each uvicorn worker dumps its metrics here so /metrics can report all workers at once
+METRICS_DIR = os.getenv("METRICS_DIR", "/data/state/metrics")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+TRACE_LOG = os.getenv("TRACE_LOG", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1KiB .. 256MiB
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+trace_logger = logging.getLogger("trace")
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Non-cumulative bucket counts (the last one is +Inf), then sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def state(self) -> list:
+        with self._lock:
+            return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+REGISTRY: List[Metric] = []
+
+stage_duration = Histogram("stage_duration_seconds", "Duration of each pipeline stage.", ["stage"])
+stage_in_flight = Gauge("stage_in_flight", "Pipeline stages currently running.", ["stage"])
+stage_errors = Counter("stage_errors_total", "Pipeline stages that raised.", ["stage"])
+payload_size = Histogram("payload_size_bytes", "Size of payloads moved between services.", ["kind"], SIZE_BUCKETS)
+http_requests = Counter("http_requests_total", "HTTP requests handled.", ["method", "route", "status"])
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency until the response starts.", ["route"])
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+admission_queue_depth = Gauge("admission_queue_depth", "Requests waiting for a stage slot.", ["stage"])
+admission_active = Gauge("admission_active", "Stage slots in use.", ["stage"])
+admission_wait = Histogram("admission_wait_seconds", "Time spent waiting for a stage slot.", ["stage"])
+admission_rejections = Counter("admission_rejections_total", "Requests turned away by admission control.",
+                               ["stage", "reason"])
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    request_id = incoming or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    return request_id
+
+@contextmanager
+def span(stage: str):
+    """Times a pipeline stage into stage_duration_seconds and logs it with the request ID."""
+    stage_in_flight.inc(stage=stage)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_in_flight.dec(stage=stage)
+        stage_duration.observe(elapsed, stage=stage)
+        if TRACE_LOG:
+            trace_logger.info("request_id=%s stage=%s status=%s duration_ms=%.1f",
+                              request_id_var.get(), stage, status, elapsed * 1000)
+
+def _format_labels(labelnames, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def snapshot() -> dict:
+    return {metric.name: metric.state() for metric in REGISTRY}
+
+def flush():
+    """Writes this worker's metrics to METRICS_DIR for the other workers to aggregate."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as out:
+        json.dump(snapshot(), out)
+    os.replace(path + ".tmp", path)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _worker_snapshots() -> List[dict]:
+    """This worker's live metrics plus the last dump of every other live worker."""
+    snapshots = [snapshot()]
+    if not os.path.isdir(METRICS_DIR):
+        return snapshots
+
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json") or name == f"{os.getpid()}.json":
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        if not _pid_alive(int(name[:-len(".json")])):
+            # Counters of a dead worker reset; Prometheus handles that as a counter reset
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        try:
+            with open(path, encoding="utf-8") as dump:
+                snapshots.append(json.load(dump))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def render() -> str:
+    """All metrics, summed over the workers, in the Prometheus text exposition format."""
+    snapshots = _worker_snapshots()
+    lines = []
+    for metric in REGISTRY:
+        merged: Dict[tuple, object] = {}
+        for worker in snapshots:
+            for key, value in worker.get(metric.name, []):
+                key = tuple(key)
+                if metric.kind == "histogram":
+                    counts, total = merged.get(key, ([0] * (len(metric.buckets) + 1), 0.0))
+                    merged[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1])
+                else:
+                    merged[key] = merged.get(key, 0) + value
+
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(merged.items()):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _format_labels(metric.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, key)} {total}")
+            lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
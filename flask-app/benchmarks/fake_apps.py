@@ -0,0 +1,159 @@
+"""
+Local stand-in for a remote Openfabric app, for load tests of the pipeline.
+
+Serves what Stub and Remote use from a real app: /manifest (with an ETag), the input and
+output JSON schemas, /resource downloads and the socket.io '/app' namespace ('execute',
+'delete', 'restore'). Every execution waits a configurable latency and answers with a
+resource of a configurable size, so network and payload costs can be dialled in without
+an Openfabric node.
+
+Point the pipeline at it with an explicit URL as the app ID, e.g. http://127.0.0.1:9101.
+
+Usage (from flask-app/):
+    python -m benchmarks.fake_apps --kind text_to_image --port 9101 [--latency 2.0] [--payload-size 1048576]
+    python -m benchmarks.fake_apps --kind image_to_3d --port 9102 [--latency 5.0] [--payload-size 4194304]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import uuid
+import zlib
+
+from gevent import monkey
+
+monkey.patch_all()
+
+from flask import Flask, Response, request  # noqa: E402
+from flask_socketio import SocketIO, emit  # noqa: E402
+from marshmallow import Schema, fields  # noqa: E402
+from marshmallow_jsonschema import JSONSchema  # noqa: E402
+
+from openfabric_pysdk.fields import Resource  # noqa: E402
+
+
+class TextToImageInputSchema(Schema):
+    prompt = fields.Str(allow_none=True)
+    seed = fields.Int(allow_none=True)
+
+
+class TextToImageOutputSchema(Schema):
+    result = Resource(allow_none=True)
+
+
+class ImageTo3dInputSchema(Schema):
+    input_image = fields.Str(allow_none=True)
+
+
+class ImageTo3dOutputSchema(Schema):
+    generated_object = Resource(allow_none=True)
+
+
+# kind -> (input schema, output schema, output field holding the resource)
+KINDS = {
+    'text_to_image': (TextToImageInputSchema, TextToImageOutputSchema, 'result'),
+    'image_to_3d': (ImageTo3dInputSchema, ImageTo3dOutputSchema, 'generated_object'),
+}
+
+
+# ----------------------------------------------------------------------
+def create_app(kind: str, latency: float, jitter: float, payload_size: int, failure_rate: float):
+    """
+    Builds the fake app.
+
+    Args:
+        kind (str): 'text_to_image' or 'image_to_3d'.
+        latency (float): Seconds each execution takes.
+        jitter (float): Maximum extra seconds added at random to each execution.
+        payload_size (int): Size in bytes of the resource produced by each execution.
+        failure_rate (float): Fraction of executions answered with a FAILED status.
+
+    Returns:
+        Tuple[Flask, SocketIO]: The web app and its socket.io server.
+    """
+    input_schema, output_schema, output_field = KINDS[kind]
+    manifest = {'name': f"fake-{kind}", 'version': '1.0', 'sdk': '0.3.0'}
+    schemas = {
+        'input': JSONSchema().dump(input_schema()),
+        'output': JSONSchema().dump(output_schema()),
+    }
+    # One blob serves every reid; its content is irrelevant to the pipeline
+    payload = os.urandom(payload_size)
+    cancelled = set()
+
+    app = Flask(kind)
+    socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins='*')
+
+    def _json(document: dict) -> Response:
+        body = json.dumps(document)
+        etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:16] + '"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={'ETag': etag})
+        return Response(body, mimetype='application/json', headers={'ETag': etag})
+
+    @app.route('/manifest')
+    def _manifest():
+        return _json(manifest)
+
+    @app.route('/schema')
+    def _schema():
+        schema = schemas.get(request.args.get('type'))
+        if schema is None:
+            return Response("type must be 'input' or 'output'", status=400)
+        return _json(schema)
+
+    @app.route('/resource')
+    def _resource():
+        return Response(payload, mimetype='application/octet-stream')
+
+    @socketio.on('execute', namespace='/app')
+    def _execute(data, access=True):
+        message = json.loads(zlib.decompress(data).decode('utf-8'))
+        header = message.get('header', {})
+        rid, qid = header.get('rid') or uuid.uuid4().hex, uuid.uuid4().hex
+        ray = {'rid': rid, 'qid': qid, 'uid': header.get('uid'), 'sid': request.sid}
+
+        emit('submitted', {**ray, 'status': 'QUEUED', 'finished': False})
+        socketio.sleep(latency + random.uniform(0, jitter))
+        if qid in cancelled:
+            cancelled.discard(qid)
+            return
+
+        if random.random() < failure_rate:
+            emit('response', {'ray': {**ray, 'status': 'FAILED', 'finished': True}, 'output': None})
+        else:
+            emit('response', {'ray': {**ray, 'status': 'COMPLETED', 'finished': True},
+                              'output': {output_field: uuid.uuid4().hex}})
+
+    @socketio.on('delete', namespace='/app')
+    def _delete(qid):
+        cancelled.add(qid)
+
+    @socketio.on('restore', namespace='/app')
+    def _restore(qid):
+        emit('restore', {'ray': {'qid': qid, 'status': 'REMOVED', 'finished': True}})
+
+    return app, socketio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kind', choices=sorted(KINDS), required=True)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds per execution')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random seconds per execution')
+    parser.add_argument('--payload-size', type=int, default=256 * 1024, help='resource size in bytes')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    app, socketio = create_app(args.kind, args.latency, args.jitter, args.payload_size, args.failure_rate)
+    print(f"fake {args.kind} listening on http://{args.host}:{args.port}", flush=True)
+    socketio.run(app, host=args.host, port=args.port, log_output=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Microbenchmark of the per-call output-schema overhead in Stub.call.
+
+Compares the previous path (compile the JSON schema and instantiate the marshmallow
+class twice on every call, then walk the whole schema) with the compiled-schema cache
+(one lookup, then resolve only the known resource fields). Resources are served from a
+local HTTP server so both paths pay the same fetch cost.
+
+Usage (from flask-app/):
+    python -m benchmarks.schema_cache [--calls 2000]
+"""
+import argparse
+import copy
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from marshmallow import Schema, fields
+from marshmallow_jsonschema import JSONSchema
+
+from core.resources import resolve_resource_paths
+from core.schema_cache import SchemaCache
+from openfabric_pysdk.fields import Resource
+from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow, resolve_resources
+
+
+class SampleOutputSchema(Schema):
+    message = fields.Str(allow_none=True)
+    seed = fields.Int(allow_none=True)
+    result = Resource(allow_none=True)
+
+
+class _ResourceHandler(BaseHTTPRequestHandler):
+    payload = b'\0' * 1024
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _bench(label, calls, fn):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {calls} calls  {elapsed * 1e6 / calls:9.1f} us/call")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ResourceHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/resource?reid={{reid}}"
+
+    schema = JSONSchema().dump(SampleOutputSchema())
+    output = {'message': 'ok', 'seed': 42, 'result': 'reid-0001'}
+    cache = SchemaCache()
+
+    def before():
+        marshmallow = json_schema_to_marshmallow(schema)
+        if has_resource_fields(marshmallow()):
+            resolve_resources(url, copy.deepcopy(output), marshmallow())
+
+    def after():
+        compiled = cache.get('bench-app', schema)
+        if compiled.needs_resolution:
+            resolve_resource_paths(url, copy.deepcopy(output), compiled.resource_paths)
+
+    try:
+        slow = _bench('before', args.calls, before)
+        fast = _bench('after', args.calls, after)
+        print(f"speedup    {slow / fast:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
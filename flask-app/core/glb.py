@@ -0,0 +1,469 @@
+import copy
+import json
+import logging
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+
+COMPONENT_DTYPES = {5120: np.int8, 5121: np.uint8, 5122: np.int16, 5123: np.uint16, 5125: np.uint32, 5126: np.float32}
+COMPONENT_TYPES = {np.dtype(dtype): component for component, dtype in COMPONENT_DTYPES.items()}
+TYPE_WIDTHS = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+WIDTH_TYPES = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}
+# Divisors of normalized integer components (glTF 2.0, 3.11)
+NORMALIZED_MAX = {np.int8: 127.0, np.uint8: 255.0, np.int16: 32767.0, np.uint16: 65535.0}
+
+# Extensions whose data this module cannot rewrite
+UNSUPPORTED_EXTENSIONS = ('KHR_draco_mesh_compression', 'EXT_meshopt_compression', 'KHR_mesh_quantization')
+
+
+@dataclass
+class OptimizeOptions:
+    """
+    Settings of the GLB optimization stage.
+
+    Attributes:
+        dedupe (bool): Merge vertices whose (quantized) attributes are identical.
+        quantize (bool): Store positions, normals and UVs as integers (KHR_mesh_quantization).
+        position_bits (int): Precision of positions over the mesh bounds (8-16).
+        normal_bits (int): Precision of normal components (4-16).
+        uv_bits (int): Precision of texture coordinates in [0, 1] (4-16).
+        lods (Tuple[float, ...]): Vertex ratios of the extra levels of detail, e.g. (0.5, 0.25).
+    """
+    dedupe: bool = True
+    quantize: bool = True
+    position_bits: int = 14
+    normal_bits: int = 8
+    uv_bits: int = 12
+    lods: Tuple[float, ...] = ()
+
+    # ----------------------------------------------------------------------
+    def __post_init__(self):
+        """
+        Validates the bit depths and LOD ratios.
+
+        Raises:
+            ValueError: If a setting is out of range.
+        """
+        if not 8 <= self.position_bits <= 16:
+            raise ValueError("position_bits must be between 8 and 16")
+        if not 4 <= self.normal_bits <= 16 or not 4 <= self.uv_bits <= 16:
+            raise ValueError("normal_bits and uv_bits must be between 4 and 16")
+        self.lods = tuple(sorted((float(r) for r in self.lods or ()), reverse=True))
+        if any(not 0 < r < 1 for r in self.lods):
+            raise ValueError("LOD ratios must be between 0 and 1")
+
+
+@dataclass
+class OptimizedModel:
+    """
+    The result of optimize_glb.
+
+    Attributes:
+        model (bytes): The optimized GLB.
+        lods (List[bytes]): One simplified GLB per requested LOD ratio, most detailed first.
+        stats (Dict[str, float]): Sizes, vertex and triangle counts and the processing time.
+    """
+    model: bytes
+    lods: List[bytes] = field(default_factory=list)
+    stats: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class _Primitive:
+    mesh: int
+    source: dict
+    attributes: Dict[str, np.ndarray]
+    indices: np.ndarray
+
+
+# ----------------------------------------------------------------------
+def optimize_glb(data: Union[bytes, memoryview], options: OptimizeOptions) -> OptimizedModel:
+    """
+    Optimizes a binary glTF model: merges duplicate vertices, quantizes vertex
+    attributes, narrows and compacts the index and binary data, and builds simplified
+    levels of detail by vertex clustering. Everything is vectorized with NumPy.
+
+    Models the stage cannot rewrite safely (skins, animations, morph targets, sparse
+    accessors, external buffers, already compressed geometry) are returned unchanged.
+
+    Args:
+        data (Union[bytes, memoryview]): The GLB to optimize.
+        options (OptimizeOptions): The optimization settings.
+
+    Returns:
+        OptimizedModel: The optimized model, its LODs and statistics.
+
+    Raises:
+        ValueError: If the data is not a valid GLB.
+    """
+    start = time.perf_counter()
+    gltf, binary = parse_glb(data)
+    stats = {'input_bytes': len(data)}
+
+    reason = _unsupported(gltf)
+    if reason:
+        logging.info(f"GLB optimization skipped: {reason}")
+        stats.update(output_bytes=len(data), skipped=1, seconds=time.perf_counter() - start)
+        return OptimizedModel(model=bytes(data), stats=stats)
+
+    primitives = _read_primitives(gltf, binary)
+    stats['vertices_in'] = sum(len(p.attributes['POSITION']) for p in primitives)
+    bounds = _mesh_bounds(primitives)
+
+    if options.dedupe:
+        primitives = [_dedupe(p, options, bounds[p.mesh]) for p in primitives]
+    for primitive in primitives:
+        primitive.indices = _drop_degenerate(primitive.indices)
+
+    model = _write(gltf, binary, primitives, options, bounds)
+    stats.update(vertices_out=sum(len(p.attributes['POSITION']) for p in primitives),
+                 triangles_out=sum(len(p.indices) // 3 for p in primitives),
+                 output_bytes=len(model))
+
+    lods = []
+    for ratio in options.lods:
+        simplified = [_simplify(p, ratio) for p in primitives]
+        lods.append(_write(gltf, binary, simplified, options, bounds))
+        stats[f"lod_{ratio:g}_bytes"] = len(lods[-1])
+
+    stats['seconds'] = time.perf_counter() - start
+    return OptimizedModel(model=model, lods=lods, stats=stats)
+
+
+# ----------------------------------------------------------------------
+def parse_glb(data: Union[bytes, memoryview]) -> Tuple[dict, memoryview]:
+    """
+    Splits a GLB into its JSON document and binary chunk.
+
+    Args:
+        data (Union[bytes, memoryview]): The GLB.
+
+    Returns:
+        Tuple[dict, memoryview]: The glTF JSON and a view of the BIN chunk (empty if absent).
+
+    Raises:
+        ValueError: If the header or chunks are malformed.
+    """
+    view = memoryview(data)
+    if len(view) < 20:
+        raise ValueError("Not a GLB: too short")
+    magic, version, length = struct.unpack_from('<III', view, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError("Not a glTF 2.0 binary")
+
+    gltf, binary, offset = None, memoryview(b''), 12
+    while offset + 8 <= min(length, len(view)):
+        chunk_length, chunk_type = struct.unpack_from('<II', view, offset)
+        chunk = view[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(bytes(chunk).decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and not len(binary):
+            binary = chunk
+        offset += 8 + chunk_length
+
+    if gltf is None:
+        raise ValueError("GLB has no JSON chunk")
+    return gltf, binary
+
+
+# ----------------------------------------------------------------------
+def build_glb(gltf: dict, binary: bytes) -> bytes:
+    """
+    Assembles a GLB from a glTF JSON document and its binary buffer.
+
+    Args:
+        gltf (dict): The glTF JSON.
+        binary (bytes): The content of buffer 0.
+
+    Returns:
+        bytes: The GLB.
+    """
+    document = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    document += b' ' * (-len(document) % 4)
+    binary = bytes(binary) + b'\0' * (-len(binary) % 4)
+
+    length = 12 + 8 + len(document) + (8 + len(binary) if binary else 0)
+    parts = [struct.pack('<III', GLB_MAGIC, 2, length), struct.pack('<II', len(document), CHUNK_JSON), document]
+    if binary:
+        parts += [struct.pack('<II', len(binary), CHUNK_BIN), binary]
+    return b''.join(parts)
+
+
+def _unsupported(gltf: dict) -> Optional[str]:
+    if gltf.get('skins') or gltf.get('animations'):
+        return "skinned or animated model"
+    if len(gltf.get('buffers', [])) > 1 or any('uri' in b for b in gltf.get('buffers', [])):
+        return "external or multiple buffers"
+    used = set(gltf.get('extensionsUsed', []))
+    if used.intersection(UNSUPPORTED_EXTENSIONS):
+        return f"already uses {sorted(used.intersection(UNSUPPORTED_EXTENSIONS))}"
+    if any('sparse' in a for a in gltf.get('accessors', [])):
+        return "sparse accessors"
+    primitives = [p for mesh in gltf.get('meshes', []) for p in mesh.get('primitives', [])]
+    if not primitives:
+        return "no meshes"
+    for primitive in primitives:
+        if primitive.get('mode', TRIANGLES) != TRIANGLES or primitive.get('targets') or primitive.get('extensions'):
+            return "non-triangle, morphed or extended primitives"
+        if 'POSITION' not in primitive.get('attributes', {}):
+            return "primitive without positions"
+    return None
+
+
+def _read_accessor(gltf: dict, binary: memoryview, index: int) -> np.ndarray:
+    accessor = gltf['accessors'][index]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor['componentType']]).newbyteorder('<')
+    width, count = TYPE_WIDTHS[accessor['type']], accessor['count']
+    if 'bufferView' not in accessor:
+        return np.zeros((count, width), np.float32)
+
+    view = gltf['bufferViews'][accessor['bufferView']]
+    offset = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    stride = view.get('byteStride') or dtype.itemsize * width
+    array = np.ndarray((count, width), dtype, buffer=binary, offset=offset, strides=(stride, dtype.itemsize))
+    if accessor.get('normalized'):
+        return np.maximum(array / NORMALIZED_MAX[dtype.type], -1.0).astype(np.float32)
+    return array.astype(np.float32 if dtype.kind == 'f' or width > 1 else np.uint32)
+
+
+def _read_primitives(gltf: dict, binary: memoryview) -> List[_Primitive]:
+    primitives = []
+    for mesh_index, mesh in enumerate(gltf['meshes']):
+        for source in mesh['primitives']:
+            attributes = {name: _read_accessor(gltf, binary, index).astype(np.float32)
+                          for name, index in source['attributes'].items()}
+            count = len(attributes['POSITION'])
+            if 'indices' in source:
+                indices = _read_accessor(gltf, binary, source['indices']).reshape(-1).astype(np.uint32)
+            else:
+                indices = np.arange(count, dtype=np.uint32)
+            primitives.append(_Primitive(mesh_index, source, attributes, indices[:len(indices) // 3 * 3]))
+    return primitives
+
+
+def _mesh_bounds(primitives: Sequence[_Primitive]) -> Dict[int, Tuple[np.ndarray, float]]:
+    # One origin and uniform extent per mesh: the dequantization transform lives on the node
+    bounds = {}
+    for mesh in {p.mesh for p in primitives}:
+        positions = np.concatenate([p.attributes['POSITION'] for p in primitives if p.mesh == mesh])
+        if not len(positions):
+            positions = np.zeros((1, 3), np.float32)
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        bounds[mesh] = (low, float(max((high - low).max(), 1e-12)))
+    return bounds
+
+
+def _encode(name: str, values: np.ndarray, options: OptimizeOptions,
+            bounds: Tuple[np.ndarray, float]) -> Tuple[np.ndarray, bool]:
+    """Returns the stored form of an attribute and whether it is normalized."""
+    if not options.quantize:
+        return values.astype(np.float32), False
+
+    if name == 'POSITION':
+        levels = (1 << options.position_bits) - 1
+        origin, extent = bounds
+        return np.rint((values - origin) * (levels / extent)).astype(np.uint16), False
+
+    if name == 'NORMAL':
+        levels = (1 << (options.normal_bits - 1)) - 1
+        dtype = np.int8 if options.normal_bits <= 8 else np.int16
+        snapped = np.rint(np.clip(values, -1.0, 1.0) * levels) * (NORMALIZED_MAX[dtype] / levels)
+        return np.rint(snapped).astype(dtype), True
+
+    if name.startswith('TEXCOORD_') and len(values) and values.min() >= 0.0 and values.max() <= 1.0:
+        levels = (1 << options.uv_bits) - 1
+        dtype = np.uint8 if options.uv_bits <= 8 else np.uint16
+        snapped = np.rint(values * levels) * (NORMALIZED_MAX[dtype] / levels)
+        return np.rint(snapped).astype(dtype), True
+
+    return values.astype(np.float32), False
+
+
+def _dedupe(primitive: _Primitive, options: OptimizeOptions, bounds: Tuple[np.ndarray, float]) -> _Primitive:
+    if not len(primitive.indices):
+        return primitive
+    # Vertices are equal when every stored (quantized) attribute is byte-identical
+    rows = np.hstack([np.ascontiguousarray(_encode(name, values, options, bounds)[0]).view(np.uint8)
+                      .reshape(len(values), -1) for name, values in sorted(primitive.attributes.items())])
+    keys = np.ascontiguousarray(rows).view(np.dtype((np.void, rows.shape[1]))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    # Keep the surviving vertices in first-use order for cache locality
+    order = np.argsort(first, kind='stable')
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    keep = first[order]
+    return _Primitive(primitive.mesh, primitive.source,
+                      {name: values[keep] for name, values in primitive.attributes.items()},
+                      remap[inverse.reshape(-1)][primitive.indices].astype(np.uint32))
+
+
+def _drop_degenerate(indices: np.ndarray) -> np.ndarray:
+    triangles = indices.reshape(-1, 3)
+    valid = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & \
+            (triangles[:, 0] != triangles[:, 2])
+    return triangles[valid].reshape(-1)
+
+
+def _simplify(primitive: _Primitive, ratio: float) -> _Primitive:
+    """Vertex clustering: merges the vertices of each grid cell, sized to keep about ratio of them."""
+    positions = primitive.attributes['POSITION']
+    if not len(primitive.indices):
+        return primitive
+    target = max(4, int(len(positions) * ratio))
+    low = positions.min(axis=0)
+    extent = float(max((positions.max(axis=0) - low).max(), 1e-12))
+
+    # Binary search the grid resolution whose occupied cell count is closest to the target
+    lo, hi, best = 1, 1024, None
+    while lo <= hi:
+        grid = (lo + hi) // 2
+        cells = np.minimum(((positions - low) * (grid / extent)).astype(np.int64), grid - 1)
+        keys = (cells[:, 0] * grid + cells[:, 1]) * grid + cells[:, 2]
+        _, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        clusters = int(inverse.max()) + 1
+        if best is None or abs(clusters - target) < abs(best[0] - target):
+            best = (clusters, inverse)
+        if clusters < target:
+            lo = grid + 1
+        elif clusters > target:
+            hi = grid - 1
+        else:
+            break
+
+    clusters, inverse = best
+    counts = np.bincount(inverse, minlength=clusters).astype(np.float32)[:, None]
+    first = np.full(clusters, len(positions), dtype=np.int64)
+    np.minimum.at(first, inverse, np.arange(len(positions)))
+
+    attributes = {}
+    for name, values in primitive.attributes.items():
+        if name in ('POSITION', 'NORMAL'):
+            merged = np.zeros((clusters, values.shape[1]), np.float32)
+            np.add.at(merged, inverse, values)
+            merged /= counts
+            if name == 'NORMAL':
+                merged /= np.maximum(np.linalg.norm(merged, axis=1, keepdims=True), 1e-12)
+            attributes[name] = merged
+        else:
+            attributes[name] = values[first]
+
+    triangles = inverse[primitive.indices].reshape(-1, 3)
+    indices = _drop_degenerate(triangles.reshape(-1)).reshape(-1, 3)
+    # Clustering folds neighbouring triangles onto the same vertices
+    _, unique_rows = np.unique(np.sort(indices, axis=1), axis=0, return_index=True)
+    indices = indices[np.sort(unique_rows)].reshape(-1).astype(np.uint32)
+    return _Primitive(primitive.mesh, primitive.source, attributes, indices)
+
+
+class _BinaryWriter:
+    """Packs arrays into buffer 0, one 4-byte aligned buffer view each."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.length = 0
+        self.views: List[dict] = []
+
+    def add(self, data: bytes, target: Optional[int] = None, stride: Optional[int] = None) -> int:
+        padding = -self.length % 4
+        if padding:
+            self.parts.append(b'\0' * padding)
+            self.length += padding
+        view = {'buffer': 0, 'byteOffset': self.length, 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        if stride is not None:
+            view['byteStride'] = stride
+        self.parts.append(data)
+        self.length += len(data)
+        self.views.append(view)
+        return len(self.views) - 1
+
+
+def _write_attribute(writer: _BinaryWriter, accessors: List[dict], stored: np.ndarray, normalized: bool) -> int:
+    count, width = stored.shape
+    accessor = {'componentType': COMPONENT_TYPES[stored.dtype], 'count': count, 'type': WIDTH_TYPES[width]}
+    if normalized:
+        accessor['normalized'] = True
+
+    # Vertex attribute elements must start on 4-byte boundaries (glTF 2.0, 3.6.2.4)
+    row = stored.dtype.itemsize * width
+    stride = None
+    if row % 4:
+        padded = np.zeros((count, width + (-row % 4) // stored.dtype.itemsize), stored.dtype)
+        padded[:, :width] = stored
+        stored, stride = padded, row + (-row % 4)
+    accessor['bufferView'] = writer.add(np.ascontiguousarray(stored).astype(stored.dtype.newbyteorder('<')).tobytes(),
+                                        ARRAY_BUFFER, stride)
+    accessors.append(accessor)
+    return len(accessors) - 1
+
+
+def _write(gltf: dict, binary: memoryview, primitives: Sequence[_Primitive], options: OptimizeOptions,
+           bounds: Dict[int, Tuple[np.ndarray, float]]) -> bytes:
+    output = copy.deepcopy(gltf)
+    writer = _BinaryWriter()
+    accessors: List[dict] = []
+
+    # Images (and any other non-geometry data) keep their bytes under new buffer views
+    for image in output.get('images', []):
+        if 'bufferView' in image:
+            view = gltf['bufferViews'][image['bufferView']]
+            start = view.get('byteOffset', 0)
+            image['bufferView'] = writer.add(bytes(binary[start:start + view['byteLength']]))
+
+    for mesh in output['meshes']:
+        mesh['primitives'] = []
+    for primitive in primitives:
+        target = {key: value for key, value in primitive.source.items() if key not in ('attributes', 'indices')}
+        target['attributes'] = {}
+        for name, values in primitive.attributes.items():
+            stored, normalized = _encode(name, values, options, bounds[primitive.mesh])
+            index = _write_attribute(writer, accessors, stored, normalized)
+            if name == 'POSITION':
+                accessors[index]['min'] = stored.min(axis=0).tolist() if len(stored) else [0, 0, 0]
+                accessors[index]['max'] = stored.max(axis=0).tolist() if len(stored) else [0, 0, 0]
+            target['attributes'][name] = index
+
+        # 65535 is reserved as the primitive restart value of unsigned short indices
+        index_type = np.uint16 if len(primitive.attributes['POSITION']) <= 65535 else np.uint32
+        indices = primitive.indices.astype(np.dtype(index_type).newbyteorder('<'))
+        accessors.append({'bufferView': writer.add(indices.tobytes(), ELEMENT_ARRAY_BUFFER),
+                          'componentType': COMPONENT_TYPES[np.dtype(index_type)], 'count': len(indices), 'type': 'SCALAR'})
+        target['indices'] = len(accessors) - 1
+        output['meshes'][primitive.mesh]['primitives'].append(target)
+
+    if options.quantize:
+        _add_dequantization_nodes(output, bounds, options.position_bits)
+
+    output['accessors'] = accessors
+    output['bufferViews'] = writer.views
+    output['buffers'] = [{'byteLength': writer.length}]
+    return build_glb(output, b''.join(writer.parts))
+
+
+def _add_dequantization_nodes(gltf: dict, bounds: Dict[int, Tuple[np.ndarray, float]], position_bits: int):
+    # Quantized positions are mapped back to model space by a child node carrying the mesh
+    levels = (1 << position_bits) - 1
+    for node in list(gltf.get('nodes', [])):
+        if 'mesh' not in node or node['mesh'] not in bounds:
+            continue
+        origin, extent = bounds[node['mesh']]
+        scale = extent / levels
+        gltf['nodes'].append({'mesh': node.pop('mesh'), 'translation': origin.tolist(), 'scale': [scale] * 3})
+        node.setdefault('children', []).append(len(gltf['nodes']) - 1)
+
+    for key in ('extensionsUsed', 'extensionsRequired'):
+        gltf[key] = sorted(set(gltf.get(key, [])) | {'KHR_mesh_quantization'})
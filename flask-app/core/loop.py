@@ -0,0 +1,108 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Awaitable, Optional
+
+
+class EventLoopThread:
+    """
+    EventLoopThread runs one asyncio event loop in a daemon thread for the whole
+    process. Remote executions are awaited on this loop, so any number of them can be
+    in flight while only the threads that need a result block on it.
+
+    Attributes:
+        name (str): The name of the loop thread.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str = "remote-loop"):
+        """
+        Initializes the loop thread; the loop is started on first use.
+
+        Args:
+            name (str): The name of the loop thread (default: 'remote-loop').
+        """
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the running loop, starting its thread if needed.
+
+        Returns:
+            asyncio.AbstractEventLoop: The process-wide loop.
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                threading.Thread(target=_run, name=self.name, daemon=True).start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    # ----------------------------------------------------------------------
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """
+        Schedules a coroutine on the loop, carrying over the caller's context
+        variables (such as the traced request ID).
+
+        Args:
+            coro (Awaitable): The coroutine to run.
+
+        Returns:
+            concurrent.futures.Future: A future for the coroutine's result. Cancelling
+            it cancels the coroutine.
+        """
+        context = contextvars.copy_context()
+
+        async def _in_context():
+            for var, value in context.items():
+                var.set(value)
+            return await coro
+
+        return asyncio.run_coroutine_threadsafe(_in_context(), self.loop)
+
+    # ----------------------------------------------------------------------
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Runs a coroutine on the loop and blocks the calling thread for its result.
+        Must not be called from the loop thread itself.
+
+        Args:
+            coro (Awaitable): The coroutine to run.
+            timeout (Optional[float]): Seconds to wait before cancelling the coroutine (default: no limit).
+
+        Returns:
+            Any: The coroutine's result.
+
+        Raises:
+            TimeoutError: If the timeout expires; the coroutine is cancelled.
+            Exception: Whatever the coroutine raised.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if future.done():
+                # Raised by the coroutine itself (the same class as TimeoutError since Python 3.11)
+                raise
+            future.cancel()
+            raise TimeoutError(f"Timed out after {timeout}s")
+        except BaseException:
+            # The calling thread is being interrupted; do not leave the coroutine running
+            future.cancel()
+            raise
+
+
+background_loop = EventLoopThread()
@@ -0,0 +1,257 @@
+import asyncio
+import base64
+import logging
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+from core.glb import OptimizeOptions, optimize_glb
+from core.loop import background_loop
+from core.remote import ExecutionError
+from core.stub import Stub
+from core.telemetry import payload_size, span, stage_errors
+
+DEFAULT_CONCURRENCY = 2
+MAX_VARIANTS = 8
+
+
+@dataclass
+class Variant:
+    """
+    One candidate of a multi-variant generation and the outcome of each of its steps.
+
+    Attributes:
+        prompt (str): The text-to-image prompt.
+        seed (Optional[int]): The text-to-image seed, if any.
+        status (str): 'pending', 'completed' or 'failed'.
+        error (Optional[str]): Why the variant failed.
+        generated_model (Optional[Union[bytes, memoryview]]): The 3D model produced for the variant.
+        lods (List[bytes]): Simplified versions of the model, when requested.
+        image (Optional[Union[bytes, memoryview]]): The text-to-image output the model was generated
+            from, returned as the model's preview.
+    """
+    prompt: str
+    seed: Optional[int] = None
+    status: str = 'pending'
+    error: Optional[str] = None
+    generated_model: Optional[Union[bytes, memoryview]] = None
+    lods: List[bytes] = field(default_factory=list)
+    image: Optional[Union[bytes, memoryview]] = None
+
+
+class AppLimiter:
+    """
+    AppLimiter bounds how many calls run concurrently against each Openfabric app,
+    across every execution in the process. Limits are configured per app ID; apps
+    without a configured limit use the default. Slots are asyncio semaphores living
+    on core.loop.background_loop.
+
+    Attributes:
+        default (int): The limit for apps without an explicit one.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, default: int = DEFAULT_CONCURRENCY):
+        """
+        Initializes the limiter with no per-app limits.
+
+        Args:
+            default (int): The limit for apps without an explicit one (default: DEFAULT_CONCURRENCY).
+        """
+        self.default = default
+        self._limits: Dict[str, int] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    def configure(self, limits: Dict[str, int]):
+        """
+        Sets per-app limits. Calls already holding a slot finish under the old limit.
+
+        Args:
+            limits (Dict[str, int]): Maximum concurrent calls keyed by app ID.
+        """
+        with self._lock:
+            for app_id, limit in limits.items():
+                limit = max(1, int(limit))
+                if self._limits.get(app_id) != limit:
+                    self._limits[app_id] = limit
+                    # Recreated on the loop at next use
+                    self._semaphores.pop(app_id, None)
+
+    # ----------------------------------------------------------------------
+    def limit(self, app_id: str) -> int:
+        """
+        Returns the concurrency limit of an app.
+
+        Args:
+            app_id (str): The application ID.
+
+        Returns:
+            int: The configured limit, or the default.
+        """
+        return self._limits.get(app_id, self.default)
+
+    # ----------------------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, app_id: str) -> AsyncIterator[None]:
+        """
+        Holds one of the app's concurrency slots for the duration of the block.
+
+        Args:
+            app_id (str): The application ID.
+        """
+        with self._lock:
+            semaphore = self._semaphores.get(app_id)
+            if semaphore is None:
+                semaphore = self._semaphores[app_id] = asyncio.Semaphore(self.limit(app_id))
+        async with semaphore:
+            yield
+
+
+limiter = AppLimiter()
+
+
+# ----------------------------------------------------------------------
+def build_variants(prompt: str, variants: Optional[List[str]], seeds: Optional[List[int]]) -> List[Variant]:
+    """
+    Expands a request into the candidates to generate: every prompt variant (or the
+    prompt itself) combined with every seed, capped at MAX_VARIANTS.
+
+    Args:
+        prompt (str): The base prompt.
+        variants (Optional[List[str]]): Alternative prompts replacing the base prompt.
+        seeds (Optional[List[int]]): Seeds to generate each prompt with.
+
+    Returns:
+        List[Variant]: The candidates, in request order.
+    """
+    prompts = [p for p in (variants or []) if p] or [prompt]
+    candidates = [Variant(prompt=p, seed=s) for p in prompts for s in (seeds or [None])]
+    if len(candidates) > MAX_VARIANTS:
+        logging.warning(f"Requested {len(candidates)} variants, generating the first {MAX_VARIANTS}")
+    return candidates[:MAX_VARIANTS]
+
+
+# ----------------------------------------------------------------------
+def run_variants(stub: Stub, text_to_image: str, image_to_3d: str, variants: List[Variant],
+                 uid: str = 'super-user', optimize: Optional[OptimizeOptions] = None) -> List[Variant]:
+    """
+    Synchronous wrapper around run_variants_async for the execute callback.
+
+    Args:
+        stub (Stub): The stub connected to both apps.
+        text_to_image (str): The text-to-image app ID.
+        image_to_3d (str): The image-to-3D app ID.
+        variants (List[Variant]): The candidates to generate; updated in place.
+        uid (str): The unique user/session identifier for tracking (default: 'super-user').
+        optimize (Optional[OptimizeOptions]): Post-process every model with these settings (default: no optimization).
+
+    Returns:
+        List[Variant]: The same variants, each completed or failed.
+    """
+    return background_loop.run(run_variants_async(stub, text_to_image, image_to_3d, variants, uid, optimize))
+
+
+# ----------------------------------------------------------------------
+async def run_variants_async(stub: Stub, text_to_image: str, image_to_3d: str, variants: List[Variant],
+                             uid: str = 'super-user', optimize: Optional[OptimizeOptions] = None) -> List[Variant]:
+    """
+    Runs text-to-image and then image-to-3D for every variant, optionally followed by
+    the GLB optimization stage (core.glb). Variants proceed independently as tasks on
+    the event loop, so each image goes to the 3D app as soon as it is generated while
+    the other images are still rendering; the limiter bounds the concurrent calls made
+    to each app. Optimization is CPU-bound and runs in the loop's executor.
+
+    Args:
+        stub (Stub): The stub connected to both apps.
+        text_to_image (str): The text-to-image app ID.
+        image_to_3d (str): The image-to-3D app ID.
+        variants (List[Variant]): The candidates to generate; updated in place.
+        uid (str): The unique user/session identifier for tracking (default: 'super-user').
+        optimize (Optional[OptimizeOptions]): Post-process every model with these settings (default: no optimization).
+
+    Returns:
+        List[Variant]: The same variants, each completed or failed.
+    """
+    try:
+        input_schema = stub.schema(text_to_image, 'input')
+    except ValueError:
+        input_schema = {}
+    accepts_seed = 'seed' in input_schema.get('properties', {})
+    if not accepts_seed and any(v.seed is not None for v in variants):
+        logging.warning(f"[{text_to_image}] Input schema has no seed; seeds are ignored")
+
+    async def generate(variant: Variant):
+        # Timeouts, lost connections, remote failures and resource downloads fail the variant with their cause
+        cause = None
+        image_input = {'prompt': variant.prompt}
+        if accepts_seed and variant.seed is not None:
+            image_input['seed'] = variant.seed
+
+        try:
+            async with limiter.slot(text_to_image):
+                with span("text_to_image"):
+                    image_output = await stub.call_async(text_to_image, image_input, uid)
+        except (OSError, ExecutionError) as e:
+            image_output, cause = None, e
+        image = (image_output or {}).get('result')
+        if image is None:
+            fail(variant, "text_to_image", "Image generation failed", cause)
+            return
+        payload_size.observe(len(image), kind="image")
+        logging.info(f"Image generated for variant '{variant.prompt}' (seed={variant.seed})")
+
+        with span("base64_encode"):
+            encoded_image = base64.b64encode(image).decode('utf-8')
+        # The raw image is kept as the model's preview; the app output holding it is not needed anymore
+        variant.image = image
+        image = image_output = None
+
+        try:
+            async with limiter.slot(image_to_3d):
+                with span("image_to_3d"):
+                    model_output = await stub.call_async(image_to_3d, {'input_image': encoded_image}, uid)
+        except (OSError, ExecutionError) as e:
+            model_output, cause = None, e
+        generated_model = (model_output or {}).get('generated_object')
+        if generated_model is None:
+            fail(variant, "image_to_3d", "3D model generation failed", cause)
+            return
+        payload_size.observe(len(generated_model), kind="model")
+
+        if optimize is not None:
+            try:
+                with span("glb_optimize"):
+                    optimized = await asyncio.get_event_loop().run_in_executor(
+                        None, optimize_glb, generated_model, optimize)
+                generated_model, variant.lods = optimized.model, optimized.lods
+                payload_size.observe(len(generated_model), kind="optimized_model")
+                logging.info(f"Model optimized for variant '{variant.prompt}': {optimized.stats}")
+            except Exception as e:
+                # The stage is best effort; the unoptimized model is still a valid result
+                logging.warning(f"GLB optimization failed, keeping the original model: {e}")
+        variant.status, variant.generated_model = 'completed', generated_model
+
+    outcomes = await asyncio.gather(*(generate(variant) for variant in variants), return_exceptions=True)
+    for variant, outcome in zip(variants, outcomes):
+        if isinstance(outcome, BaseException):
+            variant.status, variant.error = 'failed', str(outcome)
+    return variants
+
+
+# ----------------------------------------------------------------------
+def fail(variant: Variant, stage: str, message: str, cause: Optional[BaseException] = None) -> None:
+    """
+    Marks a variant as failed at a stage, keeping the cause of the failure in its error.
+
+    Args:
+        variant (Variant): The variant that failed.
+        stage (str): The pipeline stage, used as the stage_errors label.
+        message (str): What failed.
+        cause (Optional[BaseException]): The exception raised by the stage, if any (default: None).
+    """
+    stage_errors.inc(stage=stage)
+    variant.status, variant.error = 'failed', f"{message}: {cause}" if cause is not None else message
+    logging.warning(f"Variant '{variant.prompt}' (seed={variant.seed}) failed: {variant.error}")
@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+import requests
+
+from core.remote import Remote
+
+
+# ----------------------------------------------------------------------
+def app_url(app_id: str, websocket: bool = False) -> str:
+    """
+    Returns the base URL of an Openfabric app. App IDs are either bare hostnames, served
+    over TLS, or explicit http(s):// URLs (e.g. local stand-ins used for benchmarks).
+
+    Args:
+        app_id (str): The application identifier (hostname or URL).
+        websocket (bool): Return the ws(s):// URL of the app's socket instead (default: False).
+
+    Returns:
+        str: The base URL, without a trailing slash.
+    """
+    base_url = app_id.strip('/')
+    if not base_url.startswith(('http://', 'https://')):
+        base_url = 'https://' + base_url
+    return 'ws' + base_url[len('http'):] if websocket else base_url
+
+
+@dataclass
+class AppEntry:
+    """
+    Cached state for a single Openfabric application.
+
+    Attributes:
+        app_id (str): The application identifier (hostname).
+        manifest (dict): The last manifest fetched from the app.
+        input_schema (Optional[dict]): The last input schema fetched from the app.
+        output_schema (Optional[dict]): The last output schema fetched from the app.
+        connection (Optional[Remote]): The shared Remote connection to the app.
+        etags (Dict[str, str]): ETags returned for each metadata endpoint.
+        refreshed_at (float): Monotonic timestamp of the last successful refresh.
+        unhealthy_since (Optional[float]): Monotonic timestamp since which the connection has been
+            seen disconnected, or None while it is healthy.
+    """
+    app_id: str
+    manifest: dict = field(default_factory=dict)
+    input_schema: Optional[dict] = None
+    output_schema: Optional[dict] = None
+    connection: Optional[Remote] = None
+    etags: Dict[str, str] = field(default_factory=dict)
+    refreshed_at: float = 0.0
+    unhealthy_since: Optional[float] = None
+
+
+class StubRegistry:
+    """
+    StubRegistry is a process-wide, thread-safe cache of Openfabric app metadata and
+    Remote connections keyed by app ID. Entries are loaded once, shared by every Stub,
+    refreshed in the background with conditional (ETag) requests once their TTL expires,
+    and their connections are replaced once they have stayed disconnected for longer than
+    a grace period that leaves the socket time to reconnect by itself. Apps that fail to
+    load are not retried until failure_ttl has passed.
+
+    Attributes:
+        ttl (float): Seconds after which manifests and schemas are revalidated.
+        health_interval (float): Seconds between background health/refresh sweeps.
+        reconnect_grace (float): Seconds a connection may stay disconnected before it is replaced.
+        failure_ttl (float): Seconds a failed load is remembered before the app is loaded again.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, ttl: float = 300.0, health_interval: float = 15.0, reconnect_grace: float = 30.0,
+                 failure_ttl: float = 10.0):
+        """
+        Initializes an empty registry.
+
+        Args:
+            ttl (float): Seconds after which cached metadata is revalidated (default: 300).
+            health_interval (float): Seconds between background sweeps (default: 15).
+            reconnect_grace (float): Seconds a connection may stay disconnected before it is replaced (default: 30).
+            failure_ttl (float): Seconds a failed load is remembered (default: 10).
+        """
+        self.ttl = ttl
+        self.health_interval = health_interval
+        self.reconnect_grace = reconnect_grace
+        self.failure_ttl = failure_ttl
+        self._entries: Dict[str, AppEntry] = {}
+        self._failures: Dict[str, float] = {}
+        self._app_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._stopped = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    # ----------------------------------------------------------------------
+    def get(self, app_id: str) -> Optional[AppEntry]:
+        """
+        Returns the cached entry for an app, loading it on first use. A failed load is
+        remembered for failure_ttl seconds, during which None is returned right away.
+
+        Args:
+            app_id (str): The application ID to look up.
+
+        Returns:
+            Optional[AppEntry]: The entry, or None if the app could not be loaded.
+        """
+        entry = self._entries.get(app_id)
+        if entry is not None:
+            return entry
+        if self._recently_failed(app_id):
+            return None
+
+        with self._app_lock(app_id):
+            # Another thread may have finished (or failed) loading while we waited.
+            entry = self._entries.get(app_id)
+            if entry is None and not self._recently_failed(app_id):
+                entry = self._load(app_id)
+        self._ensure_monitor()
+        return entry
+
+    # ----------------------------------------------------------------------
+    def prewarm(self, app_ids: Iterable[str], background: bool = True) -> None:
+        """
+        Loads the given apps ahead of the first execution.
+
+        Args:
+            app_ids (Iterable[str]): The application IDs to load.
+            background (bool): Load in a daemon thread instead of blocking the caller (default: True).
+        """
+        app_ids = list(app_ids or [])
+
+        def _warm():
+            for app_id in app_ids:
+                self.get(app_id)
+
+        if background:
+            threading.Thread(target=_warm, name="stub-registry-prewarm", daemon=True).start()
+        else:
+            _warm()
+
+    # ----------------------------------------------------------------------
+    def stop(self) -> None:
+        """
+        Stops the background monitor and closes every cached connection.
+        """
+        self._stopped.set()
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if entry.connection is not None:
+                entry.connection.close()
+
+    # ----------------------------------------------------------------------
+    def _app_lock(self, app_id: str) -> threading.Lock:
+        with self._lock:
+            return self._app_locks.setdefault(app_id, threading.Lock())
+
+    # ----------------------------------------------------------------------
+    def _recently_failed(self, app_id: str) -> bool:
+        failed_at = self._failures.get(app_id)
+        return failed_at is not None and time.monotonic() - failed_at < self.failure_ttl
+
+    # ----------------------------------------------------------------------
+    def _load(self, app_id: str) -> Optional[AppEntry]:
+        entry = AppEntry(app_id=app_id)
+        try:
+            self._refresh(entry)
+            entry.connection = self._connect(app_id)
+        except Exception as e:
+            logging.error(f"[{app_id}] Initialization failed, not retrying for {self.failure_ttl}s: {e}")
+            with self._lock:
+                self._failures[app_id] = time.monotonic()
+            return None
+
+        with self._lock:
+            self._entries[app_id] = entry
+            self._failures.pop(app_id, None)
+        return entry
+
+    # ----------------------------------------------------------------------
+    def _refresh(self, entry: AppEntry) -> None:
+        base_url = app_url(entry.app_id)
+
+        entry.manifest = self._fetch(entry, 'manifest', f"{base_url}/manifest", entry.manifest)
+        logging.info(f"[{entry.app_id}] Manifest loaded: {entry.manifest}")
+
+        entry.input_schema = self._fetch(entry, 'input', f"{base_url}/schema?type=input", entry.input_schema)
+        logging.info(f"[{entry.app_id}] Input schema loaded: {entry.input_schema}")
+
+        entry.output_schema = self._fetch(entry, 'output', f"{base_url}/schema?type=output", entry.output_schema)
+        logging.info(f"[{entry.app_id}] Output schema loaded: {entry.output_schema}")
+
+        entry.refreshed_at = time.monotonic()
+
+    # ----------------------------------------------------------------------
+    def _fetch(self, entry: AppEntry, key: str, url: str, current: Optional[dict]) -> dict:
+        headers = {}
+        etag = entry.etags.get(key)
+        if etag and current is not None:
+            headers['If-None-Match'] = etag
+
+        response = self._session.get(url, headers=headers, timeout=5)
+        if response.status_code == 304:
+            return current
+
+        response.raise_for_status()
+        if 'ETag' in response.headers:
+            entry.etags[key] = response.headers['ETag']
+        return response.json()
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _connect(app_id: str) -> Remote:
+        connection = Remote(f"{app_url(app_id, websocket=True)}/app", f"{app_id}-proxy").connect()
+        logging.info(f"[{app_id}] Connection established.")
+        return connection
+
+    # ----------------------------------------------------------------------
+    def _ensure_monitor(self) -> None:
+        if self._monitor is not None:
+            return
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._run_monitor, name="stub-registry-monitor", daemon=True)
+                self._monitor.start()
+
+    # ----------------------------------------------------------------------
+    def _run_monitor(self) -> None:
+        while not self._stopped.wait(self.health_interval):
+            with self._lock:
+                entries = list(self._entries.values())
+
+            for entry in entries:
+                if time.monotonic() - entry.refreshed_at > self.ttl:
+                    try:
+                        self._refresh(entry)
+                    except Exception as e:
+                        # Keep serving the last known metadata until the app answers again.
+                        logging.warning(f"[{entry.app_id}] Metadata refresh failed: {e}")
+
+                self._check_connection(entry)
+
+    # ----------------------------------------------------------------------
+    def _check_connection(self, entry: AppEntry) -> None:
+        if entry.connection is not None and entry.connection.is_connected():
+            entry.unhealthy_since = None
+            return
+
+        now = time.monotonic()
+        if entry.unhealthy_since is None:
+            entry.unhealthy_since = now
+        if entry.connection is not None and now - entry.unhealthy_since < self.reconnect_grace:
+            # The socket may be reconnecting by itself; replacing it would drop its in-flight executions.
+            logging.info(f"[{entry.app_id}] Connection down, waiting for it to recover.")
+            return
+
+        logging.warning(f"[{entry.app_id}] Connection unhealthy, reconnecting.")
+        try:
+            stale, entry.connection = entry.connection, self._connect(entry.app_id)
+            entry.unhealthy_since = None
+        except Exception as e:
+            logging.error(f"[{entry.app_id}] Reconnect failed: {e}")
+            return
+        if stale is not None:
+            # Closing fails the executions still waiting on the old connection.
+            stale.close()
+
+
+# Process-wide registry shared by every Stub instance
+registry = StubRegistry()
@@ -1,8 +1,32 @@
+import asyncio
+import logging
+import time
 from typing import Optional, Union
 
 from openfabric_pysdk.helper import Proxy
 from openfabric_pysdk.helper.proxy import ExecutionResult
 
+# Seconds between status checks of an in-flight execution
+POLL_INTERVAL = 0.1
+# Statuses reported by the proxy once an execution has ended without a result
+FAILED_STATUSES = ("CANCELLED", "FAILED", "ERROR", "REMOVED", "REJECTED")
+
+
+class ExecutionError(Exception):
+    """
+    Raised when an execution ends remotely without a result.
+
+    Attributes:
+        qid (Optional[str]): The ID of the request in the app's queue.
+        status (str): The final status reported by the proxy.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, message: str, qid: Optional[str], status: str):
+        super().__init__(message)
+        self.qid = qid
+        self.status = status
+
 
 class Remote:
     """
@@ -40,6 +64,37 @@ class Remote:
         self.client = Proxy(self.proxy_url, self.proxy_tag, ssl_verify=False)
         return self
 
+    # ----------------------------------------------------------------------
+    def is_connected(self) -> bool:
+        """
+        Reports whether the underlying proxy websocket is currently connected.
+
+        Returns:
+            bool: True if the proxy client exists and is connected, False otherwise.
+        """
+        if self.client is None:
+            return False
+
+        try:
+            return bool(self.client.is_connected())
+        except Exception:
+            return False
+
+    # ----------------------------------------------------------------------
+    def close(self) -> None:
+        """
+        Disconnects the proxy client and releases its background threads. Executions
+        still being awaited on this connection fail at their next status check.
+        """
+        if self.client is None:
+            return
+
+        try:
+            self.client.disconnect()
+        except Exception as e:
+            logging.warning(f"[{self.proxy_tag}] Disconnect failed: {e}")
+        self.client = None
+
     # ----------------------------------------------------------------------
     def execute(self, inputs: dict, uid: str) -> Union[ExecutionResult, None]:
         """
@@ -58,30 +113,154 @@ class Remote:
         return self.client.request(inputs, uid)
 
     # ----------------------------------------------------------------------
-    @staticmethod
-    def get_response(output: ExecutionResult) -> Union[dict, None]:
+    async def execute_async(self, inputs: dict, uid: str, timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Sends a request and awaits its result without blocking a thread. Several
+        executions can be awaited concurrently (e.g. with asyncio.gather).
+
+        Args:
+            inputs (dict): The input payload to send to the proxy.
+            uid (str): A unique identifier for the request.
+            timeout (Optional[float]): Deadline in seconds for the whole execution (default: no limit).
+
+        Returns:
+            Union[dict, None]: The response data.
+
+        Raises:
+            TimeoutError: If the deadline expires; the remote request is cancelled.
+            asyncio.CancelledError: If the awaiting task is cancelled; the remote request is cancelled.
+            ConnectionError: If not connected, or the connection is closed while waiting.
+            ExecutionError: If the request failed or was cancelled remotely.
+        """
+        output = self.execute(inputs, uid)
+        if output is None:
+            raise ConnectionError(f"[{self.proxy_tag}] Not connected, request not sent")
+        return await self.wait_async(output, timeout)
+
+    # ----------------------------------------------------------------------
+    async def wait_async(self, output: ExecutionResult, timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Awaits the result of an execution by polling its status on the event loop.
+
+        Args:
+            output (ExecutionResult): The result returned from a proxy request.
+            timeout (Optional[float]): Deadline in seconds (default: no limit).
+
+        Returns:
+            Union[dict, None]: The response data.
+
+        Raises:
+            TimeoutError: If the deadline expires; the remote request is cancelled.
+            asyncio.CancelledError: If the awaiting task is cancelled; the remote request is cancelled.
+            ConnectionError: If the connection is closed while waiting.
+            ExecutionError: If the request failed or was cancelled remotely.
         """
-        Waits for the result and processes the output.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not self._finished(output):
+                self._check_open(output)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"[{self.proxy_tag}] Request {output.request_qid()} timed out after {timeout}s")
+                await asyncio.sleep(POLL_INTERVAL)
+        except (TimeoutError, asyncio.CancelledError):
+            self.cancel(output)
+            raise
+        return self._result(output)
+
+    # ----------------------------------------------------------------------
+    def get_response(self, output: ExecutionResult, timeout: Optional[float] = None) -> Union[dict, None]:
+        """
+        Waits for the result and processes the output, blocking the calling thread.
 
         Args:
             output (ExecutionResult): The result returned from a proxy request.
+            timeout (Optional[float]): Deadline in seconds (default: no limit).
 
         Returns:
             Union[dict, None]: The response data if successful, None otherwise.
 
         Raises:
-            Exception: If the request failed or was cancelled.
+            TimeoutError: If the deadline expires; the remote request is cancelled.
+            ConnectionError: If the connection is closed while waiting.
+            ExecutionError: If the request failed or was cancelled.
         """
         if output is None:
             return None
 
-        output.wait()
-        status = str(output.status()).lower()
-        if status == "completed":
-            return output.data()
-        if status in ("cancelled", "failed"):
-            raise Exception("The request to the proxy app failed or was cancelled!")
-        return None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._finished(output):
+            self._check_open(output)
+            if deadline is not None and time.monotonic() >= deadline:
+                self.cancel(output)
+                raise TimeoutError(f"[{self.proxy_tag}] Request {output.request_qid()} timed out after {timeout}s")
+            time.sleep(POLL_INTERVAL)
+        return self._result(output)
+
+    # ----------------------------------------------------------------------
+    def cancel(self, output: ExecutionResult) -> None:
+        """
+        Stops tracking an execution and asks the app to drop its queued request.
+
+        Args:
+            output (ExecutionResult): The execution to cancel.
+        """
+        qid = output.request_qid()
+        output.cancel()
+        if qid is not None and self.client is not None:
+            try:
+                self.client.delete(qid)
+            except Exception as e:
+                logging.warning(f"[{self.proxy_tag}] Failed to cancel request {qid}: {e}")
+
+    # ----------------------------------------------------------------------
+    def _check_open(self, output: ExecutionResult) -> None:
+        """
+        Fails a wait whose connection has been closed, instead of polling until the deadline.
+
+        Args:
+            output (ExecutionResult): The execution being awaited.
+
+        Raises:
+            ConnectionError: If the connection is closed.
+        """
+        if self.client is None:
+            raise ConnectionError(f"[{self.proxy_tag}] Connection closed while waiting for request "
+                                  f"{output.request_qid()}")
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _finished(output: ExecutionResult) -> bool:
+        """
+        Reports whether an execution has ended, successfully or not.
+
+        Args:
+            output (ExecutionResult): The execution to check.
+
+        Returns:
+            bool: True once a result has arrived or a final status was reported.
+        """
+        status = str(output.status()).upper()
+        return output.data() is not None or status == "COMPLETED" or status in FAILED_STATUSES
+
+    # ----------------------------------------------------------------------
+    def _result(self, output: ExecutionResult) -> Union[dict, None]:
+        """
+        Returns the data of a finished execution.
+
+        Args:
+            output (ExecutionResult): The finished execution.
+
+        Returns:
+            Union[dict, None]: The response data.
+
+        Raises:
+            ExecutionError: If the request failed or was cancelled.
+        """
+        status = str(output.status()).upper()
+        if status in FAILED_STATUSES:
+            qid = output.request_qid()
+            raise ExecutionError(f"[{self.proxy_tag}] Request {qid} ended with status {status}", qid, status)
+        return output.data()
 
     # ----------------------------------------------------------------------
     def execute_sync(self, inputs: dict, configs: dict, uid: str) -> Union[dict, None]:
@@ -100,4 +279,4 @@ class Remote:
             return None
 
         output = self.client.execute(inputs, configs, uid)
-        return Remote.get_response(output)
+        return self.get_response(output)
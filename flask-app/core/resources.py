@@ -0,0 +1,242 @@
+import logging
+import mmap
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.schema_cache import ResourcePath
+from core.telemetry import payload_size
+
+# Resources fetched concurrently for one output, and pooled connections per resource host
+RESOLVE_CONCURRENCY = 8
+# Resources up to this size stay in memory; larger ones are spooled to an unlinked temp file and memory-mapped
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+# Attempts per resource; interrupted downloads resume with a Range request when the server supports it
+FETCH_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5
+
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_maxsize=RESOLVE_CONCURRENCY))
+_session.mount('https://', HTTPAdapter(pool_maxsize=RESOLVE_CONCURRENCY))
+_pool = ThreadPoolExecutor(max_workers=RESOLVE_CONCURRENCY, thread_name_prefix="resource-fetch")
+
+
+class SpooledBuffer:
+    """
+    SpooledBuffer is a write-once sink for a downloaded resource. Content stays in
+    memory up to a size limit and then spills to an unlinked temporary file; view()
+    exposes the result as a read-only memoryview without copying it, memory-mapping
+    the file once spilled so the blob lives in the page cache instead of the heap.
+
+    Attributes:
+        max_memory (int): Bytes kept in memory before spilling to disk.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self, max_memory: int = SPOOL_MAX_MEMORY, expected_size: Optional[int] = None):
+        """
+        Initializes an empty buffer.
+
+        Args:
+            max_memory (int): Bytes kept in memory before spilling to disk (default: SPOOL_MAX_MEMORY).
+            expected_size (Optional[int]): The announced size, if known; larger content goes straight to disk.
+        """
+        self.max_memory = max_memory
+        self._memory: Optional[bytearray] = bytearray()
+        self._file = None
+        self._size = 0
+        if expected_size is not None and expected_size > max_memory:
+            self._spill()
+
+    # ----------------------------------------------------------------------
+    def write(self, chunk: bytes) -> None:
+        """
+        Appends a chunk.
+
+        Args:
+            chunk (bytes): The data to append.
+        """
+        if self._file is None and self._size + len(chunk) > self.max_memory:
+            self._spill()
+        if self._file is None:
+            self._memory += chunk
+        else:
+            self._file.write(chunk)
+        self._size += len(chunk)
+
+    # ----------------------------------------------------------------------
+    def truncate(self, size: int = 0) -> None:
+        """
+        Drops everything after the given size, e.g. before restarting a download.
+
+        Args:
+            size (int): The size to keep (default: 0).
+        """
+        if self._file is None:
+            del self._memory[size:]
+        else:
+            self._file.truncate(size)
+            self._file.seek(size)
+        self._size = min(self._size, size)
+
+    # ----------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    # ----------------------------------------------------------------------
+    def view(self) -> memoryview:
+        """
+        Finishes the buffer and returns its content. The buffer must not be written afterwards.
+
+        Returns:
+            memoryview: A read-only view over the in-memory bytes or the memory-mapped file.
+        """
+        if self._file is None:
+            return memoryview(self._memory).toreadonly()
+
+        self._file.flush()
+        if self._size == 0:
+            self._file.close()
+            return memoryview(b'')
+        # The mapping keeps its own reference to the file, which is already unlinked
+        mapped = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+        self._file.close()
+        return memoryview(mapped)
+
+    # ----------------------------------------------------------------------
+    def _spill(self) -> None:
+        self._file = tempfile.TemporaryFile(prefix="resource-")
+        if self._memory:
+            self._file.write(self._memory)
+        self._memory = None
+
+
+# ----------------------------------------------------------------------
+def fetch_resource(url: str, reid: str) -> bytes:
+    """
+    Downloads a single resource blob.
+
+    Args:
+        url (str): The resource URL template containing a '{reid}' placeholder.
+        reid (str): The resource identifier.
+
+    Returns:
+        bytes: The resource content.
+    """
+    response = _session.get(url.format(reid=reid), timeout=60)
+    response.raise_for_status()
+    payload_size.observe(len(response.content), kind="resource")
+    return response.content
+
+
+# ----------------------------------------------------------------------
+def fetch_resource_view(url: str, reid: str) -> memoryview:
+    """
+    Streams a single resource blob into a SpooledBuffer. A download interrupted by a
+    connection error is retried, resuming from the bytes already received when the
+    server honours Range requests and restarting from scratch otherwise.
+
+    Args:
+        url (str): The resource URL template containing a '{reid}' placeholder.
+        reid (str): The resource identifier.
+
+    Returns:
+        memoryview: The resource content (read-only; see SpooledBuffer.view).
+
+    Raises:
+        requests.RequestException: If the resource cannot be downloaded within FETCH_ATTEMPTS.
+    """
+    url = url.format(reid=reid)
+    buffer: Optional[SpooledBuffer] = None
+
+    for attempt in range(1, FETCH_ATTEMPTS + 1):
+        offset = len(buffer) if buffer is not None else 0
+        headers = {'Range': f"bytes={offset}-"} if offset else {}
+        try:
+            response = _session.get(url, headers=headers, stream=True, timeout=60)
+            if offset and not _resumes(response, offset):
+                # A 416, or a body that does not continue the partial one (e.g. a 200 ignoring
+                # the Range header): appending it would corrupt the blob, so start over
+                response.close()
+                buffer.truncate(0)
+                response = _session.get(url, stream=True, timeout=60)
+            with response:
+                response.raise_for_status()
+                if buffer is None:
+                    length = response.headers.get('Content-Length')
+                    buffer = SpooledBuffer(SPOOL_MAX_MEMORY, int(length) if length else None)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    buffer.write(chunk)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == FETCH_ATTEMPTS:
+                raise
+            logging.warning(f"Resource {reid} interrupted after {len(buffer) if buffer else 0} bytes "
+                            f"(attempt {attempt}/{FETCH_ATTEMPTS}): {e}")
+            time.sleep(RETRY_BACKOFF * attempt)
+
+    payload_size.observe(len(buffer), kind="resource")
+    return buffer.view()
+
+
+def _resumes(response: requests.Response, offset: int) -> bool:
+    match = re.match(r'bytes (\d+)-', response.headers.get('Content-Range', ''))
+    return response.status_code == 206 and match is not None and int(match.group(1)) == offset
+
+
+# ----------------------------------------------------------------------
+def resolve_resource_paths(url: str, data: Any, paths: Iterable[ResourcePath],
+                           fetch: Callable[[str, str], Any] = fetch_resource) -> Any:
+    """
+    Replaces resource identifiers in an app output with their content, visiting
+    only the precomputed resource paths instead of walking the whole schema. When an
+    output references several resources they are downloaded concurrently.
+
+    Args:
+        url (str): The resource URL template containing a '{reid}' placeholder.
+        data (Any): The app output to resolve in place.
+        paths (Iterable[ResourcePath]): Paths of the Resource fields in the output.
+        fetch (Callable[[str, str], Any]): Downloads a resource given the URL template and reid.
+
+    Returns:
+        Any: The resolved output.
+    """
+    slots: List[Tuple[Union[dict, list], Union[str, int]]] = []
+    for path in paths:
+        slots.extend(_slots(data, path))
+
+    if len(slots) == 1:
+        node, slot = slots[0]
+        node[slot] = fetch(url, node[slot])
+    elif slots:
+        contents = _pool.map(lambda target: fetch(url, target[0][target[1]]), slots)
+        for (node, slot), content in zip(slots, contents):
+            node[slot] = content
+    return data
+
+
+def _slots(node: Any, path: ResourcePath) -> Iterator[Tuple[Union[dict, list], Union[str, int]]]:
+    if node is None or not path:
+        return
+
+    key, rest = path[0], path[1:]
+    if key == '*':
+        if not isinstance(node, list):
+            return
+        keys = range(len(node))
+    else:
+        if not isinstance(node, dict) or key not in node:
+            return
+        keys = (key,)
+
+    for slot in keys:
+        if rest:
+            yield from _slots(node[slot], rest)
+        elif isinstance(node[slot], str):
+            yield node, slot
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple, Type
+
+from marshmallow import Schema, fields
+
+from openfabric_pysdk.fields import Resource
+from openfabric_pysdk.helper import json_schema_to_marshmallow
+
+# A resource path is the sequence of keys leading to a Resource field;
+# '*' stands for every item of a list.
+ResourcePath = Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class CompiledSchema:
+    """
+    An output schema compiled once per app and schema version.
+
+    Attributes:
+        marshmallow (Type[Schema]): The marshmallow class generated from the JSON schema.
+        resource_paths (Tuple[ResourcePath, ...]): Paths of every Resource field in the output.
+        needs_resolution (bool): Whether any resource has to be fetched for this output.
+    """
+    marshmallow: Type[Schema]
+    resource_paths: Tuple[ResourcePath, ...]
+    needs_resolution: bool
+
+
+class SchemaCache:
+    """
+    SchemaCache compiles app output schemas into marshmallow classes and precomputed
+    resource field paths, keyed by app ID and schema hash. The output schema of an app
+    does not change between calls, so the compilation is paid once per schema version.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        """
+        Initializes an empty cache.
+        """
+        self._compiled: Dict[Tuple[str, str], CompiledSchema] = {}
+        # Last schema object seen per app, so repeated calls skip hashing entirely
+        self._latest: Dict[str, Tuple[dict, CompiledSchema]] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------------
+    def get(self, app_id: str, schema: dict) -> CompiledSchema:
+        """
+        Returns the compiled form of an app's output schema, compiling it on first use.
+
+        Args:
+            app_id (str): The application ID the schema belongs to.
+            schema (dict): The JSON output schema of the app.
+
+        Returns:
+            CompiledSchema: The cached compiled schema.
+        """
+        latest = self._latest.get(app_id)
+        if latest is not None and latest[0] is schema:
+            return latest[1]
+
+        key = (app_id, SchemaCache.digest(schema))
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is None:
+                compiled = SchemaCache.compile(schema)
+                self._compiled[key] = compiled
+            self._latest[app_id] = (schema, compiled)
+        return compiled
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def digest(schema: dict) -> str:
+        """
+        Computes a stable hash of a JSON schema.
+
+        Args:
+            schema (dict): The JSON schema.
+
+        Returns:
+            str: The hex SHA-256 digest of the canonical JSON encoding.
+        """
+        return hashlib.sha256(json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def compile(schema: dict) -> CompiledSchema:
+        """
+        Builds the marshmallow class and resource paths for a JSON schema.
+
+        Args:
+            schema (dict): The JSON schema.
+
+        Returns:
+            CompiledSchema: The compiled schema.
+        """
+        marshmallow = json_schema_to_marshmallow(schema)
+        paths = tuple(_schema_paths(marshmallow(), ()))
+        return CompiledSchema(marshmallow=marshmallow, resource_paths=paths, needs_resolution=bool(paths))
+
+
+def _schema_paths(schema: Schema, prefix: ResourcePath) -> Iterator[ResourcePath]:
+    for name, field in schema.fields.items():
+        yield from _field_paths(field, prefix + (field.data_key or name,))
+
+
+def _field_paths(field: fields.Field, path: ResourcePath) -> Iterator[ResourcePath]:
+    if isinstance(field, Resource):
+        yield path
+    elif isinstance(field, fields.Nested):
+        yield from _schema_paths(field.schema, path)
+    elif isinstance(field, fields.List):
+        yield from _field_paths(field.inner, path + ('*',))
+
+
+# Process-wide cache shared by every Stub instance
+schema_cache = SchemaCache()
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    SingleFlight coalesces concurrent calls that share a key onto one execution.
+    The first caller starts the coroutine as its own task; callers arriving while it
+    runs await the same task and receive the same result, or the same exception.
+
+    A caller that is cancelled (or whose deadline expires) stops waiting without
+    affecting the others; the shared execution is cancelled only once every caller
+    has gone. Keys are forgotten as soon as the execution finishes, so failures are
+    retried by the next call. All methods must be used from one event loop.
+
+    Attributes:
+        stats (Dict[str, int]): Counts of executions and of calls served by another caller's execution.
+    """
+
+    # ----------------------------------------------------------------------
+    def __init__(self):
+        """
+        Initializes an empty set of in-flight calls.
+        """
+        self.stats = {"executions": 0, "coalesced": 0}
+        # key -> [task, number of waiting callers]
+        self._calls: Dict[str, list] = {}
+
+    # ----------------------------------------------------------------------
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs func, or awaits the in-flight execution with the same key.
+
+        Args:
+            key (str): Identifies calls whose results are interchangeable.
+            func (Callable[[], Awaitable[Any]]): Creates the coroutine to execute when no call with this key is in flight.
+
+        Returns:
+            Any: The result of the (possibly shared) execution. It is shared between
+            callers and must not be mutated.
+
+        Raises:
+            Exception: Whatever the shared execution raised.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = [asyncio.ensure_future(func()), 0]
+            self._calls[key] = call
+            call[0].add_done_callback(lambda task: self._forget(key, call))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                # Every caller has gone; nobody is left to use the result
+                self._forget(key, call)
+                call[0].cancel()
+
+    # ----------------------------------------------------------------------
+    def _forget(self, key: str, call: list):
+        """
+        Removes a finished or abandoned execution so the next call starts a new one.
+
+        Args:
+            key (str): The call key.
+            call (list): The in-flight entry being removed.
+        """
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        task = call[0]
+        if task.done() and not task.cancelled():
+            # Mark the exception retrieved even if every caller has already left
+            task.exception()
+
+    # ----------------------------------------------------------------------
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns execution counters and the number of calls currently in flight.
+
+        Returns:
+            Dict[str, int]: The counters.
+        """
+        return {**self.stats, "in_flight": len(self._calls)}
@@ -1,101 +1,183 @@
+import json
+import asyncio
+import hashlib
 import logging
-from typing import Any, Dict, List, Literal, Tuple
-
-import requests
-
-from core.remote import Remote
-from openfabric_pysdk.helper import has_resource_fields, json_schema_to_marshmallow, resolve_resources
-from openfabric_pysdk.loader import OutputSchemaInst
-
-# Type aliases for clarity
-Manifests = Dict[str, dict]
-Schemas = Dict[str, Tuple[dict, dict]]
-Connections = Dict[str, Remote]
+import contextvars
+from typing import Any, List, Literal, Optional
+
+from core.loop import background_loop
+from core.registry import StubRegistry, app_url, registry as default_registry
+from core.remote import ExecutionError
+from core.resources import fetch_resource, fetch_resource_view, resolve_resource_paths
+from core.schema_cache import schema_cache
+from core.singleflight import SingleFlight
+from core.telemetry import span
+
+# Identical in-flight calls to the same app share one execution, across Stub instances
+call_flights = SingleFlight()
+# Deadline in seconds for a single remote app execution
+DEFAULT_CALL_TIMEOUT = 600.0
+# How resource fields of app outputs are delivered: 'bytes' copies, or read-only
+# memoryviews over spooled / memory-mapped downloads (see core.resources)
+RESOLUTION_FETCHERS = {'bytes': fetch_resource, 'view': fetch_resource_view}
 
 
 class Stub:
     """
-    Stub acts as a lightweight client interface that initializes remote connections
-    to multiple Openfabric applications, fetching their manifests, schemas, and enabling
-    execution of calls to these apps.
+    Stub acts as a lightweight client interface to multiple Openfabric applications.
+    Manifests, schemas and Remote connections are held by a shared StubRegistry, so
+    creating a Stub is cheap once the registry is warm.
 
     Attributes:
-        _schema (Schemas): Stores input/output schemas for each app ID.
-        _manifest (Manifests): Stores manifest metadata for each app ID.
-        _connections (Connections): Stores active Remote connections for each app ID.
+        _app_ids (List[str]): The application IDs this stub was created for.
+        _registry (StubRegistry): The registry providing manifests, schemas and connections.
+        _resolution (str): How resource fields are delivered, 'bytes' or 'view'.
     """
 
     # ----------------------------------------------------------------------
-    def __init__(self, app_ids: List[str]):
+    def __init__(self, app_ids: List[str], registry: Optional[StubRegistry] = None,
+                 resolution: Literal['bytes', 'view'] = 'bytes'):
         """
-        Initializes the Stub instance by loading manifests, schemas, and connections
-        for each given app ID.
+        Initializes the Stub instance, loading any app IDs the registry has not seen yet.
 
         Args:
             app_ids (List[str]): A list of application identifiers (hostnames or URLs).
+            registry (Optional[StubRegistry]): The registry to use (default: the process-wide registry).
+            resolution (Literal['bytes', 'view']): Deliver resources as bytes, or as read-only
+                memoryviews streamed into spooled, memory-mapped buffers (default: 'bytes').
+
+        Raises:
+            ValueError: If the resolution mode is unknown.
+        """
+        if resolution not in RESOLUTION_FETCHERS:
+            raise ValueError(f"Resolution must be one of {sorted(RESOLUTION_FETCHERS)}")
+        self._app_ids = list(app_ids)
+        self._registry = registry or default_registry
+        self._resolution = resolution
+
+        for app_id in self._app_ids:
+            self._registry.get(app_id)
+
+    # ----------------------------------------------------------------------
+    def call(self, app_id: str, data: Any, uid: str = 'super-user',
+             timeout: Optional[float] = DEFAULT_CALL_TIMEOUT) -> dict:
+        """
+        Sends a request to the specified app and blocks until its output arrives.
+        Synchronous wrapper around call_async: the wait itself happens on the shared
+        event loop, not in the calling thread.
+
+        Args:
+            app_id (str): The application ID to route the request to.
+            data (Any): The input data to send to the app.
+            uid (str): The unique user/session identifier for tracking (default: 'super-user').
+            timeout (Optional[float]): Deadline in seconds (default: DEFAULT_CALL_TIMEOUT).
+
+        Returns:
+            dict: The output data returned by the app (shared between coalesced callers; do not mutate).
+
+        Raises:
+            ConnectionError: If no connection is found for the provided app ID, or it is lost.
+            TimeoutError: If the deadline expires.
+            ExecutionError: If the execution failed remotely.
         """
-        self._schema: Schemas = {}
-        self._manifest: Manifests = {}
-        self._connections: Connections = {}
-
-        for app_id in app_ids:
-            base_url = app_id.strip('/')
-
-            try:
-                # Fetch manifest
-                manifest = requests.get(f"https://{base_url}/manifest", timeout=5).json()
-                logging.info(f"[{app_id}] Manifest loaded: {manifest}")
-                self._manifest[app_id] = manifest
-
-                # Fetch input schema
-                input_schema = requests.get(f"https://{base_url}/schema?type=input", timeout=5).json()
-                logging.info(f"[{app_id}] Input schema loaded: {input_schema}")
-
-                # Fetch output schema
-                output_schema = requests.get(f"https://{base_url}/schema?type=output", timeout=5).json()
-                logging.info(f"[{app_id}] Output schema loaded: {output_schema}")
-                self._schema[app_id] = (input_schema, output_schema)
-
-                # Establish Remote WebSocket connection
-                self._connections[app_id] = Remote(f"wss://{base_url}/app", f"{app_id}-proxy").connect()
-                logging.info(f"[{app_id}] Connection established.")
-            except Exception as e:
-                logging.error(f"[{app_id}] Initialization failed: {e}")
+        return background_loop.run(self.call_async(app_id, data, uid, timeout))
 
     # ----------------------------------------------------------------------
-    def call(self, app_id: str, data: Any, uid: str = 'super-user') -> dict:
+    async def call_async(self, app_id: str, data: Any, uid: str = 'super-user',
+                         timeout: Optional[float] = DEFAULT_CALL_TIMEOUT) -> dict:
         """
-        Sends a request to the specified app via its Remote connection.
+        Sends a request to the specified app via its Remote connection and awaits the
+        output. Concurrent calls with identical inputs to the same app are coalesced
+        into one execution whose output is returned to every caller. Cancelling the
+        awaiting task, or exceeding the deadline, cancels the remote request once no
+        other caller is waiting for it. Must be awaited on core.loop.background_loop.
 
         Args:
             app_id (str): The application ID to route the request to.
             data (Any): The input data to send to the app.
             uid (str): The unique user/session identifier for tracking (default: 'super-user').
+            timeout (Optional[float]): Deadline in seconds (default: DEFAULT_CALL_TIMEOUT).
 
         Returns:
-            dict: The output data returned by the app.
+            dict: The output data returned by the app (shared between coalesced callers; do not mutate).
+            Resource fields hold bytes or memoryviews depending on the stub's resolution mode.
 
         Raises:
-            Exception: If no connection is found for the provided app ID, or execution fails.
+            ConnectionError: If no connection is found for the provided app ID, or it is lost.
+            TimeoutError: If the deadline expires.
+            asyncio.CancelledError: If the awaiting task is cancelled.
+            ExecutionError: If the execution failed remotely.
+            requests.RequestException: If a resource of the output cannot be fetched.
         """
-        connection = self._connections.get(app_id)
+        loop = asyncio.get_event_loop()
+        entry = await loop.run_in_executor(None, self._registry.get, app_id)
+        connection = entry.connection if entry else None
         if not connection:
-            raise Exception(f"Connection not found for app ID: {app_id}")
+            raise ConnectionError(f"Connection not found for app ID: {app_id}")
 
-        try:
-            handler = connection.execute(data, uid)
-            result = connection.get_response(handler)
+        return await call_flights.do(self._call_key(app_id, data, self._resolution),
+                                     lambda: self._execute(app_id, connection, data, uid, timeout))
 
-            schema = self.schema(app_id, 'output')
-            marshmallow = json_schema_to_marshmallow(schema)
-            handle_resources = has_resource_fields(marshmallow())
+    # ----------------------------------------------------------------------
+    async def _execute(self, app_id: str, connection, data: Any, uid: str,
+                       timeout: Optional[float]) -> Optional[dict]:
+        """
+        Executes a request on the app and resolves any resource references in its output.
+        Failures are logged with the request's qid and raised to the callers of the flight.
+
+        Args:
+            app_id (str): The application ID to route the request to.
+            connection (Remote): The app's Remote connection.
+            data (Any): The input data to send to the app.
+            uid (str): The unique user/session identifier for tracking.
+            timeout (Optional[float]): Deadline in seconds.
 
-            if handle_resources:
-                result = resolve_resources("https://" + app_id + "/resource?reid={reid}", result, marshmallow())
+        Returns:
+            Optional[dict]: The output data, or None if the app returned none.
 
-            return result
-        except Exception as e:
+        Raises:
+            ConnectionError: If the connection is down or lost while waiting.
+            TimeoutError: If the deadline expires; the remote request is cancelled.
+            asyncio.CancelledError: If every caller has gone; the remote request is cancelled.
+            ExecutionError: If the execution failed remotely.
+            requests.RequestException: If a resource of the output cannot be fetched.
+        """
+        try:
+            result = await connection.execute_async(data, uid, timeout)
+        except ExecutionError as e:
+            logging.error(f"[{app_id}] Request {e.qid} failed with status {e.status}")
+            raise
+        except (TimeoutError, ConnectionError) as e:
+            # The message names the request's qid
             logging.error(f"[{app_id}] Execution failed: {e}")
+            raise
+
+        compiled = schema_cache.get(app_id, self.schema(app_id, 'output'))
+        if compiled.needs_resolution:
+            with span("resource_resolution"):
+                context = contextvars.copy_context()
+                result = await asyncio.get_event_loop().run_in_executor(
+                    None, context.run, resolve_resource_paths, app_url(app_id) + "/resource?reid={reid}",
+                    result, compiled.resource_paths, RESOLUTION_FETCHERS[self._resolution])
+        return result
+
+    # ----------------------------------------------------------------------
+    @staticmethod
+    def _call_key(app_id: str, data: Any, resolution: str = 'bytes') -> str:
+        """
+        Builds the coalescing key of a call from the app ID, the resolution mode and a
+        digest of its input.
+
+        Args:
+            app_id (str): The application ID.
+            data (Any): The input data.
+            resolution (str): The resolution mode of the caller (default: 'bytes').
+
+        Returns:
+            str: The key.
+        """
+        payload = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        return app_id + ':' + resolution + ':' + hashlib.sha256(payload).hexdigest()
 
     # ----------------------------------------------------------------------
     def manifest(self, app_id: str) -> dict:
@@ -108,7 +190,8 @@ class Stub:
         Returns:
             dict: The manifest data for the app, or an empty dictionary if not found.
         """
-        return self._manifest.get(app_id, {})
+        entry = self._registry.get(app_id)
+        return entry.manifest if entry else {}
 
     # ----------------------------------------------------------------------
     def schema(self, app_id: str, type: Literal['input', 'output']) -> dict:
@@ -125,7 +208,8 @@ class Stub:
         Raises:
             ValueError: If the schema type is invalid or the schema is not found.
         """
-        _input, _output = self._schema.get(app_id, (None, None))
+        entry = self._registry.get(app_id)
+        _input, _output = (entry.input_schema, entry.output_schema) if entry else (None, None)
 
         if type == 'input':
             if _input is None:
@@ -0,0 +1,301 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1KiB .. 256MiB
+
+# The request ID propagated from fastapi-app; context variables follow tasks on the remote loop
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+trace_logger = logging.getLogger("trace")
+
+
+class Metric:
+    """
+    Metric is the base of the minimal, thread-safe Prometheus metric types below.
+    Each instance registers itself in REGISTRY and keeps one value per label set.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The HELP text.
+        labelnames (Tuple[str, ...]): The label names, in exposition order.
+    """
+    kind = "untyped"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """
+        Initializes and registers the metric.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            labelnames (Iterable[str]): The label names (default: none).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    # ----------------------------------------------------------------------
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        """
+        Returns the label values of a sample in labelnames order.
+
+        Args:
+            labels (dict): The sample's labels.
+
+        Returns:
+            Tuple[str, ...]: The label values.
+        """
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+        """
+        Returns the metric's samples as (suffix, label values, extra label, value).
+
+        Returns:
+            List[Tuple[str, Tuple[str, ...], str, float]]: The samples.
+        """
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+    kind = "counter"
+
+    # ----------------------------------------------------------------------
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increments the counter.
+
+        Args:
+            amount (float): The increment (default: 1).
+            **labels: The sample's labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """A value that goes up and down."""
+    kind = "gauge"
+
+    # ----------------------------------------------------------------------
+    def dec(self, amount: float = 1, **labels):
+        """
+        Decrements the gauge.
+
+        Args:
+            amount (float): The decrement (default: 1).
+            **labels: The sample's labels.
+        """
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    A distribution of observations over fixed buckets.
+
+    Attributes:
+        buckets (Tuple[float, ...]): The upper bounds of the finite buckets.
+    """
+    kind = "histogram"
+
+    # ----------------------------------------------------------------------
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        """
+        Initializes and registers the histogram.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            labelnames (Iterable[str]): The label names (default: none).
+            buckets (Iterable[float]): Bucket upper bounds (default: LATENCY_BUCKETS).
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    # ----------------------------------------------------------------------
+    def observe(self, value: float, **labels):
+        """
+        Records one observation.
+
+        Args:
+            value (float): The observed value.
+            **labels: The sample's labels.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Non-cumulative bucket counts (the last one is +Inf), then sum
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    # ----------------------------------------------------------------------
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+        """
+        Returns cumulative bucket, sum and count samples.
+
+        Returns:
+            List[Tuple[str, Tuple[str, ...], str, float]]: The samples.
+        """
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in sorted(self._values.items())]
+
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                samples.append(("_bucket", key, 'le="' + le + '"', cumulative))
+            samples.append(("_sum", key, "", total))
+            samples.append(("_count", key, "", cumulative))
+        return samples
+
+
+REGISTRY: List[Metric] = []
+
+stage_duration = Histogram("stage_duration_seconds", "Duration of each pipeline stage.", ["stage"])
+stage_in_flight = Gauge("stage_in_flight", "Pipeline stages currently running.", ["stage"])
+stage_errors = Counter("stage_errors_total", "Pipeline stages that raised or produced no output.", ["stage"])
+payload_size = Histogram("payload_size_bytes", "Size of payloads moved between apps.", ["kind"], SIZE_BUCKETS)
+http_requests = Counter("http_requests_total", "HTTP requests handled.", ["method", "endpoint", "status"])
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency.", ["endpoint"])
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+
+
+# ----------------------------------------------------------------------
+def set_request_id(request_id: Optional[str]) -> str:
+    """
+    Sets the request ID of the current context (thread, greenlet or task).
+
+    Args:
+        request_id (Optional[str]): The propagated ID, or None to keep the placeholder.
+
+    Returns:
+        str: The request ID in effect.
+    """
+    request_id = request_id or "-"
+    request_id_var.set(request_id)
+    return request_id
+
+
+# ----------------------------------------------------------------------
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a pipeline stage into stage_duration_seconds, tracks it in stage_in_flight,
+    counts failures in stage_errors_total and logs it with the request ID.
+
+    Args:
+        stage (str): The stage name.
+    """
+    stage_in_flight.inc(stage=stage)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_in_flight.dec(stage=stage)
+        stage_duration.observe(elapsed, stage=stage)
+        trace_logger.info("request_id=%s stage=%s status=%s duration_ms=%.1f",
+                          request_id_var.get(), stage, status, elapsed * 1000)
+
+
+# ----------------------------------------------------------------------
+def render() -> str:
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+
+    Returns:
+        str: The exposition body.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, key, extra, value in metric.samples():
+            pairs = [f'{name}="{_escape(v)}"' for name, v in zip(metric.labelnames, key)]
+            if extra:
+                pairs.append(extra)
+            labels = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{metric.name}{suffix}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+def _escape(value: str) -> str:
+    """
+    Escapes a label value for the exposition format.
+
+    Args:
+        value (str): The raw label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ----------------------------------------------------------------------
+def install(webserver) -> None:
+    """
+    Instruments every request of the Flask webserver (latency, in-flight, status and
+    payload sizes, tagged with the incoming X-Request-ID) and adds a /metrics endpoint.
+
+    Args:
+        webserver (flask.Flask): The webserver hosting the app's endpoints.
+    """
+    from flask import Response, g, request
+
+    @webserver.before_request
+    def _start():
+        g.telemetry_start = time.perf_counter()
+        http_in_flight.inc()
+        set_request_id(request.headers.get("X-Request-ID"))
+        if request.content_length:
+            payload_size.observe(request.content_length, kind="http_request")
+
+    @webserver.after_request
+    def _finish(response):
+        start = g.pop("telemetry_start", None)
+        if start is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        http_in_flight.dec()
+        http_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+        http_requests.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+        if response.content_length:
+            payload_size.observe(response.content_length, kind="http_response")
+        return response
+
+    @webserver.teardown_request
+    def _teardown(error):
+        # after_request is skipped when a view raises; keep the in-flight gauge balanced
+        if g.pop("telemetry_start", None) is not None:
+            http_in_flight.dec()
+            http_requests.inc(method=request.method, endpoint="error", status=500)
+
+    @webserver.route("/metrics")
+    def _metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -1,5 +1,9 @@
 from openfabric_pysdk.starter import Starter
+from openfabric_pysdk.flask import webserver
+
+from core.telemetry import install
 
 if __name__ == '__main__':
     PORT = 8888
+    install(webserver)
     Starter.ignite(debug=False, host="0.0.0.0", port=PORT),
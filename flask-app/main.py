@@ -1,12 +1,15 @@
 import logging
-from typing import Dict
-import base64
+from typing import Dict, Optional
 
 from ontology_dc8f06af066e4a7880a5938933236037.config import ConfigClass
-from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass
-from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass, OutputClassSchema
+from ontology_dc8f06af066e4a7880a5938933236037.input import InputClass, OptimizationClass
+from ontology_dc8f06af066e4a7880a5938933236037.output import OutputClass, OutputClassSchema, VariantClass
 from openfabric_pysdk.context import AppModel, State
+from core.glb import OptimizeOptions
+from core.pipeline import build_variants, limiter, run_variants
+from core.registry import registry
 from core.stub import Stub
+from core.telemetry import set_request_id, span
 
 # Configurations for the app
 configurations: Dict[str, ConfigClass] = dict()
@@ -17,7 +20,9 @@ configurations: Dict[str, ConfigClass] = dict()
 ############################################################
 def config(configuration: Dict[str, ConfigClass], state: State) -> None:
     """
-    Stores user-specific configuration data.
+    Stores user-specific configuration data, prewarms the Stub registry for the
+    configured apps, so executions never pay the connection setup cost, and applies
+    the per-app concurrency limits.
 
     Args:
         configuration (Dict[str, ConfigClass]): A mapping of user IDs to configuration objects.
@@ -26,6 +31,8 @@ def config(configuration: Dict[str, ConfigClass], state: State) -> None:
     for uid, conf in configuration.items():
         logging.info(f"Saving new config for user with id:'{uid}'")
         configurations[uid] = conf
+        registry.prewarm(conf.app_ids or [])
+        limiter.configure(conf.concurrency or {})
 
 
 ############################################################
@@ -33,7 +40,20 @@ def config(configuration: Dict[str, ConfigClass], state: State) -> None:
 ############################################################
 def execute(model: AppModel) -> None:
     """
-    Main execution entry point for handling a model pass.
+    Main execution entry point for handling a model pass. Every stage is traced under
+    the request ID propagated from fastapi-app.
+
+    Args:
+        model (AppModel): The model object containing request and response structures.
+    """
+    set_request_id(model.request.request_id)
+    with span("execute"):
+        _execute(model)
+
+
+def _execute(model: AppModel) -> None:
+    """
+    Runs the pipeline for one execution.
 
     Args:
         model (AppModel): The model object containing request and response structures.
@@ -48,52 +68,71 @@ def execute(model: AppModel) -> None:
     user_config: ConfigClass = configurations.get('super-user', None)
     logging.info(f"{configurations}")
 
-    # Initialize the Stub with app IDs
+    # Initialize the Stub with app IDs (connections are shared through the registry);
+    # images and models are streamed into spooled buffers and passed on as memoryviews
     app_ids = user_config.app_ids if user_config else []
-    stub = Stub(app_ids)
+    stub = Stub(app_ids, resolution='view')
     logging.info(f"Stub: {stub}")
 
 ############################################################
                         #  PIPELINE 
 ############################################################ 
 
-    # STEP - 1 Prompt to image app
-    object1 = stub.call(request.attachments[0], {'prompt': user_prompt}, 'super-user')
-    if object1 is None:
-        logging.error("Error: object1 is empty, cannot process further")
-        return
-    # logging.info(f"object1: {object1}")
-    
-    generated_blob_image = object1.get('result', None)
-    if generated_blob_image is None:
-        logging.error("Error: no image found in object1")
-        return
-    logging.info("image generated")
-    
-    base64_encoded_image = base64.b64encode(generated_blob_image).decode('utf-8')
-    logging.info("image is base64 encoded to a string")
+    # Every prompt variant / seed is a candidate; text-to-image runs concurrently and
+    # each image goes to image-to-3D as soon as it is ready (see core.pipeline).
+    variants = build_variants(user_prompt, request.variants, request.seeds)
+    optimize = optimize_options(request.optimization)
+    run_variants(stub, request.attachments[0], request.attachments[1], variants, 'super-user', optimize)
 
+    completed = [v for v in variants if v.status == 'completed']
+    logging.info(f"{len(completed)}/{len(variants)} 3D models generated.")
 
-    # STEP - 2 Image to 3D model app
-    object2 = stub.call(request.attachments[1], {'input_image': base64_encoded_image}, 'super-user')
-    
-    if object2 is None:
-        logging.error("Error: object2 is empty, cannot process further")
+    # Prepare response; models are handed off as raw resource blobs and
+    # fetched by reid from /resource, so they are never base64-encoded.
+    response: OutputClass = model.response
+    # Resource fields take the downloaded views as they are, without copying them.
+    # The first completed variant is the response's model: its entry in variants carries no
+    # model or LODs, so each blob becomes exactly one resource.
+    primary = completed[0] if completed else None
+    response.variants = [
+        VariantClass(prompt=v.prompt, seed=v.seed, status=v.status, error=v.error,
+                     generated_model=v.generated_model if v is not primary else None,
+                     lods=(v.lods or None) if v is not primary else None)
+        for v in variants
+    ]
+    if primary is None:
+        logging.error(f"Error: no model generated: {[v.error for v in variants]}")
+        response.message = "3D model generation failed"
         return
-    # logging.error(f"object2: {object2}")
 
-    model_image = object2.get('generated_object', None)
-    if model_image is None:
-        logging.error("Error: no model found in object2")
-        return
-    logging.info("3D model generated.")
+    response.message = "3D model generated successfully" if len(variants) == 1 else \
+        f"{len(completed)} of {len(variants)} 3D models generated successfully"
+    response.generated_model = primary.generated_model
+    response.lods = primary.lods or None
+    # The source image is the model's preview (fastapi-app makes history thumbnails from it)
+    response.image = primary.image
 
-    model_image_string = base64.b64encode(model_image).decode('utf-8')
+    # response_dict = OutputClassSchema().dump(response)
+    # logging.info(f"Serialized JSON Response: {response_dict}")
 
-    # Prepare response
-    response: OutputClass = model.response
-    response.message = "3D model generated successfully"
-    response.generated_model = model_image_string
 
-    # response_dict = OutputClassSchema().dump(response)
-    # logging.info(f"Serialized JSON Response: {response_dict}")
\ No newline at end of file
+def optimize_options(optimization: Optional[OptimizationClass]) -> Optional[OptimizeOptions]:
+    """
+    Builds the settings of the GLB optimization stage from the request.
+
+    Args:
+        optimization (Optional[OptimizationClass]): The requested settings; unset fields keep their defaults.
+
+    Returns:
+        Optional[OptimizeOptions]: The settings, or None when the request did not ask for
+        optimization or its settings are invalid.
+    """
+    if optimization is None:
+        return None
+
+    requested = {key: value for key, value in vars(optimization).items() if value is not None}
+    try:
+        return OptimizeOptions(**requested)
+    except (TypeError, ValueError) as e:
+        logging.warning(f"Ignoring invalid optimization settings {requested}: {e}")
+        return None
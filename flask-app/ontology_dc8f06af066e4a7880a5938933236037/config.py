@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List
 
 from marshmallow import Schema, fields, post_load
 
@@ -12,12 +12,14 @@ from openfabric_pysdk.utility import SchemaUtil
 @dataclass
 class ConfigClass:
     app_ids: List[str] = None
+    concurrency: Dict[str, int] = None
 
 ################################################################
 # ConfigSchema concept class - AUTOGENERATED
 ################################################################
 class ConfigClassSchema(Schema):
     app_ids = fields.List(fields.String())
+    concurrency = fields.Dict(keys=fields.String(), values=fields.Integer(), allow_none=True)
 
     @post_load
     def create(self, data, **kwargs):
@@ -7,6 +7,35 @@ from marshmallow import Schema, fields, post_load
 from openfabric_pysdk.utility import SchemaUtil
 
 
+################################################################
+# Optimization concept class
+################################################################
+@dataclass
+class OptimizationClass:
+    dedupe: bool = None
+    quantize: bool = None
+    position_bits: int = None
+    normal_bits: int = None
+    uv_bits: int = None
+    lods: List[float] = None
+
+
+################################################################
+# OptimizationSchema concept class
+################################################################
+class OptimizationClassSchema(Schema):
+    dedupe = fields.Boolean(allow_none=True)
+    quantize = fields.Boolean(allow_none=True)
+    position_bits = fields.Integer(allow_none=True)
+    normal_bits = fields.Integer(allow_none=True)
+    uv_bits = fields.Integer(allow_none=True)
+    lods = fields.List(fields.Float(allow_none=True), allow_none=True)
+
+    @post_load
+    def create(self, data, **kwargs):
+        return SchemaUtil.create(OptimizationClass(), data)
+
+
 ################################################################
 # Input concept class - AUTOGENERATED
 ################################################################
@@ -14,6 +43,10 @@ from openfabric_pysdk.utility import SchemaUtil
 class InputClass:
     prompt: str = None
     attachments: List[str] = None
+    variants: List[str] = None
+    seeds: List[int] = None
+    request_id: str = None
+    optimization: OptimizationClass = None
 
 
 ################################################################
@@ -22,6 +55,10 @@ class InputClass:
 class InputClassSchema(Schema):
     prompt = fields.String(allow_none=True)
     attachments = fields.List(fields.String(allow_none=True), allow_none=True)
+    variants = fields.List(fields.String(allow_none=True), allow_none=True)
+    seeds = fields.List(fields.Integer(allow_none=True), allow_none=True)
+    request_id = fields.String(allow_none=True)
+    optimization = fields.Nested(OptimizationClassSchema, allow_none=True)
 
     @post_load
     def create(self, data, **kwargs):
@@ -1,17 +1,50 @@
 from dataclasses import dataclass
+from typing import List
 from marshmallow import Schema, fields, post_load
 
 from openfabric_pysdk.fields import Resource
 from openfabric_pysdk.utility import SchemaUtil
 
 
+################################################################
+# Variant concept class
+################################################################
+@dataclass
+class VariantClass:
+    prompt: str = None
+    seed: int = None
+    status: str = None
+    error: str = None
+    generated_model: bytes = None
+    lods: List[bytes] = None
+
+
+################################################################
+# VariantSchema concept class
+################################################################
+class VariantClassSchema(Schema):
+    prompt = fields.Str(allow_none=True)
+    seed = fields.Integer(allow_none=True)
+    status = fields.Str(allow_none=True)
+    error = fields.Str(allow_none=True)
+    generated_model = Resource(allow_none=True)
+    lods = fields.List(Resource(allow_none=True), allow_none=True)
+
+    @post_load
+    def create(self, data, **kwargs):
+        return SchemaUtil.create(VariantClass(), data)
+
+
 ################################################################
 # Output concept class - AUTOGENERATED
 ################################################################
 @dataclass
 class OutputClass:
     message: str = None
-    generated_model: str = None
+    generated_model: bytes = None
+    lods: List[bytes] = None
+    image: bytes = None
+    variants: List[VariantClass] = None
 
 
 ################################################################
@@ -19,7 +52,10 @@ class OutputClass:
 ################################################################
 class OutputClassSchema(Schema):
     message = fields.Str(allow_none=True)
-    generated_model = fields.Str(allow_none=True)
+    generated_model = Resource(allow_none=True)
+    lods = fields.List(Resource(allow_none=True), allow_none=True)
+    image = Resource(allow_none=True)
+    variants = fields.List(fields.Nested(VariantClassSchema), allow_none=True)
 
     @post_load
     def create(self, data, **kwargs):
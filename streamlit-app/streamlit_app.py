@@ -1,13 +1,26 @@
-import concurrent.futures
+import os
+import time
 import streamlit as st
 import requests
 import streamlit.components.v1 as components
-import base64
 from http.cookies import SimpleCookie
 from uuid import uuid4
-import concurrent
 
-FASTAPI_URL = "http://fastapi-app:8082/generate"
+FASTAPI_URL = "http://fastapi-app:8082"
+# Where the browser reaches fastapi-app; model-viewer and downloads load models from there directly
+FASTAPI_PUBLIC_URL = os.getenv("FASTAPI_PUBLIC_URL", "http://localhost:8082")
+JOB_POLL_INTERVAL = 1.0
+JOB_TIMEOUT = 900
+HISTORY_PAGE_SIZE = 12
+HISTORY_COLUMNS = 3
+STAGE_LABELS = {
+    None: "Waiting for a free worker...",
+    "prompt_expansion": "Expanding your prompt...",
+    "model_generation": "Generating image and 3D model...",
+    "model_transfer": "Fetching the 3D model...",
+    "memory_save": "Saving to memory...",
+    "done": "Done.",
+}
 
 st.set_page_config(page_title="Dimensa", layout="centered")
 st.title("DIMENSA | AI-Powered 3D Imagination")
@@ -42,7 +55,61 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-user_prompt = st.text_input("Enter you imagination...")
+def show_model(model_path):
+    response = requests.head(f"{FASTAPI_URL}{model_path}", timeout=10)
+    if response.status_code != 200:
+        st.error("Error: The generated model is no longer available.")
+        return
+
+    model_url = f"{FASTAPI_PUBLIC_URL}{model_path}"
+
+    st.markdown("Preview 3D model")
+
+    components.html(
+        f"""
+        <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
+        <model-viewer src="{model_url}" 
+            alt="3D model" auto-rotate camera-controls 
+            style="width: 100%; height: 500px; border: 2px dotted black; border-radius: 5px; background-color: white;">
+        </model-viewer>
+        """, height=550
+                )
+    
+    st.link_button("Download 3D model", f"{model_url}?download=true")
+
+    # Simplified versions, when the model was optimized with LODs
+    outputs = requests.get(f"{FASTAPI_URL}{model_path}/outputs", timeout=10)
+    lod_urls = outputs.json()["lod_urls"] if outputs.status_code == 200 else []
+    for level, lod_url in enumerate(lod_urls):
+        st.link_button(f"Download LOD {level + 1}", f"{FASTAPI_PUBLIC_URL}{lod_url}?download=true")
+
+def load_history_page():
+    params = {"limit": HISTORY_PAGE_SIZE}
+    if st.session_state.history_cursor:
+        params["cursor"] = st.session_state.history_cursor
+    response = requests.get(f"{FASTAPI_URL}/sessions/{session_id}/history", params=params, timeout=10)
+    response.raise_for_status()
+    page = response.json()
+    st.session_state.history_items += page["items"]
+    st.session_state.history_cursor = page["next_cursor"]
+    st.session_state.history_loaded = True
+
+def reset_history():
+    st.session_state.history_items = []
+    st.session_state.history_cursor = None
+    st.session_state.history_loaded = False
+
+def view_generation(entry):
+    st.session_state.model_path = entry["model_url"]
+
+def remix_generation(entry):
+    st.session_state.user_prompt = entry["user_prompt"]
+
+if "history_items" not in st.session_state:
+    reset_history()
+
+user_prompt = st.text_input("Enter you imagination...", key="user_prompt")
+optimize_model = st.checkbox("Optimize the model for faster loading (quantized, smaller GLB)", value=True)
 
 if st.button("Generate 3D model"):
     if not user_prompt:
@@ -50,46 +117,72 @@ if st.button("Generate 3D model"):
     else:
         payload = {
             "session_id": session_id,
-            "user_prompt": user_prompt
+            "user_prompt": user_prompt,
+            "optimization": {} if optimize_model else None
         }
 
-        with st.spinner("Generating 3D model, please wait..."):
-            try:
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(requests.post, FASTAPI_URL, json=payload)
-                    response = future.result(timeout=120)
-
-                if response.status_code == 200:
-
-                    model_data = response.content
-
-                    st.markdown("Preview 3D model")
-                    model_file = "3Dmodel.glb"
-                    model_base64 = base64.b64encode(model_data).decode('utf-8')
-
-                    components.html(
-                        f"""
-                        <script type="module" src="https://unpkg.com/@google/model-viewer/dist/model-viewer.min.js"></script>
-                        <model-viewer src="data:application/octet-stream;base64,{model_base64}" 
-                            alt="3D model" auto-rotate camera-controls 
-                            style="width: 100%; height: 500px; border: 2px dotted black; border-radius: 5px; background-color: white;">
-                        </model-viewer>
-                        """, height=550
-                                )
-                    
-                    st.download_button(
-                        label="Download 3D model",
-                        data=model_data,
-                        file_name=model_file,
-                        mime="application/octet-stream"
-                    )
-                else:
-                    try:
-                        error_data = response.json()
-                        st.error(f"Error: {error_data.get('error', 'Unknown error')}")
-                    except Exception:
-                        st.error("Error creating the model (and couldn't parse error details).")
-            except concurrent.futures.TimeoutError:
-                st.error("Request timed out. The model generation took too long.")
-            except Exception as e:
-                st.error(f"Request failed: {e}")
+        try:
+            response = requests.post(f"{FASTAPI_URL}/jobs", json=payload, timeout=10)
+            if response.status_code != 202:
+                raise RuntimeError(response.json().get("error", "Unknown error"))
+            job = response.json()
+
+            status = st.empty()
+            deadline = time.monotonic() + JOB_TIMEOUT
+            with st.spinner("Generating 3D model, please wait..."):
+                while job["status"] not in ("completed", "failed"):
+                    status.info(STAGE_LABELS.get(job["stage"], job["stage"]))
+                    if time.monotonic() > deadline:
+                        raise TimeoutError
+                    time.sleep(JOB_POLL_INTERVAL)
+                    job = requests.get(f"{FASTAPI_URL}/jobs/{job['id']}", timeout=10).json()
+            status.empty()
+
+            if job["status"] == "failed":
+                st.error(f"Error: {job['error'] or 'Unknown error'}")
+            else:
+                st.session_state.model_path = job["model_url"]
+                # The new generation goes on top of the history
+                reset_history()
+        except TimeoutError:
+            st.error("Request timed out. The model generation took too long.")
+        except Exception as e:
+            st.error(f"Request failed: {e}")
+
+if st.session_state.get("model_path"):
+    try:
+        show_model(st.session_state.model_path)
+    except Exception as e:
+        st.error(f"Request failed: {e}")
+
+# Past generations: pages of thumbnails are fetched on demand, models only when viewed
+st.subheader("Your generations")
+try:
+    if not st.session_state.history_loaded:
+        load_history_page()
+except Exception as e:
+    st.error(f"Could not load your generations: {e}")
+
+if st.session_state.history_loaded and not st.session_state.history_items:
+    st.caption("Models you generate will appear here.")
+
+for row_start in range(0, len(st.session_state.history_items), HISTORY_COLUMNS):
+    columns = st.columns(HISTORY_COLUMNS)
+    for column, entry in zip(columns, st.session_state.history_items[row_start:row_start + HISTORY_COLUMNS]):
+        with column:
+            if entry["thumbnail_url"]:
+                # The browser loads thumbnails straight from fastapi-app and caches them
+                st.image(f"{FASTAPI_PUBLIC_URL}{entry['thumbnail_url']}", use_container_width=True)
+            else:
+                st.caption("No preview")
+            st.caption(entry["user_prompt"])
+            view, remix = st.columns(2)
+            view.button("View", key=f"view-{entry['id']}", on_click=view_generation, args=(entry,))
+            remix.button("Remix", key=f"remix-{entry['id']}", on_click=remix_generation, args=(entry,))
+
+if st.session_state.history_cursor and st.button("Load more"):
+    try:
+        load_history_page()
+        st.rerun()
+    except Exception as e:
+        st.error(f"Could not load more generations: {e}")
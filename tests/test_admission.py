@@ -0,0 +1,102 @@
+"""
+Behaviour of the fastapi-app admission StageLimiter: round-robin hand-out across sessions,
+the bounded queue and the wait limit.
+
+Usage (from the repository root):
+    python -m unittest discover -s tests
+"""
+import asyncio
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "fastapi-app"))
+
+from admission import Overloaded, StageLimiter  # noqa: E402
+
+
+class StageLimiterTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.limiter = StageLimiter("test", concurrency=1, max_queue=8, max_wait=5)
+        self.order = []
+
+    async def hold(self, session_id: str, name: str, release: asyncio.Event, **kwargs):
+        async with self.limiter.slot(session_id, **kwargs):
+            self.order.append(name)
+            await release.wait()
+
+    async def queue(self, *waiters):
+        """Starts the waiters one by one, in order, behind a held slot; returns the holder's release event."""
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(self.hold("holder", "holder", release))]
+        await asyncio.sleep(0)
+        for session_id, name in waiters:
+            tasks.append(asyncio.create_task(self.hold(session_id, name, release)))
+            await asyncio.sleep(0)
+        return release, tasks
+
+    async def test_slots_are_handed_out_round_robin_across_sessions(self):
+        release, tasks = await self.queue(("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("c", "c1"))
+        self.assertEqual(self.limiter.snapshot()["sessions_waiting"], 3)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.order, ["holder", "a1", "b1", "c1", "a2", "a3"])
+        self.assertEqual(self.limiter.snapshot()["active"], 0)
+
+    async def test_full_queue_is_rejected_with_a_retry_delay(self):
+        self.limiter.max_queue = 1
+        release, tasks = await self.queue(("a", "a1"))
+
+        with self.assertRaises(Overloaded) as rejected:
+            await self.limiter.acquire("b")
+        self.assertEqual(rejected.exception.stage, "test")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        self.assertEqual(self.limiter.stats["rejected"], 1)
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_unbounded_waiter_queues_past_the_bound(self):
+        self.limiter.max_queue = 1
+        release, tasks = await self.queue(("a", "a1"))
+        tasks.append(asyncio.create_task(self.hold("b", "b1", release, bounded=False)))
+        await asyncio.sleep(0)
+        self.assertEqual(self.limiter.snapshot()["waiting"], 2)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.order, ["holder", "a1", "b1"])
+
+    async def test_waiter_is_withdrawn_when_it_times_out(self):
+        self.limiter.max_wait = 0.01
+        release, tasks = await self.queue()
+
+        with self.assertRaises(Overloaded):
+            await self.limiter.acquire("a")
+        snapshot = self.limiter.snapshot()
+        self.assertEqual((snapshot["timed_out"], snapshot["waiting"], snapshot["sessions_waiting"]), (1, 0, 0))
+
+        # The withdrawn waiter is not granted the slot when it frees up
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(self.limiter.snapshot()["active"], 0)
+        async with self.limiter.slot("b"):
+            self.assertEqual(self.limiter.snapshot()["active"], 1)
+
+    async def test_cancelled_waiter_is_withdrawn(self):
+        release, tasks = await self.queue(("a", "a1"), ("b", "b1"))
+        tasks[1].cancel()
+        await asyncio.gather(tasks[1], return_exceptions=True)
+        self.assertEqual(self.limiter.snapshot()["waiting"], 1)
+
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(self.order, ["holder", "b1"])
+        self.assertEqual(self.limiter.snapshot()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Behaviour of the fastapi-app ArtifactCache: LRU eviction by size, pins that outlive an
+eviction, and the clean-up of leftovers when the index is loaded.
+
+Usage (from the repository root):
+    python -m unittest discover -s tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "fastapi-app"))
+
+from artifacts import STALE_PART_SECONDS, ArtifactCache  # noqa: E402
+
+
+class ArtifactCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = ArtifactCache(self.directory.name, max_bytes=20)
+
+    def put(self, key: str, content: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory.name, suffix=".part")
+        with os.fdopen(fd, "wb") as part:
+            part.write(content)
+        self.cache.commit(key, tmp_path)
+
+    def files(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def test_least_recently_used_artifact_is_evicted_with_its_sidecars(self):
+        self.put("a", b"a" * 8)
+        self.cache.put_outputs("a", {"lods": []})
+        self.cache.put_preview("a", b"jpeg")
+        self.put("b", b"b" * 8)
+        self.put("c", b"c" * 8)
+
+        self.assertFalse(self.cache.exists("a"))
+        self.assertEqual(self.files(), ["b.glb", "c.glb"])
+        self.assertEqual(self.cache.snapshot()["evictions"], 1)
+        self.assertEqual(self.cache.snapshot()["bytes"], 16)
+
+    def test_lookup_refreshes_the_lru_position_and_exists_does_not(self):
+        self.put("a", b"a" * 8)
+        self.put("b", b"b" * 8)
+        self.assertIsNotNone(self.cache.lookup("a"))
+        self.assertTrue(self.cache.exists("b"))
+        self.put("c", b"c" * 8)
+
+        self.assertTrue(self.cache.exists("a"))
+        self.assertFalse(self.cache.exists("b"))
+        self.assertEqual(self.cache.snapshot()["hits"], 1)
+
+    def test_pinned_artifact_stays_readable_after_eviction(self):
+        self.put("a", b"a" * 8)
+        pinned = self.cache.pin("a")
+        self.put("b", b"b" * 8)
+        self.put("c", b"c" * 8)
+
+        self.assertFalse(self.cache.exists("a"))
+        self.assertIsNone(self.cache.pin("a"))
+        with open(pinned, "rb") as source:
+            self.assertEqual(source.read(), b"a" * 8)
+        os.remove(pinned)
+        self.assertEqual(self.files(), ["b.glb", "c.glb"])
+
+    def test_recommitted_artifact_does_not_change_under_its_pin(self):
+        self.put("a", b"old")
+        pinned = self.cache.pin("a")
+        self.put("a", b"new")
+
+        with open(pinned, "rb") as source:
+            self.assertEqual(source.read(), b"old")
+        with open(self.cache.path("a"), "rb") as source:
+            self.assertEqual(source.read(), b"new")
+        self.assertEqual(self.cache.snapshot()["bytes"], 3)
+
+    def test_interrupted_tee_leaves_nothing_behind(self):
+        async def chunks():
+            yield b"partial"
+            raise ConnectionError("stream dropped")
+
+        async def consume():
+            async for _ in self.cache.tee("a", chunks()):
+                pass
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(consume())
+        self.assertFalse(self.cache.exists("a"))
+        self.assertEqual(self.files(), [])
+
+    def test_loading_the_index_removes_stale_leftovers(self):
+        self.put("a", b"a" * 8)
+        stale = time.time() - STALE_PART_SECONDS - 60
+        for name in ("stale.part", "fresh.part", "gone.json", "gone.jpg"):
+            with open(os.path.join(self.directory.name, name), "wb"):
+                pass
+        os.utime(os.path.join(self.directory.name, "stale.part"), (stale, stale))
+
+        reloaded = ArtifactCache(self.directory.name, max_bytes=20)
+        self.assertEqual(self.files(), ["a.glb", "fresh.part"])
+        self.assertEqual(reloaded.snapshot()["entries"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Contract of SingleFlight, run against both copies (fastapi-app/singleflight.py and
+flask-app/core/singleflight.py) so they cannot drift apart.
+
+Usage (from the repository root):
+    python -m unittest discover -s tests
+"""
+import asyncio
+import importlib.util
+import os
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COPIES = {
+    "fastapi-app": os.path.join(ROOT, "fastapi-app", "singleflight.py"),
+    "flask-app": os.path.join(ROOT, "flask-app", "core", "singleflight.py"),
+}
+
+
+def load(service: str):
+    spec = importlib.util.spec_from_file_location(f"singleflight_{service.replace('-', '_')}", COPIES[service])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SingleFlight
+
+
+class SingleFlightContract:
+    service = None
+
+    def setUp(self):
+        self.flights = load(self.service)()
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def work(self, result="done"):
+        self.runs += 1
+        await self.release.wait()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def test_concurrent_calls_share_one_execution(self):
+        callers = [asyncio.create_task(self.flights.do("k", self.work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["done"] * 5)
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(self.flights.snapshot(), {"executions": 1, "coalesced": 4, "in_flight": 0})
+
+    async def test_different_keys_run_separately(self):
+        callers = [asyncio.create_task(self.flights.do(key, self.work)) for key in ("a", "b")]
+        await asyncio.sleep(0)
+        self.release.set()
+        await asyncio.gather(*callers)
+        self.assertEqual(self.runs, 2)
+
+    async def test_exception_reaches_every_caller_and_is_retried(self):
+        callers = [asyncio.create_task(self.flights.do("k", lambda: self.work(ValueError("boom")))) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+        for outcome in await asyncio.gather(*callers, return_exceptions=True):
+            self.assertIsInstance(outcome, ValueError)
+
+        self.assertEqual(await self.flights.do("k", self.work), "done")
+        self.assertEqual(self.runs, 2)
+
+    async def test_cancelled_caller_leaves_the_execution_to_the_others(self):
+        first = asyncio.create_task(self.flights.do("k", self.work))
+        second = asyncio.create_task(self.flights.do("k", self.work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await second, "done")
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.runs, 1)
+
+    async def test_execution_is_cancelled_once_every_caller_has_gone(self):
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(self.flights.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(self.flights.snapshot()["in_flight"], 0)
+
+    async def test_deadline_of_one_caller_does_not_cancel_the_others(self):
+        waiting = asyncio.create_task(self.flights.do("k", self.work))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.flights.do("k", self.work), 0.01)
+        self.release.set()
+        self.assertEqual(await waiting, "done")
+
+
+class FastapiSingleFlightTest(SingleFlightContract, unittest.IsolatedAsyncioTestCase):
+    service = "fastapi-app"
+
+
+class FlaskSingleFlightTest(SingleFlightContract, unittest.IsolatedAsyncioTestCase):
+    service = "flask-app"
+
+
+if __name__ == "__main__":
+    unittest.main()